@@ -0,0 +1,68 @@
+import getpass
+import json
+from functools import lru_cache
+from PyQt5 import QtCore, QtNetwork
+
+
+@lru_cache(maxsize=None)
+def shared_settings() -> QtCore.QSettings:
+    """
+    Returns the QSettings shared by every window of the process
+    """
+    return QtCore.QSettings(QtCore.QCoreApplication.organizationName(
+    ), QtCore.QCoreApplication.applicationName())
+
+
+class SingleInstance(QtCore.QObject):
+    """
+    Makes every launch after the first hand its files over to the running
+    process through a local socket instead of starting a new editor
+    """
+
+    files_received = QtCore.pyqtSignal(list)
+
+    timeout = 1000  # Milliseconds to wait for the running instance
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.name = f"kings-editor-{getpass.getuser()}"
+        self.server = None
+
+    def send(self, paths) -> bool:
+        """
+        Sends paths to a running instance, returns False if there is none
+        """
+        socket = QtNetwork.QLocalSocket()
+        socket.connectToServer(self.name)
+        if not socket.waitForConnected(self.timeout):
+            return False
+
+        socket.write(json.dumps(paths).encode("utf-8") + b"\n")
+        while socket.bytesToWrite() > 0:
+            if not socket.waitForBytesWritten(self.timeout):
+                return False
+        socket.disconnectFromServer()
+        return True
+
+    def listen(self) -> bool:
+        self.server = QtNetwork.QLocalServer(self)
+        self.server.newConnection.connect(self.accept)
+        if not self.server.listen(self.name):
+            # A crashed instance may have left its socket file behind
+            QtNetwork.QLocalServer.removeServer(self.name)
+            return self.server.listen(self.name)
+        return True
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.read(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def read(self, socket):
+        while socket.canReadLine():
+            try:
+                paths = json.loads(bytes(socket.readLine()).decode("utf-8"))
+            except ValueError:
+                continue
+            self.files_received.emit(paths)
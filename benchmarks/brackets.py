@@ -0,0 +1,139 @@
+"""
+Measures the bracket index on a document of one region of brackets
+spanning all of it, made of groups of `--group` lines: highlighting the
+match of its first bracket when nothing is indexed yet, matching it the
+first time, again after edits inside it, against scanning the text in
+between as a search without the index would, going to the match, folding
+and unfolding a group and the whole region, and the memory of the index.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/brackets.py --lines 200000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtCore, QtGui, QtTest, QtWidgets  # noqa: E402
+from benchmarks.common import print_results, repainted, timed_ms  # noqa: E402
+
+
+def scan_match(document, position) -> int:
+    """
+    Finds the bracket closing the one at position by reading the text after
+    it, as matching did without an index
+    """
+    text = document.toPlainText()
+    opening = text[position]
+    closing = {"(": ")", "[": "]", "{": "}"}[opening]
+    depth = 0
+    for index in range(position, len(text)):
+        if text[index] == opening:
+            depth += 1
+        elif text[index] == closing:
+            depth -= 1
+            if depth == 0:
+                return index
+    return -1
+
+
+def index_bytes(index) -> int:
+    """
+    Returns the size of the lists of the index, its summaries and the
+    strings they share
+    """
+    size = sys.getsizeof(index.chunks) + sys.getsizeof(index.summaries) + \
+        sys.getsizeof(index.starts) + sys.getsizeof(index.strings)
+    size += sum(sys.getsizeof(chunk) for chunk in index.chunks)
+    size += sum(sys.getsizeof(string) for string in index.strings)
+    return size
+
+
+def run(lines, group_lines) -> dict:
+    from texteditor import TextEditor
+    from brackets import BracketIndex
+
+    text_editor = TextEditor()
+    text_editor.resize(800, 600)
+    text_editor.cursorPositionChanged.connect(text_editor.reveal_cursor)
+    text_editor.cursorPositionChanged.connect(text_editor.highlight_brackets)
+    text_editor.show()
+    groups = []
+    for group in range(0, lines, group_lines):
+        items = "\n".join(f"        'key_{number}': call(value[{number}], {{'n': {number}}}),"
+                          for number in range(group, min(lines, group + group_lines)))
+        groups.append(f"    'group_{group}': [\n{items}\n    ],")
+    text_editor.setPlainText("data = {\n" + "\n".join(groups) + "\n}\nprint(data)\n")
+    document = text_editor.document()
+    index = BracketIndex(document)
+    text_editor.bracket_index = index
+    QtWidgets.QApplication.processEvents()
+    opening = len("data = ")
+    middle = document.findBlockByNumber(lines // 2).position()
+    text_editor.setFocus()
+    cursor = QtGui.QTextCursor(document)
+
+    results = {"lines": lines}
+    cursor.setPosition(opening)
+    results["cold_move_next_to_bracket_ms"] = repainted(
+        text_editor, lambda: text_editor.setTextCursor(cursor))
+    results["cold_highlighted"] = len(text_editor.selection_layers.selections.get("brackets", []))
+    results["scan_match_ms"] = timed_ms(lambda: scan_match(document, opening))
+    results["first_match_ms"] = timed_ms(lambda: index.match(opening))
+    results["match_ms"] = timed_ms(lambda: index.match(opening))
+    closing = index.match(opening)
+    results["match_backward_ms"] = timed_ms(lambda: index.match(closing))
+
+    cursor.setPosition(middle)
+    cursor.insertText("x")
+    results["match_after_typing_ms"] = timed_ms(lambda: index.match(opening))
+    cursor.insertText("\n")
+    results["match_after_new_line_ms"] = timed_ms(lambda: index.match(opening))
+    results["match_again_ms"] = timed_ms(lambda: index.match(opening))
+    results["enclosing_from_middle_ms"] = timed_ms(lambda: index.enclosing(middle))
+
+    cursor.setPosition(opening + 1)
+    text_editor.setTextCursor(cursor)
+    results["move_next_to_bracket_ms"] = repainted(
+        text_editor, lambda: QtTest.QTest.keyClick(text_editor, QtCore.Qt.Key_Left))
+    results["highlighted"] = len(text_editor.selection_layers.selections.get("brackets", []))
+    results["goto_matching_ms"] = repainted(text_editor, text_editor.goto_matching_bracket)
+
+    group = document.findBlockByNumber(lines // 2).previous()
+    while not group.text().endswith("["):
+        group = group.previous()
+    cursor.setPosition(group.position())
+    text_editor.setTextCursor(cursor)
+    text_editor.centerCursor()
+    QtWidgets.QApplication.processEvents()
+    results["fold_group_ms"] = repainted(text_editor, text_editor.fold)
+    results["unfold_group_ms"] = repainted(text_editor, text_editor.unfold)
+
+    cursor.setPosition(opening)
+    text_editor.setTextCursor(cursor)
+    results["fold_all_lines_ms"] = repainted(text_editor, text_editor.fold)
+    results["repaint_folded_ms"] = repainted(text_editor, lambda: None)
+    results["unfold_all_lines_ms"] = repainted(text_editor, text_editor.unfold)
+    text_editor.fold()
+    results["unfold_all_ms"] = repainted(text_editor, text_editor.unfold_all)
+
+    results["index_kb"] = index_bytes(index) / 1024
+    results["distinct_bracket_strings"] = len(index.strings)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--group", type=int, default=5000)
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = run(arguments.lines, arguments.group)
+    print_results(results)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Helpers shared by the benchmarks: timing a step up to the repaint it
+causes, percentiles, resident memory, measuring how long the GUI thread
+stalls and printing the results of a run.
+"""
+import time
+from PyQt5 import QtCore, QtWidgets
+
+
+def timed_ms(function) -> float:
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1000
+
+
+def repainted(text_editor, function) -> float:
+    """
+    Times function up to the repaint of the editor and its gutter
+    """
+    def run():
+        function()
+        QtWidgets.QApplication.processEvents()
+        text_editor.viewport().repaint()
+        text_editor.line_number_area.repaint()
+    return timed_ms(run)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def resident_kb() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def answer_no():
+    """
+    Answers every question of the editor with No, such as the crash
+    recovery prompt, which would otherwise block a run
+    """
+    QtWidgets.QMessageBox.question = staticmethod(
+        lambda *args, **kwargs: QtWidgets.QMessageBox.No)
+
+
+class StallMeter:
+    """
+    Measures the longest time the GUI thread went without running a timer
+    that should fire every 5 ms
+    """
+
+    def __init__(self):
+        self.ticks = []
+        self.timer = QtCore.QTimer()
+        self.timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.timer.setInterval(5)
+        self.timer.timeout.connect(lambda: self.ticks.append(time.perf_counter()))
+
+    def start(self):
+        self.ticks = [time.perf_counter()]
+        self.timer.start()
+
+    def stop(self) -> float:
+        self.timer.stop()
+        self.ticks.append(time.perf_counter())
+        return max((later - earlier) * 1000
+                   for earlier, later in zip(self.ticks, self.ticks[1:]))
+
+
+def wait_until(condition, timeout=600):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark step did not finish")
+        QtWidgets.QApplication.processEvents()
+        time.sleep(0.001)
+
+
+def print_results(results):
+    for key, value in results.items():
+        print(f"{key}: {value:.3f}" if type(value) == float else f"{key}: {value}")
@@ -0,0 +1,111 @@
+"""
+Measures word completion on a document of about `--words` words: reading
+the words in idle ticks after the text is set, the longest tick, looking
+up the completions of prefixes, typing a word with the popup following it,
+and the memory of the index.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/completion.py --words 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtCore, QtTest, QtWidgets  # noqa: E402
+from benchmarks.common import percentile, print_results  # noqa: E402
+
+
+def vocabulary(count) -> list:
+    """
+    Returns count identifiers made of common parts, like those of code
+    """
+    parts = ["get", "set", "value", "index", "item", "count", "total", "name", "file",
+             "line", "text", "block", "cursor", "list", "size", "data", "node", "user"]
+    random.seed(0)
+    words = set()
+    while len(words) < count:
+        words.add("_".join(random.sample(parts, random.randint(1, 3))) +
+                  str(random.randint(0, count // 10)))
+    return sorted(words)
+
+
+def run(word_count, distinct, lookups) -> dict:
+    from texteditor import TextEditor
+    from completion import WordIndex
+
+    words = vocabulary(distinct)
+    # Zipf-like, a few words are most of the text
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    text_words = random.choices(words, weights, k=word_count)
+    lines = [" ".join(text_words[start:start + 10]) for start in range(0, word_count, 10)]
+
+    text_editor = TextEditor()
+    text_editor.resize(800, 600)
+    text_editor.show()
+    text_editor.setPlainText("\n".join(lines))
+    index = WordIndex(text_editor.document())
+    text_editor.word_index = index
+
+    results = {"words": word_count, "lines": len(lines)}
+    ticks = []
+    start = time.perf_counter()
+    while index.idle_timer.isActive():
+        tick = time.perf_counter()
+        index.idle_pass()
+        ticks.append((time.perf_counter() - tick) * 1000)
+    results["index_ms"] = (time.perf_counter() - start) * 1000
+    results["idle_ticks"] = len(ticks)
+    results["idle_tick_max_ms"] = max(ticks)
+    results["distinct_words"] = len(index.words)
+
+    prefixes = [word[:random.randint(1, 4)] for word in random.sample(words, lookups)]
+    times = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.completions(prefix)
+        times.append((time.perf_counter() - start) * 1000)
+    results["lookup_mean_ms"] = sum(times) / len(times)
+    results["lookup_p95_ms"] = percentile(times, 0.95)
+    results["lookup_max_ms"] = max(times)
+
+    # Each key forgets the words of the line and the next lookup adds them
+    # back, as if the idle pass ran in between
+    text_editor.setFocus()
+    text_editor.moveCursor(text_editor.textCursor().End)
+    times = []
+    for char in "\nget_value_total":
+        start = time.perf_counter()
+        if char == "\n":
+            QtTest.QTest.keyClick(text_editor, QtCore.Qt.Key_Return)
+        else:
+            QtTest.QTest.keyClick(text_editor, char)
+        index.idle_pass()
+        text_editor.update_completion()
+        times.append((time.perf_counter() - start) * 1000)
+    results["type_key_max_ms"] = max(times)
+    results["popup_rows"] = text_editor.completer.model().rowCount() if text_editor.completer else 0
+
+    results["index_mb"] = index.footprint() / (1 << 20)
+    results["text_mb"] = text_editor.document().characterCount() * 2 / (1 << 20)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--words", type=int, default=1000000)
+    parser.add_argument("--distinct", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = run(arguments.words, arguments.distinct, arguments.lookups)
+    print_results(results)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Measures the Selection menu's line operations and Toggle line comment over
+a large selection, against commenting the same lines one cursor edit at a
+time.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/edits.py --lines 100000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtGui, QtWidgets  # noqa: E402
+from benchmarks.common import answer_no, print_results, repainted  # noqa: E402
+
+
+def comment_line_by_line(text_editor):
+    document = text_editor.document()
+    cursor = QtGui.QTextCursor(document)
+    cursor.beginEditBlock()
+    block = document.begin()
+    while block.isValid():
+        cursor.setPosition(block.position())
+        cursor.insertText("# ")
+        block = block.next()
+    cursor.endEditBlock()
+
+
+def run(lines, language) -> dict:
+    import main
+    from highlighter import language_for
+
+    answer_no()
+    window = main.MainWindow()
+    text_editor = window.text_editor
+    text = "\n".join(f"    value_{number} = compute({number})" for number in range(lines))
+
+    def reset():
+        text_editor.setPlainText(text)
+        QtWidgets.QApplication.processEvents()
+        text_editor.selectAll()
+
+    if language:
+        window.highlighter.set_language(language_for("benchmark.py"))
+    results = {"lines": lines, "highlighting": language}
+
+    reset()
+    results["comment_ms"] = repainted(
+        text_editor, lambda: text_editor.toggle_line_comment("#"))
+    results["uncomment_ms"] = repainted(
+        text_editor, lambda: text_editor.toggle_line_comment("#"))
+    results["copy_lines_down_ms"] = repainted(
+        text_editor, lambda: text_editor.copy_lines(down=True))
+    reset()
+    results["move_lines_down_ms"] = repainted(
+        text_editor, lambda: text_editor.move_lines(up=False))
+    reset()
+    results["duplicate_selection_ms"] = repainted(
+        text_editor, text_editor.duplicate_selection)
+    reset()
+    results["line_by_line_comment_ms"] = repainted(
+        text_editor, lambda: comment_line_by_line(text_editor))
+
+    text_editor.document().setModified(False)
+    window.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--plain", action="store_true",
+                        help="without syntax highlighting")
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = run(arguments.lines, not arguments.plain)
+    print_results(results)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Measures file decoding throughput of the previous loading path against the
+fileio layer, on a UTF-8 file and on a UTF-16 file of the same text.
+
+The previous path read UTF-8 through a text-mode file, whatever the
+encoding, and About read files by adding them up line by line.
+
+Run from the repository root (needs twice --size of free space in /tmp):
+    python benchmarks/fileio.py --size 1024
+"""
+import argparse
+import codecs
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fileio  # noqa: E402
+from benchmarks.common import print_results  # noqa: E402
+
+
+def write_sample(path, size, encoding, bom):
+    line = "The quick brown fox jumps over the lazy dog, naïvely. ✓ 0123456789\r\n"
+    block = line * (1 << 14)
+    data = block.encode(encoding)
+    with open(path, "wb") as file:
+        if bom:
+            file.write(bom)
+        for _ in range(max(1, size // len(data))):
+            file.write(data)
+
+
+def previous_loader(path) -> int:
+    characters = 0
+    with open(path, encoding="utf-8", errors="replace") as file:
+        while True:
+            chunk = file.read(1 << 20)
+            if not chunk:
+                return characters
+            characters += len(chunk)
+
+
+def previous_read_file(path) -> int:
+    text_in_file = ""
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            text_in_file += line
+    return len(text_in_file)
+
+
+def fileio_loader(path) -> int:
+    characters = 0
+    with open(path, "rb") as file:
+        file_format = fileio.sniff(file.read(fileio.sniff_size))
+        file.seek(0)
+        for chunk in fileio.read_chunks(file, file_format):
+            characters += len(chunk)
+    return characters
+
+
+def measure(function, path) -> float:
+    size = os.path.getsize(path)
+    start = time.perf_counter()
+    function(path)
+    return size / (1 << 20) / (time.perf_counter() - start)
+
+
+def run(size, read_file_size) -> dict:
+    results = {"size_mb": size >> 20}
+    with tempfile.TemporaryDirectory() as directory:
+        for label, encoding, bom in (("utf8", "utf-8", b""),
+                                     ("utf16", "utf-16-le", codecs.BOM_UTF16_LE)):
+            path = os.path.join(directory, label)
+            write_sample(path, size, encoding, bom)
+            results[f"{label}_previous_loader_mb_s"] = measure(previous_loader, path)
+            results[f"{label}_fileio_mb_s"] = measure(fileio_loader, path)
+
+            # The line by line path is only run on a prefix of the file
+            with open(path, "rb") as file, open(path + ".prefix", "wb") as prefix:
+                prefix.write(file.read(read_file_size))
+            results[f"{label}_previous_read_file_mb_s"] = measure(
+                previous_read_file, path + ".prefix")
+            os.remove(path + ".prefix")
+            os.remove(path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1024, help="MB per file")
+    parser.add_argument("--read-file-size", type=int, default=64,
+                        help="MB read by the line by line path")
+    arguments = parser.parse_args()
+
+    results = run(arguments.size << 20, arguments.read_file_size << 20)
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures find in files over a generated tree: the time to search it, and
+the longest stall of the GUI thread while results stream in.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/find_in_files.py --files 50000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtWidgets  # noqa: E402
+from benchmarks.common import StallMeter, print_results, wait_until  # noqa: E402
+
+
+def write_tree(directory, files, lines):
+    text = "".join(f"value_{number} = compute(value_{number - 1})  # step\n"
+                   for number in range(lines))
+    for number in range(files):
+        subdirectory = os.path.join(directory, f"package_{number // 500}")
+        os.makedirs(subdirectory, exist_ok=True)
+        with open(os.path.join(subdirectory, f"module_{number}.py"), "w") as file:
+            file.write(text)
+            if number % 100 == 0:
+                file.write("needle = True\n")
+    os.makedirs(os.path.join(directory, ".git"), exist_ok=True)
+    with open(os.path.join(directory, "data.bin"), "wb") as file:
+        file.write(b"needle\0" * 1000)
+
+
+def run(files, lines) -> dict:
+    from find_in_files import FindInFilesPanel
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_tree(directory, files, lines)
+        panel = FindInFilesPanel()
+        panel.directory_input.setText(directory)
+        panel.find_input.setText("needle")
+
+        stall = StallMeter()
+        stall.start()
+        start = time.perf_counter()
+        panel.search()
+        wait_until(lambda: panel.runner is None)
+        elapsed = time.perf_counter() - start
+        max_gui_stall_ms = stall.stop()
+
+        results = {
+            "files": files,
+            "workers": panel.workers,
+            "seconds": elapsed,
+            "files_per_s": files / elapsed,
+            "results": panel.hit_count,
+            "max_gui_stall_ms": max_gui_stall_ms,
+        }
+        panel.shutdown()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--lines", type=int, default=200)
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = run(arguments.files, arguments.lines)
+    print_results(results)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Measures how long the line number gutter takes to repaint while scrolling
+through a large document.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/gutter.py --lines 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtWidgets  # noqa: E402
+from texteditor import TextEditor  # noqa: E402
+from benchmarks.common import percentile, print_results  # noqa: E402
+
+
+def run(lines, frames, lines_per_frame) -> dict:
+    text_editor = TextEditor()
+    text_editor.resize(800, 600)
+    text_editor.blockCountChanged.connect(
+        text_editor.update_line_number_area_width)
+    text_editor.updateRequest.connect(text_editor.update_line_number_area)
+    text_editor.setPlainText("\n".join(f"line {number}" for number in range(lines)))
+    text_editor.show()
+    QtWidgets.QApplication.processEvents()
+
+    # Scroll like a mouse wheel would, starting in the middle of the file
+    scroll_bar = text_editor.verticalScrollBar()
+    first_line = scroll_bar.maximum() // 2
+    timings = []
+
+    for frame in range(frames):
+        scroll_bar.setValue(first_line + frame * lines_per_frame)
+        start = time.perf_counter()
+        text_editor.line_number_area.repaint()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Every typed newline emits blockCountChanged
+    start = time.perf_counter()
+    for block_count in range(10000):
+        text_editor.update_line_number_area_width(block_count)
+    width_update_us = (time.perf_counter() - start) * 100
+
+    text_editor.close()
+    return {
+        "lines": lines,
+        "frames": frames,
+        "mean_ms": sum(timings) / len(timings),
+        "p95_ms": percentile(timings, 0.95),
+        "max_ms": max(timings),
+        "frames_over_16ms": sum(timing > 16 for timing in timings),
+        "width_update_us": width_update_us,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=1000000)
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--lines-per-frame", type=int, default=3)
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = run(arguments.lines, arguments.frames, arguments.lines_per_frame)
+    print_results(results)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
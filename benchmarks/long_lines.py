@@ -0,0 +1,124 @@
+"""
+Measures a file that is one very long line: opening it, resizing the
+window, toggling word wrap, scrolling sideways and moving the cursor. With
+`--reference-size` the same is measured for a shorter line loaded into the
+editor the way it was before long lines went to the viewer, whose times
+grow with the length of the line.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/long_lines.py --size 20 --reference-size 1
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtCore, QtTest, QtWidgets  # noqa: E402
+from benchmarks.common import (  # noqa: E402
+    StallMeter, answer_no, print_results, repainted, wait_until)
+
+
+def write_json_line(path, size):
+    """
+    Writes a minified JSON array of about size bytes without a newline
+    """
+    with open(path, "w") as file:
+        file.write("[")
+        written = 1
+        number = 0
+        while written < size:
+            item = f'{{"id":{number},"name":"item {number}","tags":["a","b"]}},'
+            file.write(item)
+            written += len(item)
+            number += 1
+        file.write("0]")
+
+
+def measure(window, path, prefix) -> dict:
+    stall = StallMeter()
+    stall.start()
+    start = time.perf_counter()
+    window.load_file((path, ""))
+    wait_until(lambda: window.loader is None)
+    text_editor = window.text_editor
+    large_file = text_editor.large_file
+    if large_file is not None:
+        wait_until(lambda: not large_file.indexer.isRunning())
+    text_editor.viewport().repaint()
+    results = {f"{prefix}_open_ms": (time.perf_counter() - start) * 1000,
+               f"{prefix}_open_max_gui_stall_ms": stall.stop(),
+               f"{prefix}_viewer": large_file is not None}
+
+    resizes = [repainted(text_editor, lambda width=width: window.resize(width, 600))
+               for width in (900, 700, 1000, 800)]
+    results[f"{prefix}_resize_ms"] = max(resizes)
+    toggles = [repainted(text_editor, lambda on=on: window.set_word_wrap(on))
+               for on in (not window.word_wrap, window.word_wrap)]
+    results[f"{prefix}_wrap_toggle_ms"] = max(toggles)
+
+    text_editor.setFocus()
+    if large_file is not None:
+        bar = large_file.horizontal_scroll_bar
+        results[f"{prefix}_horizontal_scroll_ms"] = repainted(
+            text_editor, lambda: bar.setValue(bar.maximum() // 2))
+    else:
+        bar = text_editor.horizontalScrollBar()
+        results[f"{prefix}_horizontal_scroll_ms"] = repainted(
+            text_editor, lambda: bar.setValue(bar.maximum() // 2))
+    results[f"{prefix}_end_of_line_ms"] = repainted(
+        text_editor, lambda: QtTest.QTest.keyClick(text_editor, QtCore.Qt.Key_End))
+    keys = [repainted(text_editor, lambda: QtTest.QTest.keyClick(text_editor, QtCore.Qt.Key_Left))
+            for _ in range(20)]
+    results[f"{prefix}_key_max_ms"] = max(keys)
+    if large_file is None:
+        keys = [repainted(text_editor, lambda: QtTest.QTest.keyClick(text_editor, "x"))
+                for _ in range(5)]
+        results[f"{prefix}_typing_max_ms"] = max(keys)
+
+    text_editor.document().setModified(False)
+    return results
+
+
+def run(size, reference_size) -> dict:
+    import main
+
+    answer_no()
+    results = {"size_mb": size, "reference_size_mb": reference_size}
+    with tempfile.TemporaryDirectory() as directory:
+        for prefix, size_mb, long_line_length in (
+                ("viewer", size, None), ("reference", reference_size, 0)):
+            if not size_mb:
+                continue
+            path = os.path.join(directory, f"{prefix}.json")
+            write_json_line(path, int(size_mb * (1 << 20)))
+            window = main.MainWindow()
+            if long_line_length is not None:
+                # Loads the line into the editor, as before the viewer took it
+                window.long_line_length = long_line_length
+            window.resize(800, 600)
+            window.show()
+            QtWidgets.QApplication.processEvents()
+            results.update(measure(window, path, prefix))
+            window.close()
+            QtWidgets.QApplication.processEvents()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=float, default=20, help="MB")
+    parser.add_argument("--reference-size", type=float, default=1,
+                        help="MB, 0 to skip")
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = run(arguments.size, arguments.reference_size)
+    print_results(results)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Measures extra selections with many search matches: moving the cursor,
+scrolling, typing and repainting with the matches highlighted by the
+editor's selection layers, against setting one ExtraSelection per match
+along with the current line on every cursor move.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/selections.py --lines 100000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtCore, QtGui, QtTest, QtWidgets  # noqa: E402
+from benchmarks.common import print_results, repainted  # noqa: E402
+
+
+def key_times(text_editor, key, count) -> list:
+    return [repainted(text_editor, lambda: QtTest.QTest.keyClick(text_editor, key))
+            for _ in range(count)]
+
+
+def naive_selections(text_editor, matches, match_format):
+    """
+    Every match and the current line as a new list, as before the layers
+    """
+    selections = []
+    line = QtWidgets.QTextEdit.ExtraSelection()
+    line.format.setBackground(QtGui.QColor(0, 0, 255, 40))
+    line.format.setProperty(QtGui.QTextFormat.FullWidthSelection, True)
+    line.cursor = text_editor.textCursor()
+    selections.append(line)
+    for start, length in matches:
+        selection = QtWidgets.QTextEdit.ExtraSelection()
+        selection.format = match_format
+        selection.cursor = QtGui.QTextCursor(text_editor.document())
+        selection.cursor.setPosition(start)
+        selection.cursor.setPosition(start + length, QtGui.QTextCursor.KeepAnchor)
+        selections.append(selection)
+    text_editor.setExtraSelections(selections)
+
+
+def run(lines, keys) -> dict:
+    from texteditor import TextEditor
+    from find_replace import MatchIndex, compile_pattern, find_matches
+
+    text_editor = TextEditor()
+    text_editor.resize(800, 600)
+    text_editor.cursorPositionChanged.connect(text_editor.highlight_current_line)
+    text_editor.show()
+    text = "\n".join(f"    value_{number} = compute(value, {number})" for number in range(lines))
+    text_editor.setPlainText(text)
+    QtWidgets.QApplication.processEvents()
+
+    compiled = compile_pattern("value", False, True)
+    matches = find_matches(compiled, text)
+    results = {"lines": lines, "matches": len(matches)}
+
+    # Layers
+    index = MatchIndex(text_editor.document(), compiled, [list(match) for match in matches])
+    match_format = QtGui.QTextCharFormat()
+    match_format.setBackground(QtGui.QColor(255, 200, 0, 90))
+    layers = text_editor.selection_layers
+    results["layers_set_ms"] = repainted(
+        text_editor, lambda: layers.set_layer("search", match_format, index.matches_between))
+    results["layers_materialized"] = len(text_editor.extraSelections())
+    moves = key_times(text_editor, QtCore.Qt.Key_Right, keys)
+    results["layers_move_in_line_ms"] = sum(moves) / len(moves)
+    moves = key_times(text_editor, QtCore.Qt.Key_Down, keys)
+    results["layers_move_down_ms"] = sum(moves) / len(moves)
+    pages = key_times(text_editor, QtCore.Qt.Key_PageDown, keys)
+    results["layers_page_down_ms"] = sum(pages) / len(pages)
+    results["layers_page_down_max_ms"] = max(pages)
+
+    def type_key():
+        QtTest.QTest.keyClick(text_editor, "x")
+        index.contents_change(*last_change)
+        layers.set_layer("search", match_format, index.matches_between)
+
+    last_change = (0, 0, 0)
+
+    def remember(position, removed, added):
+        nonlocal last_change
+        last_change = (position, removed, added)
+
+    text_editor.document().contentsChange.connect(remember)
+    typing = [repainted(text_editor, type_key) for _ in range(keys)]
+    results["layers_typing_ms"] = sum(typing) / len(typing)
+    results["layers_paint_ms"] = repainted(text_editor, lambda: None)
+    text_editor.document().contentsChange.disconnect(remember)
+
+    # Every match materialized, the list set again on each cursor move
+    layers.clear_layer("search")
+    layers.clear_layer("current_line")
+    text_editor.cursorPositionChanged.disconnect(text_editor.highlight_current_line)
+    matches = [tuple(index.match(number)) for number in range(len(index))]
+    highlight = lambda: naive_selections(text_editor, matches, match_format)  # noqa: E731
+    text_editor.cursorPositionChanged.connect(highlight)
+    results["naive_set_ms"] = repainted(text_editor, highlight)
+    naive_keys = max(1, keys // 10)
+    moves = key_times(text_editor, QtCore.Qt.Key_Right, naive_keys)
+    results["naive_move_in_line_ms"] = sum(moves) / len(moves)
+    results["naive_paint_ms"] = repainted(text_editor, lambda: None)
+    text_editor.cursorPositionChanged.disconnect(highlight)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--keys", type=int, default=50)
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = run(arguments.lines, arguments.keys)
+    print_results(results)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
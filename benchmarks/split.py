@@ -0,0 +1,81 @@
+"""
+Measures what a split view costs: the memory it adds and the time a
+keystroke takes to reach the screen with one view and with two views of
+the same document.
+
+Run from the repository root (Linux, reads /proc/self/status):
+    QT_QPA_PLATFORM=offscreen python benchmarks/split.py --lines 2000000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtGui, QtWidgets  # noqa: E402
+from benchmarks.common import answer_no, print_results, resident_kb  # noqa: E402
+
+
+def type_keys(window, keys) -> float:
+    """
+    Types into the middle of the document, returns the mean milliseconds
+    per keystroke including the repaint of every view
+    """
+    text_editor = window.text_editor
+    cursor = text_editor.textCursor()
+    cursor.setPosition(text_editor.document().characterCount() // 2)
+    text_editor.setTextCursor(cursor)
+    text_editor.centerCursor()
+    QtWidgets.QApplication.processEvents()
+
+    start = time.perf_counter()
+    for _ in range(keys):
+        text_editor.insertPlainText("x")
+        for view in window.text_editors:
+            view.viewport().repaint()
+    return (time.perf_counter() - start) * 1000 / keys
+
+
+def run(lines, keys) -> dict:
+    import main
+
+    answer_no()
+    window = main.MainWindow()
+    window.resize(800, 600)
+    window.text_editor.setPlainText(
+        "\n".join(f"line {number} of the document" for number in range(lines)))
+    QtWidgets.QApplication.processEvents()
+
+    results = {"lines": lines, "one_view_key_ms": type_keys(window, keys)}
+
+    before = resident_kb()
+    start = time.perf_counter()
+    window.split_editor()
+    QtWidgets.QApplication.processEvents()
+    results["split_ms"] = (time.perf_counter() - start) * 1000
+    results["split_kb"] = resident_kb() - before
+
+    # Scroll the views apart so that each one paints different blocks
+    window.text_editors[1].moveCursor(QtGui.QTextCursor.Start)
+    results["two_views_key_ms"] = type_keys(window, keys)
+
+    window.text_editor.document().setModified(False)
+    window.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lines", type=int, default=2000000)
+    parser.add_argument("--keys", type=int, default=200)
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = run(arguments.lines, arguments.keys)
+    print_results(results)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
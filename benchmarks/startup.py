@@ -0,0 +1,109 @@
+"""
+Measures the cold start of King's Editor up to the first paint of the main
+window, each run in a fresh interpreter. With --clean-settings every run
+starts from an empty settings and data directory, as on a first launch.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/startup.py --runs 10
+    QT_QPA_PLATFORM=offscreen python benchmarks/startup.py --runs 1 --clean-settings
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure():
+    """
+    Starts one editor in this process and prints its timings as JSON
+    """
+    start = time.perf_counter()
+    sys.path.insert(0, ROOT)
+
+    from PyQt5 import QtWidgets, QtCore
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    # Never block on the crash recovery prompt
+    QtWidgets.QMessageBox.question = staticmethod(
+        lambda *args, **kwargs: QtWidgets.QMessageBox.No)
+
+    import main
+    imported = time.perf_counter()
+
+    timings = {}
+
+    class FirstPaint(QtCore.QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QtCore.QEvent.Paint and "paint_ms" not in timings:
+                timings["paint_ms"] = (time.perf_counter() - start) * 1000
+                QtCore.QTimer.singleShot(0, app.quit)
+            return False
+
+    first_paint = FirstPaint()
+    app.installEventFilter(first_paint)
+    window = main.MainWindow()
+    constructed = time.perf_counter()
+    app.exec_()
+
+    timings["import_ms"] = (imported - start) * 1000
+    timings["construct_ms"] = (constructed - imported) * 1000
+    window.close()
+    print(json.dumps(timings))
+
+
+def measure_once(clean_settings) -> dict:
+    if not clean_settings:
+        return run_measure(os.environ)
+    with tempfile.TemporaryDirectory() as home:
+        # QSettings and QStandardPaths both follow the XDG directories
+        environment = dict(os.environ, HOME=home,
+                           XDG_CONFIG_HOME=os.path.join(home, ".config"),
+                           XDG_DATA_HOME=os.path.join(home, ".local", "share"))
+        return run_measure(environment)
+
+
+def run_measure(environment) -> dict:
+    process = subprocess.run([sys.executable, __file__, "--measure"],
+                             capture_output=True, text=True, cwd=ROOT, env=environment)
+    if process.returncode != 0:
+        raise RuntimeError(f"the editor did not start:\n{process.stderr}")
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def run(runs, clean_settings=False) -> dict:
+    samples = [measure_once(clean_settings) for _ in range(runs)]
+
+    results = {"runs": runs}
+    for key in samples[0]:
+        values = sorted(sample[key] for sample in samples)
+        results[f"median_{key}"] = values[len(values) // 2]
+        results[f"min_{key}"] = values[0]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--clean-settings", action="store_true",
+                        help="start every run without saved settings")
+    parser.add_argument("--measure", action="store_true",
+                        help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.measure:
+        measure()
+        return
+
+    # Imported here, measure() times the import of PyQt
+    sys.path.insert(0, ROOT)
+    from benchmarks.common import print_results
+    print_results(run(arguments.runs, arguments.clean_settings))
+
+
+if __name__ == "__main__":
+    main()
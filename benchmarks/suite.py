@@ -0,0 +1,247 @@
+"""
+Runs the editor's hot paths headless and writes the results as JSON, so
+that runs can be compared over time: opening files of several sizes,
+scrolling to the end, typing bursts with auto-pairing, saving and
+autosaving, then the benchmark of every other script of this directory
+but the file decoding, find in files and startup ones, at sizes that keep
+a run to a few minutes.
+
+Files over the large file threshold open in the read-only viewer, so only
+opening, indexing and scrolling are measured for them. Memory figures read
+/proc, the suite needs Linux and about the largest size free in /tmp.
+
+Run from the repository root, no display needed:
+    python benchmarks/suite.py --sizes 1,100,1024 --output results.json
+    python benchmarks/suite.py --sizes 1 --benchmarks edits,undo --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The suite is meant for machines without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5 import QtCore, QtTest, QtWidgets  # noqa: E402
+from benchmarks import (  # noqa: E402
+    brackets, completion, edits, gutter, long_lines, selections, split, undo, windows)
+from benchmarks.common import (  # noqa: E402
+    StallMeter, percentile, resident_kb, wait_until)
+
+typing_burst = "def pair(value):\n    return call(value, [1, 2], {'key': \"text\"})\n" * 4
+
+# The run of each benchmark script, with arguments smaller than its own
+# defaults. The results of each go in a group named after it.
+benchmarks = {
+    "gutter": lambda arguments: gutter.run(arguments.gutter_lines, 200, 3),
+    "brackets": lambda arguments: brackets.run(100000, 5000),
+    "completion": lambda arguments: completion.run(200000, 20000, 500),
+    "edits": lambda arguments: edits.run(20000, True),
+    "selections": lambda arguments: selections.run(50000, 20),
+    "split": lambda arguments: split.run(500000, 100),
+    "undo": lambda arguments: undo.run(50, 1 << 20, 16, 100000),
+    "long_lines": lambda arguments: long_lines.run(20, 0),
+    "windows": lambda arguments: windows.run(5, 10000),
+}
+
+
+def write_sample(path, size):
+    line = "def function(value):\n    return [value, {'key': (value, \"text\")}]\n"
+    block = (line * ((1 << 20) // len(line))).encode()
+    with open(path, "wb") as file:
+        for _ in range(max(1, size // len(block))):
+            file.write(block)
+
+
+def open_file(window, path) -> dict:
+    stall = StallMeter()
+    before = resident_kb()
+    stall.start()
+    start = time.perf_counter()
+    window.load_file((path, ""))
+    wait_until(lambda: window.loader is None)
+    results = {"open_ms": (time.perf_counter() - start) * 1000}
+
+    large_file = window.text_editor.large_file
+    if large_file is not None:
+        wait_until(lambda: not large_file.indexer.isRunning())
+        results["index_ms"] = (time.perf_counter() - start) * 1000
+    results["open_max_gui_stall_ms"] = stall.stop()
+    results["lines"] = window.text_editor.line_count()
+    results["resident_kb"] = resident_kb() - before
+    return results
+
+
+def scroll_to_end(window) -> float:
+    text_editor = window.text_editor
+    text_editor.setFocus()
+    start = time.perf_counter()
+    QtTest.QTest.keyClick(text_editor, QtCore.Qt.Key_End, QtCore.Qt.ControlModifier)
+    QtWidgets.QApplication.processEvents()
+    text_editor.viewport().repaint()
+    text_editor.line_number_area.repaint()
+    return (time.perf_counter() - start) * 1000
+
+
+def type_burst(window) -> dict:
+    """
+    Types code with brackets and quotes at the end of the document, timing
+    each key up to the repaint of the editor and its gutter
+    """
+    text_editor = window.text_editor
+    timings = []
+    for char in typing_burst:
+        start = time.perf_counter()
+        if char == "\n":
+            QtTest.QTest.keyClick(text_editor, QtCore.Qt.Key_Return)
+        else:
+            QtTest.QTest.keyClick(text_editor, char)
+        text_editor.viewport().repaint()
+        text_editor.line_number_area.repaint()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"key_mean_ms": sum(timings) / len(timings),
+            "key_p95_ms": percentile(timings, 0.95),
+            "key_max_ms": max(timings)}
+
+
+def save(window) -> dict:
+    document = window.text_editor.document()
+    stall = StallMeter()
+    stall.start()
+    start = time.perf_counter()
+    window.save_file(window.current_file)
+    call_ms = (time.perf_counter() - start) * 1000
+    wait_until(lambda: not document.isModified())
+    return {"save_call_ms": call_ms,
+            "save_total_ms": (time.perf_counter() - start) * 1000,
+            "save_max_gui_stall_ms": stall.stop()}
+
+
+def autosave(window) -> dict:
+    """
+    Times an autosave from the moment it is due, with the scheduler's
+    waits shortened
+    """
+    document = window.text_editor.document()
+    scheduler = window.autosave
+    scheduler.interval_timer.setInterval(0)
+    scheduler.idle_timer.setInterval(0)
+    scheduler.set_enabled(True)
+
+    stall = StallMeter()
+    stall.start()
+    start = time.perf_counter()
+    window.text_editor.insertPlainText("# autosaved\n")
+    wait_until(lambda: not document.isModified())
+    results = {"autosave_total_ms": (time.perf_counter() - start) * 1000,
+               "autosave_max_gui_stall_ms": stall.stop()}
+    scheduler.set_enabled(False)
+    return results
+
+
+def run_size(size_mb, directory) -> dict:
+    import main
+
+    path = os.path.join(directory, f"sample_{size_mb}mb.py")
+    write_sample(path, size_mb << 20)
+    window = main.MainWindow()
+    window.resize(800, 600)
+    QtWidgets.QApplication.processEvents()
+
+    results = open_file(window, path)
+    results["scroll_to_end_ms"] = scroll_to_end(window)
+    if window.text_editor.large_file is None:
+        results.update(type_burst(window))
+        results.update(save(window))
+        results.update(autosave(window))
+
+    window.text_editor.document().setModified(False)
+    window.close()
+    QtWidgets.QApplication.processEvents()
+    os.remove(path)
+    return results
+
+
+def run(arguments) -> dict:
+    QtWidgets.QMessageBox.question = staticmethod(
+        lambda *args, **kwargs: QtWidgets.QMessageBox.No)
+    QtWidgets.QMessageBox.warning = staticmethod(
+        lambda *args, **kwargs: QtWidgets.QMessageBox.Ok)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for size in arguments.sizes.split(","):
+            if size:
+                results[f"file_{size}mb"] = run_size(int(size), directory)
+    for name in arguments.benchmarks.split(","):
+        if name:
+            results[name] = benchmarks[name](arguments)
+            QtWidgets.QApplication.processEvents()
+    return results
+
+
+def compare(previous, current):
+    """
+    Prints every number that is in both runs with its relative change
+    """
+    for group, values in current["results"].items():
+        old_values = previous["results"].get(group, {})
+        for key, value in values.items():
+            old = old_values.get(key)
+            if type(value) not in (int, float) or type(old) not in (int, float):
+                continue
+            change = f"{(value - old) / old * 100:+.1f}%" if old else ""
+            print(f"{group}.{key}: {old:.3f} -> {value:.3f} {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,100,1024",
+                        help="comma separated file sizes in MB, empty for none")
+    parser.add_argument("--benchmarks", default=",".join(benchmarks),
+                        help="comma separated benchmarks to run after the files, "
+                        f"of {', '.join(benchmarks)}")
+    parser.add_argument("--gutter-lines", type=int, default=1000000)
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON file of an earlier run")
+    arguments = parser.parse_args()
+
+    unknown = set(arguments.benchmarks.split(",")) - set(benchmarks) - {""}
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    results = run(arguments)
+    report = {
+        "started": started,
+        "python": platform.python_version(),
+        "qt": QtCore.QT_VERSION_STR,
+        "pyqt": QtCore.PYQT_VERSION_STR,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            compare(json.load(file), report)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
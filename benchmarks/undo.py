@@ -0,0 +1,142 @@
+"""
+Measures the undo history: memory held after many large edits with and
+without a budget, the time to compact, also after a few small edits to a
+large document, and the cost added to typing. Compaction waits for
+editing to pause, here it runs right after the edit that asked for it.
+
+Resident memory is read from /proc after trimming the heap, so the memory
+figures need Linux and glibc.
+
+Run from the repository root:
+    QT_QPA_PLATFORM=offscreen python benchmarks/undo.py --edits 200 --edit-size 1024 --lines 200000
+"""
+import argparse
+import ctypes
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtGui, QtTest, QtWidgets  # noqa: E402
+from benchmarks.common import answer_no, print_results  # noqa: E402
+
+
+def resident_mb() -> float:
+    # Hands the memory freed so far back to the system first
+    ctypes.CDLL(None).malloc_trim(0)
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+
+
+def replace_all(text_editor, text):
+    cursor = text_editor.textCursor()
+    cursor.select(QtGui.QTextCursor.Document)
+    cursor.insertText(text)
+    QtWidgets.QApplication.processEvents()
+
+
+def compact_after_small_edits(lines) -> float:
+    """
+    Returns how long compacting takes after separate small edits to a
+    document of lines lines
+    """
+    import main
+
+    window = main.MainWindow()
+    text_editor = window.text_editor
+    window.journal.recording = False
+    text_editor.setPlainText("\n".join(f"value_{number} = compute({number})"
+                                       for number in range(lines)))
+    QtWidgets.QApplication.processEvents()
+    document = text_editor.document()
+    cursor = QtGui.QTextCursor(document)
+    for number in range(20):
+        cursor.setPosition(document.findBlockByNumber(number * lines // 20).position())
+        cursor.insertText(f"edit_{number} ")
+    QtWidgets.QApplication.processEvents()
+
+    history = window.undo_history
+    # Over budget, keeping a few of the edits
+    history.budget = history.footprint // 4
+    start = time.perf_counter()
+    history.compact()
+    QtWidgets.QApplication.processEvents()
+    elapsed = (time.perf_counter() - start) * 1000
+    document.setModified(False)
+    window.close()
+    QtWidgets.QApplication.processEvents()
+    return elapsed
+
+
+def run(edits, edit_size, budget, lines) -> dict:
+    import main
+
+    answer_no()
+    results = {"edits": edits, "edit_size_kb": edit_size >> 10, "budget_mb": budget}
+
+    for label, budget_mb in (("unbounded", 1 << 20), ("budget", budget)):
+        window = main.MainWindow()
+        text_editor = window.text_editor
+        window.undo_history.set_budget(budget_mb << 20)
+        # The recovery journal holds on to edits of its own until it flushes
+        window.journal.recording = False
+        QtWidgets.QApplication.processEvents()
+
+        history = window.undo_history
+        before = resident_mb()
+        edit_ms = []
+        compaction_ms = []
+        for number in range(edits):
+            line = f"value_{number} = compute({number})\n"
+            start = time.perf_counter()
+            replace_all(text_editor, line * (edit_size // len(line)))
+            edit_ms.append((time.perf_counter() - start) * 1000)
+            if history.compact_timer.isActive():
+                # As if editing paused
+                history.compact_timer.stop()
+                start = time.perf_counter()
+                history.compact()
+                compaction_ms.append((time.perf_counter() - start) * 1000)
+        results[f"{label}_resident_mb"] = resident_mb() - before
+        results[f"{label}_footprint_mb"] = history.footprint / (1 << 20)
+        results[f"{label}_undo_steps"] = len(history.steps)
+        results[f"{label}_max_edit_ms"] = max(edit_ms)
+        if compaction_ms:
+            results[f"{label}_compactions"] = len(compaction_ms)
+            results[f"{label}_median_compaction_ms"] = sorted(compaction_ms)[len(compaction_ms) // 2]
+            results[f"{label}_max_compaction_ms"] = max(compaction_ms)
+
+        text_editor.setPlainText("")
+        start = time.perf_counter()
+        QtTest.QTest.keyClicks(text_editor, "typing " * 500)
+        results[f"{label}_typing_us_per_key"] = \
+            (time.perf_counter() - start) * 1e6 / 3500
+
+        text_editor.document().setModified(False)
+        window.close()
+        QtWidgets.QApplication.processEvents()
+
+    results["lines"] = lines
+    results["compaction_after_small_edits_ms"] = compact_after_small_edits(lines)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--edit-size", type=int, default=1024, help="KB per edit")
+    parser.add_argument("--budget", type=int, default=64, help="MB")
+    parser.add_argument("--lines", type=int, default=200000,
+                        help="of the document edited in small places")
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    results = run(arguments.edits, arguments.edit_size << 10, arguments.budget,
+                  arguments.lines)
+    print_results(results)
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Measures what every extra window costs once the first one is open: the
+time to build it and the resident memory it adds, both empty and holding a
+document.
+
+Run from the repository root (Linux, reads /proc/self/status):
+    QT_QPA_PLATFORM=offscreen python benchmarks/windows.py --windows 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5 import QtWidgets  # noqa: E402
+from benchmarks.common import answer_no, print_results, resident_kb  # noqa: E402
+
+
+def run(windows, lines) -> dict:
+    import main
+
+    answer_no()
+    QtWidgets.QApplication.processEvents()
+
+    start = time.perf_counter()
+    main.MainWindow()
+    QtWidgets.QApplication.processEvents()
+    first_ms = (time.perf_counter() - start) * 1000
+
+    text = "\n".join(f"line {number}" for number in range(lines))
+    results = {"windows": windows, "first_window_ms": first_ms}
+
+    for label, content in (("empty", ""), ("document", text)):
+        before = resident_kb()
+        start = time.perf_counter()
+        for _ in range(windows):
+            main.MainWindow().text_editor.setPlainText(content)
+            QtWidgets.QApplication.processEvents()
+        results[f"{label}_window_ms"] = (
+            time.perf_counter() - start) * 1000 / windows
+        results[f"{label}_window_kb"] = (resident_kb() - before) / windows
+
+    for window in list(main.MainWindow.windows):
+        window.text_editor.document().setModified(False)
+        window.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--windows", type=int, default=10)
+    parser.add_argument("--lines", type=int, default=10000)
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    print_results(run(arguments.windows, arguments.lines))
+    app.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import bisect
+import re
+from functools import lru_cache
+from itertools import accumulate
+from PyQt5 import QtCore, QtGui
+
+pairs = {"(": ")", "[": "]", "{": "}"}
+openings = "([{"
+closings = {closing: opening for opening, closing in pairs.items()}
+bracket_pattern = re.compile(r"[()\[\]{}]")
+other_pattern = re.compile(r"[^()\[\]{}\u2029]+")
+step_values = {opening: 1 for opening in openings}
+step_values.update({closing: -1 for closing in closings})
+kind_tables = [str.maketrans("", "", "".join(
+    char for char in step_values if char not in (opening, pairs[opening])))
+    for opening in openings]
+
+
+def nesting(brackets) -> tuple:
+    """
+    Returns, for each kind of bracket, how many more open than close and
+    the lowest that count gets reading them in order. Reading backward,
+    closing minus opening brackets get as low as the second minus the first.
+    """
+    result = []
+    for kind, table in enumerate(kind_tables):
+        steps = brackets.translate(table)
+        lowest = min(accumulate(map(step_values.__getitem__, steps), initial=0))
+        result.append((2 * steps.count(openings[kind]) - len(steps), lowest))
+    return tuple(result)
+
+
+# Blocks mostly repeat a few bracket strings
+summary = lru_cache(maxsize=4096)(nesting)
+
+
+def find_forward(text, column, kind, depth) -> tuple:
+    """
+    Scans text from column for the bracket closing one opened depth deep,
+    returns its column or None and the depth left
+    """
+    opening = openings[kind]
+    closing = pairs[opening]
+    for match in bracket_pattern.finditer(text, column):
+        char = match.group()
+        if char == opening:
+            depth += 1
+        elif char == closing:
+            depth -= 1
+            if depth == 0:
+                return match.start(), 0
+    return None, depth
+
+
+def find_backward(text, column, kinds_depth) -> tuple:
+    """
+    Scans text backward from column, counting closing brackets up and
+    opening brackets down for each kind, returns the column and kind of the
+    first opening bracket that takes its count below zero, or None
+    """
+    for match in reversed(list(bracket_pattern.finditer(text, 0, column + 1))):
+        char = match.group()
+        if char in closings:
+            kinds_depth[openings.index(closings[char])] += 1
+            continue
+        kind = openings.index(char)
+        if kinds_depth[kind] == 0:
+            return match.start(), kind
+        kinds_depth[kind] -= 1
+    return None, None
+
+
+class BracketIndex(QtCore.QObject):
+    """
+    The brackets of every block of a document, for matching and folding
+    without scanning the text in between.
+
+    The blocks are kept in chunks of about `chunk_size`, each block as the
+    string of its brackets, read with the rest of its chunk the first time
+    it is needed and forgotten when an edit touches it. Identical strings
+    are shared. Each chunk also has a summary of how deep it nests each kind
+    of bracket, so a search for a matching bracket steps over the chunks
+    that cannot contain it. Lines added or removed only change the chunk
+    they are in. Brackets in strings and comments count like any other.
+    """
+
+    chunk_size = 256
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.chunks = [[None] * document.blockCount()]
+        self.summaries = [None]  # Summary of each chunk, None until needed
+        self.starts = [0]  # Block number each chunk starts at
+        self.strings = {}
+        self.reads = 0  # Blocks read or summarized so far, for read limits
+        self.split_chunks(0, 1)
+
+        document.contentsChange.connect(self.contents_change)
+
+    def contents_change(self, position, chars_removed, chars_added):
+        document = self.document
+        last_position = document.characterCount() - 1
+        first = document.findBlock(min(position, last_position)).blockNumber()
+        last = document.findBlock(
+            min(position + chars_added, last_position)).blockNumber()
+        block_count = self.starts[-1] + len(self.chunks[-1])
+        old_last = last - (document.blockCount() - block_count)
+
+        first_chunk, first_offset = self.locate(first)
+        last_chunk, last_offset = self.locate(old_last)
+        self.chunks[first_chunk:last_chunk + 1] = [
+            self.chunks[first_chunk][:first_offset] + [None] * (last - first + 1) +
+            self.chunks[last_chunk][last_offset + 1:]]
+        self.summaries[first_chunk:last_chunk + 1] = [None]
+        self.split_chunks(first_chunk, last_chunk + 1)
+
+    def split_chunks(self, first, end):
+        """
+        Splits the chunk put in place of the chunks between first and end
+        if it grew too large, and updates where chunks start if needed
+        """
+        chunk = self.chunks[first]
+        if len(chunk) > 2 * self.chunk_size:
+            pieces = [chunk[start:start + self.chunk_size]
+                      for start in range(0, len(chunk), self.chunk_size)]
+            self.chunks[first:first + 1] = pieces
+            self.summaries[first:first + 1] = [None] * len(pieces)
+        elif end - first == 1 and first + 1 < len(self.starts) and \
+                self.starts[first + 1] - self.starts[first] == len(chunk):
+            # Same number of blocks, later chunks did not move
+            return
+        self.starts = list(accumulate((len(chunk) for chunk in self.chunks[:-1]), initial=0))
+
+    def locate(self, number) -> tuple:
+        """
+        Returns the chunk of a block number and the block's index in it
+        """
+        chunk = bisect.bisect_right(self.starts, number) - 1
+        return chunk, number - self.starts[chunk]
+
+    def chunk_brackets(self, chunk) -> list:
+        """
+        Returns the bracket strings of the blocks of a chunk, reading its
+        text if some are not known
+        """
+        strings = self.chunks[chunk]
+        if None in strings:
+            document = self.document
+            first = document.findBlockByNumber(self.starts[chunk])
+            last = document.findBlockByNumber(self.starts[chunk] + len(strings) - 1)
+            cursor = QtGui.QTextCursor(document)
+            cursor.setPosition(first.position())
+            cursor.setPosition(last.position() + last.length() - 1, QtGui.QTextCursor.KeepAnchor)
+            # One string for the whole chunk, its blocks separated by U+2029
+            lines = other_pattern.sub("", cursor.selectedText()).split("\u2029")
+            strings[:] = [self.strings.setdefault(line, line) for line in lines]
+            self.reads += len(strings)
+        return strings
+
+    def chunk_summary(self, chunk) -> tuple:
+        if self.summaries[chunk] is None:
+            strings = self.chunk_brackets(chunk)
+            self.summaries[chunk] = nesting("".join(strings))
+            self.reads += len(strings)
+        return self.summaries[chunk]
+
+    def match(self, position, read_limit=None):
+        """
+        Returns the position of the bracket matching the one at position, or
+        None if there is none or finding it would read more than read_limit
+        blocks
+        """
+        char = self.document.characterAt(position)
+        if char in pairs:
+            return self.match_forward(position, openings.index(char), read_limit)
+        if char in closings:
+            found = self.find_opening(position - 1, [0] * len(openings), read_limit,
+                                      openings.index(closings[char]))
+            return found[0] if found is not None else None
+        return None
+
+    def enclosing(self, position, read_limit=None):
+        """
+        Returns the position and kind of the innermost opening bracket left
+        open before position, or None
+        """
+        return self.find_opening(position - 1, [0] * len(openings), read_limit)
+
+    def match_forward(self, position, kind, read_limit):
+        document = self.document
+        block = document.findBlock(position)
+        column, depth = find_forward(block.text(), position - block.position(), kind, 0)
+        if column is not None:
+            return block.position() + column
+        if block.blockNumber() + 1 >= document.blockCount():
+            return None
+
+        reads = self.reads
+        chunk, offset = self.locate(block.blockNumber() + 1)
+        while chunk < len(self.chunks):
+            if read_limit is not None and self.reads - reads > read_limit:
+                return None
+            if offset == 0:
+                net, lowest = self.chunk_summary(chunk)[kind]
+                if depth + lowest > 0:
+                    depth += net
+                    chunk += 1
+                    continue
+            strings = self.chunk_brackets(chunk)
+            for index in range(offset, len(strings)):
+                if not strings[index]:
+                    continue
+                net, lowest = summary(strings[index])[kind]
+                if depth + lowest <= 0:
+                    block = document.findBlockByNumber(self.starts[chunk] + index)
+                    column, _ = find_forward(block.text(), 0, kind, depth)
+                    return block.position() + column
+                depth += net
+            chunk += 1
+            offset = 0
+        return None
+
+    def find_opening(self, position, kinds_depth, read_limit, kind=None):
+        """
+        Searches backward from position for an opening bracket that takes
+        the count of its kind below zero, of the given kind only if not None
+        """
+        document = self.document
+        if position < 0:
+            return None
+        block = document.findBlock(position)
+        found = self.find_in_block(block, position - block.position(), kinds_depth, kind)
+        if found is not None or block.blockNumber() == 0:
+            return found
+
+        reads = self.reads
+        chunk, offset = self.locate(block.blockNumber() - 1)
+        while chunk >= 0:
+            if read_limit is not None and self.reads - reads > read_limit:
+                return None
+            strings = self.chunks[chunk]
+            if offset == len(strings) - 1 and \
+                    self.can_skip(self.chunk_summary(chunk), kinds_depth, kind):
+                chunk -= 1
+                offset = len(self.chunks[chunk]) - 1
+                continue
+            strings = self.chunk_brackets(chunk)
+            for index in range(offset, -1, -1):
+                if strings[index] and not self.can_skip(summary(strings[index]), kinds_depth, kind):
+                    block = document.findBlockByNumber(self.starts[chunk] + index)
+                    return self.find_in_block(block, block.length() - 1, kinds_depth, kind)
+            chunk -= 1
+            offset = len(self.chunks[chunk]) - 1
+        return None
+
+    @staticmethod
+    def can_skip(block_summary, kinds_depth, kind) -> bool:
+        """
+        Tells whether blocks leave every count at zero or above reading
+        backward, and if so adds them to the counts
+        """
+        for index, (net, lowest) in enumerate(block_summary):
+            if (kind is None or index == kind) and kinds_depth[index] + lowest - net < 0:
+                return False
+        for index, (net, _) in enumerate(block_summary):
+            kinds_depth[index] -= net
+        return True
+
+    def find_in_block(self, block, column, kinds_depth, kind):
+        while True:
+            found_column, found_kind = find_backward(block.text(), column, kinds_depth)
+            if found_column is None:
+                return None
+            if kind is None or found_kind == kind:
+                return block.position() + found_column, found_kind
+            # An unmatched bracket of another kind, keep looking before it
+            kinds_depth[found_kind] = 0
+            column = found_column - 1
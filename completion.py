@@ -0,0 +1,167 @@
+import bisect
+import re
+import sys
+import time
+from collections import Counter
+from PyQt5 import QtCore
+
+word_pattern = re.compile(r"[^\W\d]\w{2,}")  # Words of three characters or more
+
+
+class WordIndex(QtCore.QObject):
+    """
+    The words of a document, for completing the one being typed.
+
+    Each block keeps the tuple of its words, the document keeps how many
+    times each word appears and a sorted list of the distinct words, which
+    finds those starting with a prefix by bisection. An edit only forgets
+    the words of the blocks it touched, an idle pass reads them again
+    `idle_batch` blocks at a time, and words are only added to or removed
+    from the sorted list when it is next needed. Identical words share one
+    string.
+    """
+
+    idle_batch = 100
+    idle_budget = 0.008  # Seconds of reading per idle tick
+    rebuild_count = 1000  # Changed words above which the list is sorted again
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.blocks = [None] * document.blockCount()  # Words of each block, None until read
+        self.counts = Counter()
+        self.words = []  # The words in counts, sorted
+        self.changed = set()  # Words that may have entered or left counts
+        self.next_unread = 0  # No block before it is left to read
+        self.tuple_bytes = 0
+        self.word_bytes = 0
+        self.paused = False
+
+        self.idle_timer = QtCore.QTimer(self)
+        self.idle_timer.setInterval(0)
+        self.idle_timer.timeout.connect(self.idle_pass)
+        document.contentsChange.connect(self.contents_change)
+        self.idle_timer.start()
+
+    def contents_change(self, position, chars_removed, chars_added):
+        document = self.document
+        last_position = document.characterCount() - 1
+        first = document.findBlock(min(position, last_position)).blockNumber()
+        last = document.findBlock(
+            min(position + chars_added, last_position)).blockNumber()
+        old_last = last - (document.blockCount() - len(self.blocks))
+
+        if first == 0 and old_last == len(self.blocks) - 1:
+            # All the text was replaced
+            self.counts.clear()
+            self.words = []
+            self.changed.clear()
+            self.tuple_bytes = self.word_bytes = 0
+        else:
+            for words in self.blocks[first:old_last + 1]:
+                if words:
+                    self.forget(words)
+        self.blocks[first:old_last + 1] = [None] * (last - first + 1)
+        self.next_unread = min(self.next_unread, first)
+        if not self.paused and not self.idle_timer.isActive():
+            self.idle_timer.start()
+
+    def set_paused(self, paused):
+        """
+        Holds the idle pass back during bulk edits such as loading a file,
+        it reads the blocks edited meanwhile once resumed
+        """
+        self.paused = paused
+        if paused:
+            self.idle_timer.stop()
+        else:
+            self.idle_timer.start()
+
+    def forget(self, words):
+        counts = self.counts
+        counts.subtract(words)
+        for word in words:
+            # A word repeated in the block is deleted the first time
+            if counts.get(word, 1) <= 0:
+                del counts[word]
+        self.changed.update(words)
+        self.tuple_bytes -= sys.getsizeof(words)
+
+    def idle_pass(self):
+        start = time.perf_counter()
+        blocks = self.blocks
+        while time.perf_counter() - start < self.idle_budget:
+            try:
+                number = blocks.index(None, self.next_unread)
+            except ValueError:
+                self.next_unread = len(blocks)
+                self.idle_timer.stop()
+                self.sorted_words()
+                return
+            self.read(number, min(len(blocks), number + self.idle_batch))
+
+    def read(self, first, end):
+        """
+        Reads the words of the blocks from first up to end that are not
+        known, stopping at the first that is
+        """
+        blocks = self.blocks
+        counts = self.counts
+        block = self.document.findBlockByNumber(first)
+        number = first
+        while number < end and blocks[number] is None:
+            words = tuple(map(sys.intern, word_pattern.findall(block.text())))
+            blocks[number] = words
+            if words:
+                counts.update(words)
+                self.changed.update(words)
+                self.tuple_bytes += sys.getsizeof(words)
+            number += 1
+            block = block.next()
+        self.next_unread = number
+
+    def sorted_words(self) -> list:
+        """
+        Returns the sorted list of words, first adding and removing the
+        words that changed since
+        """
+        changed = self.changed
+        if len(changed) > self.rebuild_count:
+            self.words = sorted(self.counts)
+            # As if the words were ASCII, which most are
+            self.word_bytes = sys.getsizeof("") * len(self.words) + sum(map(len, self.words))
+        else:
+            words = self.words
+            for word in changed:
+                index = bisect.bisect_left(words, word)
+                listed = index < len(words) and words[index] == word
+                if word in self.counts and not listed:
+                    words.insert(index, word)
+                    self.word_bytes += sys.getsizeof(word)
+                elif listed and word not in self.counts:
+                    del words[index]
+                    self.word_bytes -= sys.getsizeof(word)
+        changed.clear()
+        return self.words
+
+    def completions(self, prefix, limit=50) -> list:
+        """
+        Returns up to limit words starting with prefix, other than prefix
+        itself, in order
+        """
+        words = self.sorted_words()
+        found = []
+        for index in range(bisect.bisect_left(words, prefix), len(words)):
+            word = words[index]
+            if not word.startswith(prefix) or len(found) == limit:
+                break
+            if word != prefix:
+                found.append(word)
+        return found
+
+    def footprint(self) -> int:
+        """
+        Returns about how many bytes the index takes
+        """
+        return sys.getsizeof(self.blocks) + self.tuple_bytes + self.word_bytes + \
+            sys.getsizeof(self.counts) + sys.getsizeof(self.words) + sys.getsizeof(self.changed)
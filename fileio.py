@@ -0,0 +1,160 @@
+import codecs
+from typing import NamedTuple
+
+
+class FileFormat(NamedTuple):
+    """
+    How the text of a file is stored on disk, so that saving it writes the
+    same encoding, byte order mark and line endings back
+    """
+
+    encoding: str = "utf-8"
+    bom: bool = False
+    newline: str = "\n"
+
+    def label(self) -> str:
+        name = encoding_names.get(self.encoding, self.encoding.upper())
+        return f"{name} with BOM" if self.bom else name
+
+    def newline_label(self) -> str:
+        return newline_names[self.newline]
+
+
+# Longest first, the UTF-32 LE mark starts with the UTF-16 LE one
+boms = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+bom_bytes = {encoding: bom for bom, encoding in boms}
+
+encoding_names = {
+    "utf-8": "UTF-8",
+    "utf-16-le": "UTF-16 LE",
+    "utf-16-be": "UTF-16 BE",
+    "utf-32-le": "UTF-32 LE",
+    "utf-32-be": "UTF-32 BE",
+    "latin-1": "ISO-8859-1",
+}
+
+newline_names = {"\n": "LF", "\r\n": "CRLF", "\r": "CR"}
+
+sniff_size = 64 << 10  # Bytes looked at to tell the format of a file
+chunk_size = 1 << 20  # Bytes decoded at a time
+
+
+def sniff(prefix) -> FileFormat:
+    """
+    Guesses the format of a file from the first bytes of it: a byte order
+    mark, else the NUL bytes of UTF-16 text, else UTF-8 if the bytes are
+    valid UTF-8, else ISO-8859-1, which decodes any byte and writes it back
+    unchanged
+    """
+    for bom, encoding in boms:
+        if prefix.startswith(bom):
+            text = prefix[len(bom):].decode(encoding, "replace")
+            return FileFormat(encoding, True, sniff_newline(text))
+
+    encoding = sniff_encoding(prefix)
+    return FileFormat(encoding, False, sniff_newline(prefix.decode(encoding, "replace")))
+
+
+def sniff_encoding(prefix) -> str:
+    if b"\0" in prefix:
+        # Mostly ASCII UTF-16 text has a NUL in every other byte
+        half = max(1, len(prefix) // 2)
+        if prefix[1::2].count(0) > half // 2 > prefix[0::2].count(0):
+            return "utf-16-le"
+        if prefix[0::2].count(0) > half // 2 > prefix[1::2].count(0):
+            return "utf-16-be"
+    try:
+        # The prefix may end in the middle of a character
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def sniff_newline(text) -> str:
+    """
+    Returns the line ending of the first line, LF for a single line
+    """
+    end = text.find("\n")
+    if end > 0 and text[end - 1] == "\r":
+        return "\r\n"
+    if end == -1 and "\r" in text:
+        return "\r"
+    return "\n"
+
+
+def sniff_file(filename) -> FileFormat:
+    with open(filename, "rb") as file:
+        return sniff(file.read(sniff_size))
+
+
+class TextDecoder:
+    """
+    Decodes a stream of bytes into editor text piece by piece, with every
+    line ending turned into \\n. Characters and \\r\\n pairs split between
+    two pieces are carried over to the next one.
+    """
+
+    def __init__(self, file_format):
+        self.decoder = codecs.getincrementaldecoder(
+            file_format.encoding)("replace")
+        self.carried_cr = False
+
+    def decode(self, data, final=False) -> str:
+        text = self.decoder.decode(data, final)
+        if self.carried_cr:
+            text = "\r" + text
+        self.carried_cr = not final and text.endswith("\r")
+        if self.carried_cr:
+            text = text[:-1]
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        return text
+
+
+def read_chunks(file, file_format):
+    """
+    Decodes a binary file opened at its start in chunks of `chunk_size`
+    bytes, with the byte order mark dropped
+    """
+    if file_format.bom:
+        file.read(len(bom_bytes[file_format.encoding]))
+    decoder = TextDecoder(file_format)
+
+    while True:
+        data = file.read(chunk_size)
+        text = decoder.decode(data, final=not data)
+        if text:
+            yield text
+        if not data:
+            return
+
+
+def read_text(filename) -> tuple:
+    """
+    Returns the whole text of a file and its format
+    """
+    with open(filename, "rb") as file:
+        file_format = sniff(file.read(sniff_size))
+        file.seek(0)
+        return "".join(read_chunks(file, file_format)), file_format
+
+
+def encode(text, file_format) -> bytes:
+    """
+    Encodes editor text the way it was stored, raises UnicodeEncodeError
+    when the encoding cannot represent it
+    """
+    if file_format.newline != "\n":
+        text = text.replace("\n", file_format.newline)
+    data = text.encode(file_format.encoding)
+    if file_format.bom:
+        return bom_bytes[file_format.encoding] + data
+    return data
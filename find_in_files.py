@@ -0,0 +1,327 @@
+import multiprocessing
+import os
+from concurrent import futures
+from fnmatch import fnmatch
+from PyQt5 import QtWidgets, QtCore
+import fileio
+from find_replace import astral_indices, compile_pattern
+
+
+ignored_names = {".git", ".hg", ".svn", "__pycache__", "node_modules",
+                 ".venv", "venv", ".tox", ".mypy_cache", ".pytest_cache"}
+
+max_file_size = 64 << 20  # Bytes, larger files are skipped
+max_line_length = 200  # Characters of a matching line shown in the results
+max_file_hits = 1000
+
+
+def ignore_patterns(directory) -> list:
+    """
+    Returns the patterns of the .gitignore at the top of directory, negated
+    patterns are not supported
+    """
+    try:
+        with open(os.path.join(directory, ".gitignore"), encoding="utf-8",
+                  errors="replace") as file:
+            lines = [line.strip() for line in file]
+    except OSError:
+        return []
+    return [line.rstrip("/") for line in lines
+            if line and not line.startswith(("#", "!"))]
+
+
+def is_ignored(name, relative_path, patterns) -> bool:
+    if name in ignored_names:
+        return True
+    return any(fnmatch(name, pattern) or fnmatch(relative_path, pattern.lstrip("/"))
+               for pattern in patterns)
+
+
+def walk_files(directory):
+    """
+    Yields the files under directory that are not ignored
+    """
+    patterns = ignore_patterns(directory)
+    for root, dirnames, filenames in os.walk(directory):
+        relative_root = os.path.relpath(root, directory)
+        if relative_root == ".":
+            relative_root = ""
+        dirnames[:] = [name for name in dirnames if not is_ignored(
+            name, os.path.join(relative_root, name), patterns)]
+        for name in filenames:
+            if is_ignored(name, os.path.join(relative_root, name), patterns):
+                continue
+            yield os.path.join(root, name)
+
+
+def search_file(path, compiled) -> list:
+    """
+    Returns (line, column, line text) of the matches in a text file, binary
+    files have none. Columns count UTF-16 units, like document positions.
+    """
+    try:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size > max_file_size:
+                return []
+            prefix = file.read(fileio.sniff_size)
+            file_format = fileio.sniff(prefix)
+            # UTF-16 and UTF-32 text is full of NUL bytes, binary files too
+            if b"\0" in prefix and not file_format.encoding.startswith(("utf-16", "utf-32")):
+                return []
+            file.seek(0)
+            text = "".join(fileio.read_chunks(file, file_format))
+    except OSError:
+        return []
+
+    hits = []
+    line_number = 0
+    last_start = 0
+    for match in compiled.finditer(text):
+        start = match.start()
+        if start == match.end():
+            continue
+        line_number += text.count("\n", last_start, start)
+        last_start = start
+        line_start = text.rfind("\n", 0, start) + 1
+        line_end = text.find("\n", start)
+        if line_end == -1:
+            line_end = len(text)
+        column = start - line_start + len(astral_indices(text[line_start:start]))
+        hits.append((line_number + 1, column,
+                     text[line_start:min(line_end, line_start + max_line_length)]))
+        if len(hits) >= max_file_hits:
+            break
+    return hits
+
+
+def search_files(paths, compiled) -> tuple:
+    """
+    Searches a batch of files in a worker process, returns how many files
+    were searched and the (path, hits) of those with matches
+    """
+    results = []
+    for path in paths:
+        hits = search_file(path, compiled)
+        if hits:
+            results.append((path, hits))
+    return len(paths), results
+
+
+class SearchRunner(QtCore.QThread):
+    """
+    Walks a directory tree and hands its files to a process pool in
+    batches, streaming the results back as the batches complete
+    """
+
+    found = QtCore.pyqtSignal(list)
+    progress = QtCore.pyqtSignal(int, int)
+
+    batch_size = 64  # Files per task, enough to make up for the IPC
+    max_results = 20000  # Hits after which the search stops
+
+    def __init__(self, executor, workers, directory, compiled, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.directory = directory
+        self.compiled = compiled
+        self.cancelled = False
+        self.limited = False
+        # Keeps every worker busy without queueing up the whole tree
+        self.max_pending = 4 * workers
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        pending = set()
+        searched = 0
+        listed = 0
+        hit_count = 0
+        batch = []
+        files = walk_files(self.directory)
+
+        while not self.cancelled:
+            while files is not None and len(pending) < self.max_pending:
+                path = next(files, None)
+                if path is None:
+                    files = None
+                else:
+                    batch.append(path)
+                    listed += 1
+                if batch and (path is None or len(batch) >= self.batch_size):
+                    pending.add(self.executor.submit(
+                        search_files, batch, self.compiled))
+                    batch = []
+
+            if not pending:
+                break
+            done, pending = futures.wait(
+                pending, timeout=0.1, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    count, results = future.result()
+                except Exception:
+                    continue
+                searched += count
+                if results:
+                    hit_count += sum(len(hits) for _, hits in results)
+                    self.found.emit(results)
+            self.progress.emit(searched, listed)
+            if hit_count >= self.max_results:
+                self.limited = True
+                break
+
+        for future in pending:
+            future.cancel()
+
+
+class FindInFilesPanel(QtWidgets.QDockWidget):
+    """
+    Searches every text file under a directory and lists the matches,
+    activating one opens it through `open_location`
+    """
+
+    open_location = QtCore.pyqtSignal(str, int, int)
+
+    def __init__(self, parent=None):
+        super().__init__("Find in Files", parent)
+        self.workers = os.cpu_count() or 1
+        self.executor = None
+        self.runner = None
+        self.hit_count = 0
+        self.directory = ""  # Of the search the results are listed for
+        self.setup_UI()
+
+    def setup_UI(self):
+        widget = QtWidgets.QWidget(self)
+
+        self.find_input = QtWidgets.QLineEdit(widget)
+        self.find_input.setPlaceholderText("Find")
+        self.find_input.returnPressed.connect(self.search)
+
+        self.directory_input = QtWidgets.QLineEdit(os.getcwd(), widget)
+        self.directory_input.setPlaceholderText("Directory")
+        self.directory_input.returnPressed.connect(self.search)
+        browse_button = QtWidgets.QPushButton("Browse...", widget)
+        browse_button.clicked.connect(self.browse)
+
+        self.regex = QtWidgets.QCheckBox("Regular expression", widget)
+        self.case_sensitive = QtWidgets.QCheckBox("Match case", widget)
+
+        self.search_button = QtWidgets.QPushButton("Search", widget)
+        self.search_button.clicked.connect(self.search_or_cancel)
+        self.status_label = QtWidgets.QLabel("", widget)
+
+        self.results = QtWidgets.QTreeWidget(widget)
+        self.results.setHeaderHidden(True)
+        self.results.setUniformRowHeights(True)
+        self.results.itemActivated.connect(self.item_activated)
+
+        layout = QtWidgets.QGridLayout()
+        layout.addWidget(self.find_input, 1, 1, 1, 2)
+        layout.addWidget(self.search_button, 1, 3)
+        layout.addWidget(self.directory_input, 2, 1, 1, 2)
+        layout.addWidget(browse_button, 2, 3)
+        layout.addWidget(self.regex, 3, 1)
+        layout.addWidget(self.case_sensitive, 3, 2)
+        layout.addWidget(self.status_label, 4, 1, 1, 3)
+        layout.addWidget(self.results, 5, 1, 1, 3)
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+    def open_panel(self, directory=None):
+        if directory and self.runner is None:
+            self.directory_input.setText(directory)
+        self.show()
+        self.raise_()
+        self.find_input.setFocus()
+        self.find_input.selectAll()
+
+    def browse(self):
+        directory = QtWidgets.QFileDialog.getExistingDirectory(
+            self, "Find in Files", self.directory_input.text())
+        if directory:
+            self.directory_input.setText(directory)
+
+    def search_or_cancel(self):
+        if self.runner is not None:
+            self.cancel()
+        else:
+            self.search()
+
+    def search(self):
+        self.cancel()
+        self.results.clear()
+        self.hit_count = 0
+
+        directory = self.directory_input.text()
+        compiled = compile_pattern(self.find_input.text(), self.regex.isChecked(),
+                                   self.case_sensitive.isChecked())
+        if compiled is None:
+            self.status_label.setText("Invalid expression")
+            return
+        if self.find_input.text() == "" or not os.path.isdir(directory):
+            self.status_label.setText("" if self.find_input.text() == ""
+                                      else "No such directory")
+            return
+
+        if self.executor is None:
+            # Regular expressions hold the GIL, so the files are searched in
+            # processes. Spawned rather than forked from a threaded process.
+            self.executor = futures.ProcessPoolExecutor(
+                self.workers, multiprocessing.get_context("spawn"))
+
+        # The input may be edited while the results come in
+        self.directory = directory
+        self.runner = SearchRunner(
+            self.executor, self.workers, directory, compiled, self)
+        self.runner.found.connect(self.add_results)
+        self.runner.progress.connect(self.show_progress)
+        self.runner.finished.connect(self.search_finished)
+        self.search_button.setText("Cancel")
+        self.status_label.setText("Searching...")
+        self.runner.start()
+
+    def cancel(self):
+        if self.runner is None:
+            return
+        self.runner.disconnect()
+        self.runner.cancel()
+        self.runner.wait()
+        self.runner = None
+        self.search_button.setText("Search")
+        self.status_label.setText(f"Cancelled, {self.hit_count} results")
+
+    def add_results(self, results):
+        self.results.setUpdatesEnabled(False)
+        for path, hits in results:
+            file_item = QtWidgets.QTreeWidgetItem(self.results, [
+                f"{os.path.relpath(path, self.directory)} ({len(hits)})"])
+            file_item.setData(0, QtCore.Qt.UserRole, (path, 1, 0))
+            for line_number, column, text in hits:
+                item = QtWidgets.QTreeWidgetItem(
+                    file_item, [f"{line_number}: {text.strip()}"])
+                item.setData(0, QtCore.Qt.UserRole, (path, line_number, column))
+            self.hit_count += len(hits)
+        self.results.setUpdatesEnabled(True)
+
+    def show_progress(self, searched, listed):
+        self.status_label.setText(
+            f"Searching... {searched} of {listed} files, {self.hit_count} results")
+
+    def search_finished(self):
+        limited = self.runner.limited
+        self.runner = None
+        self.search_button.setText("Search")
+        self.status_label.setText(
+            f"{self.hit_count} results" + (", stopped at the limit" if limited else ""))
+
+    def item_activated(self, item):
+        path, line_number, column = item.data(0, QtCore.Qt.UserRole)
+        self.open_location.emit(path, line_number, column)
+
+    def shutdown(self):
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,432 @@
+import bisect
+import re
+from PyQt5 import QtGui, QtWidgets, QtCore
+
+
+def compile_pattern(pattern, regex, case_sensitive):
+    """
+    Compiles the search text, returns None for an invalid regex
+    """
+    flags = 0 if case_sensitive else re.IGNORECASE
+    try:
+        return re.compile(pattern if regex else re.escape(pattern), flags)
+    except re.error:
+        return None
+
+
+astral_pattern = re.compile("[\U00010000-\U0010ffff]")
+
+
+def astral_indices(text) -> list:
+    """
+    Returns the indices of the characters of text outside the BMP, which
+    take two UTF-16 units, and so two positions, in a QTextDocument
+    """
+    if text.isascii():
+        return []
+    return [match.start() for match in astral_pattern.finditer(text)]
+
+
+def text_index(text):
+    """
+    Returns a function turning a document position in text into an index
+    of the Python string
+    """
+    units = [index + number for number, index in enumerate(astral_indices(text))]
+    return lambda position: position - bisect.bisect_left(units, position)
+
+
+def find_matches(compiled, text, offset=0) -> list:
+    """
+    Returns [start, length] of every match in text as document positions,
+    shifted by offset.
+
+    Matches never span lines and are never empty, which is what lets the
+    match index rescan only the lines touched by an edit.
+    """
+    astral = astral_indices(text)
+    matches = []
+    for match in compiled.finditer(text):
+        start, end = match.span()
+        if start != end and text.find("\n", start, end) == -1:
+            if astral:
+                start += bisect.bisect_left(astral, start)
+                end += bisect.bisect_left(astral, end)
+            matches.append([start + offset, end - start])
+    return matches
+
+
+class SearchWorker(QtCore.QThread):
+    """
+    Finds every match of a pattern in a snapshot of the document
+    """
+
+    found = QtCore.pyqtSignal(int, list)
+
+    def __init__(self, compiled, text, generation, parent=None):
+        super().__init__(parent)
+        self.compiled = compiled
+        self.text = text
+        self.generation = generation
+
+    def run(self):
+        matches = find_matches(self.compiled, self.text)
+        self.text = None
+        self.found.emit(self.generation, matches)
+
+
+class MatchIndex:
+    """
+    Positions of all matches in a document, kept up to date edit by edit.
+
+    Matches are split around a gap the way a gap buffer splits text: `head`
+    holds the matches before the gap by absolute start, `tail` holds the
+    ones after it by distance from the end of the document, nearest last.
+    Typing moves the gap to the cursor, and since text inserted there shifts
+    none of the stored numbers, an edit costs only the rescan of its lines.
+    """
+
+    def __init__(self, document, compiled, matches):
+        self.document = document
+        self.compiled = compiled
+        self.length = document.characterCount()
+        self.head = matches
+        self.tail = []
+
+    def __len__(self):
+        return len(self.head) + len(self.tail)
+
+    def move_gap(self, position):
+        head, tail = self.head, self.tail
+        while head and head[-1][0] >= position:
+            start, length = head.pop()
+            tail.append([self.length - start, length])
+        while tail and self.length - tail[-1][0] < position:
+            distance, length = tail.pop()
+            head.append([self.length - distance, length])
+
+    def index_at(self, position) -> int:
+        """
+        Returns how many matches start before position
+        """
+        self.move_gap(position)
+        return len(self.head)
+
+    def match(self, index) -> list:
+        if index < len(self.head):
+            return self.head[index]
+        distance, length = self.tail[len(self.head) - index - 1]
+        return [self.length - distance, length]
+
+    def matches_between(self, start, end):
+        """
+        Yields the (start, length) of the matches that start in [start, end)
+        """
+        total = len(self)
+        index = self.index_at(start)
+        while index < total:
+            match_start, length = self.match(index)
+            if match_start >= end:
+                return
+            yield match_start, length
+            index += 1
+
+    def contents_change(self, position, chars_removed, chars_added):
+        document = self.document
+        last_position = document.characterCount() - 1
+        first_block = document.findBlock(min(position, last_position))
+        last_block = document.findBlock(
+            min(position + chars_added, last_position))
+        region_start = first_block.position()
+        region_end = last_block.position() + last_block.length()
+        old_region_end = region_end - chars_added + chars_removed
+
+        # Forget every match on the lines the edit touched
+        self.move_gap(region_start)
+        while self.tail and self.length - self.tail[-1][0] < old_region_end:
+            self.tail.pop()
+        self.length = document.characterCount()
+
+        cursor = QtGui.QTextCursor(document)
+        cursor.setPosition(region_start)
+        cursor.setPosition(min(region_end, self.length - 1),
+                           QtGui.QTextCursor.KeepAnchor)
+        text = cursor.selectedText().replace("\u2029", "\n")
+        self.head.extend(find_matches(self.compiled, text, region_start))
+
+
+class FindReplaceDialog(QtWidgets.QDialog):
+    """
+    Non-modal find and replace over the document of a TextEditor
+    """
+
+    search_delay = 200
+    batch_replace_count = 1000  # Above this, replace all rewrites the text
+
+    def __init__(self, text_editor, parent=None):
+        super().__init__(parent)
+        self.text_editor = text_editor
+        self.document = text_editor.document()
+        self.index = None
+        self.worker = None
+        self.generation = 0
+        self.match_format = QtGui.QTextCharFormat()
+        self.match_format.setBackground(QtGui.QColor(255, 200, 0, 90))
+        self.setup_UI()
+
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.search_delay)
+        self.search_timer.timeout.connect(self.search)
+
+        self.document.contentsChange.connect(self.contents_change)
+        self.text_editor.cursorPositionChanged.connect(self.update_count)
+
+    def setup_UI(self):
+        self.setWindowTitle("Find - King's Editor")
+
+        self.find_input = QtWidgets.QLineEdit(self)
+        self.find_input.setPlaceholderText("Find")
+        self.find_input.textChanged.connect(self.schedule_search)
+        self.find_input.returnPressed.connect(self.find_next)
+
+        self.replace_input = QtWidgets.QLineEdit(self)
+        self.replace_input.setPlaceholderText("Replace")
+
+        self.regex = QtWidgets.QCheckBox("Regular expression", self)
+        self.regex.toggled.connect(self.schedule_search)
+        self.case_sensitive = QtWidgets.QCheckBox("Match case", self)
+        self.case_sensitive.toggled.connect(self.schedule_search)
+
+        self.count_label = QtWidgets.QLabel("No results", self)
+
+        find_previous = QtWidgets.QPushButton("Previous", self)
+        find_previous.clicked.connect(self.find_previous)
+        find_next = QtWidgets.QPushButton("Next", self)
+        find_next.clicked.connect(self.find_next)
+        self.replace_button = QtWidgets.QPushButton("Replace", self)
+        self.replace_button.clicked.connect(self.replace)
+        self.replace_all_button = QtWidgets.QPushButton("Replace all", self)
+        self.replace_all_button.clicked.connect(self.replace_all)
+
+        layout = QtWidgets.QGridLayout()
+        layout.addWidget(self.find_input, 1, 1, 1, 2)
+        layout.addWidget(find_previous, 1, 3)
+        layout.addWidget(find_next, 1, 4)
+        layout.addWidget(self.replace_input, 2, 1, 1, 2)
+        layout.addWidget(self.replace_button, 2, 3)
+        layout.addWidget(self.replace_all_button, 2, 4)
+        layout.addWidget(self.regex, 3, 1)
+        layout.addWidget(self.case_sensitive, 3, 2)
+        layout.addWidget(self.count_label, 3, 3, 1, 2)
+        self.setLayout(layout)
+
+    def set_text_editor(self, text_editor):
+        """
+        Follows the focused view of the document in a split editor
+        """
+        if text_editor is self.text_editor:
+            return
+        self.text_editor.cursorPositionChanged.disconnect(self.update_count)
+        self.text_editor.selection_layers.clear_layer("search")
+        self.text_editor = text_editor
+        self.text_editor.cursorPositionChanged.connect(self.update_count)
+        self.show_matches()
+        self.update_count()
+
+    def open_find(self, replace=False):
+        self.setWindowTitle(
+            "Replace - King's Editor" if replace else "Find - King's Editor")
+        for widget in (self.replace_input, self.replace_button,
+                       self.replace_all_button):
+            widget.setVisible(replace)
+
+        selected = self.text_editor.textCursor().selectedText()
+        if selected and "\u2029" not in selected:
+            self.find_input.setText(selected)
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.find_input.setFocus()
+        self.find_input.selectAll()
+
+    def hideEvent(self, event):
+        # Stop searching and maintaining the index while nobody is looking
+        super().hideEvent(event)
+        self.search_timer.stop()
+        if self.worker is not None:
+            self.worker.found.disconnect()
+            self.worker = None
+        self.index = None
+        self.generation += 1
+        self.text_editor.selection_layers.clear_layer("search")
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.schedule_search()
+
+    def compiled(self):
+        return compile_pattern(self.find_input.text(), self.regex.isChecked(),
+                               self.case_sensitive.isChecked())
+
+    def schedule_search(self):
+        self.index = None
+        self.generation += 1
+        self.show_matches()
+        self.search_timer.start()
+
+    def search(self):
+        """
+        Starts a background search over a snapshot of the document
+        """
+        if self.worker is not None:
+            self.worker.found.disconnect()
+            self.worker = None
+
+        compiled = self.compiled()
+        if self.find_input.text() == "" or compiled is None:
+            self.count_label.setText(
+                "No results" if compiled else "Invalid expression")
+            return
+
+        self.count_label.setText("Searching...")
+        self.worker = SearchWorker(
+            compiled, self.text_editor.toPlainText(), self.generation, self)
+        self.worker.found.connect(self.search_finished)
+        self.worker.finished.connect(self.worker.deleteLater)
+        self.worker.start()
+
+    def search_finished(self, generation, matches):
+        self.worker = None
+        if not self.isVisible():
+            return
+        if generation != self.generation:
+            # The document or the query changed while searching
+            self.search()
+            return
+        self.index = MatchIndex(self.document, self.compiled(), matches)
+        self.show_matches()
+        self.update_count()
+
+    def contents_change(self, position, chars_removed, chars_added):
+        if self.index is not None:
+            self.index.contents_change(position, chars_removed, chars_added)
+            self.show_matches()
+            self.update_count()
+        elif self.worker is not None:
+            self.generation += 1
+            self.worker.generation = -1
+
+    def show_matches(self):
+        """
+        Highlights the matches around the viewport of the editor
+        """
+        if self.index is None or len(self.index) == 0:
+            self.text_editor.selection_layers.clear_layer("search")
+            return
+        self.text_editor.selection_layers.set_layer(
+            "search", self.match_format, self.index.matches_between)
+
+    def update_count(self):
+        if self.index is None or not self.isVisible():
+            return
+        total = len(self.index)
+        if total == 0:
+            self.count_label.setText("No results")
+            return
+
+        cursor = self.text_editor.textCursor()
+        current = self.index.index_at(cursor.selectionStart())
+        if self.is_match(cursor):
+            self.count_label.setText(f"{current + 1} of {total}")
+        else:
+            self.count_label.setText(f"{total} results")
+
+    def is_match(self, cursor) -> bool:
+        if self.index is None or not cursor.hasSelection():
+            return False
+        current = self.index.index_at(cursor.selectionStart())
+        if current >= len(self.index):
+            return False
+        start, length = self.index.match(current)
+        return (start, start + length) == (cursor.selectionStart(),
+                                           cursor.selectionEnd())
+
+    def select_match(self, index):
+        start, length = self.index.match(index % len(self.index))
+        cursor = self.text_editor.textCursor()
+        cursor.setPosition(start)
+        cursor.setPosition(start + length, QtGui.QTextCursor.KeepAnchor)
+        self.text_editor.setTextCursor(cursor)
+        self.update_count()
+
+    def find_next(self):
+        if self.index is None or len(self.index) == 0:
+            return
+        cursor = self.text_editor.textCursor()
+        position = cursor.selectionStart() + (1 if cursor.hasSelection() else 0)
+        self.select_match(self.index.index_at(position))
+
+    def find_previous(self):
+        if self.index is None or len(self.index) == 0:
+            return
+        cursor = self.text_editor.textCursor()
+        self.select_match(self.index.index_at(cursor.selectionStart()) - 1)
+
+    def replacements(self, text, positions) -> list:
+        """
+        Returns what replaces the matches at the document positions of
+        text, expanded from the matches themselves so that lookarounds,
+        anchors and \\b see the text around them
+        """
+        if not self.regex.isChecked():
+            return [self.replace_input.text()] * len(positions)
+        template = self.replace_input.text()
+        compiled = self.index.compiled
+        index = text_index(text)
+        return [compiled.match(text, index(position)).expand(template)
+                for position in positions]
+
+    def replace(self):
+        cursor = self.text_editor.textCursor()
+        if self.is_match(cursor):
+            text = self.document.toPlainText() if self.regex.isChecked() else ""
+            cursor.insertText(self.replacements(text, [cursor.selectionStart()])[0])
+        self.find_next()
+
+    def replace_all(self):
+        """
+        Replaces every match as a single undoable edit
+        """
+        if self.index is None or len(self.index) == 0:
+            return
+        total = len(self.index)
+        matches = [self.index.match(index) for index in range(total)]
+        batch = total > self.batch_replace_count
+        text = self.document.toPlainText() if batch or self.regex.isChecked() else ""
+        replacements = self.replacements(text, [start for start, _ in matches])
+        cursor = QtGui.QTextCursor(self.document)
+        cursor.beginEditBlock()
+
+        if batch:
+            # One insertion costs a single relayout however many matches
+            index = text_index(text)
+            pieces = []
+            last_end = 0
+            for (start, length), replacement in zip(matches, replacements):
+                start, end = index(start), index(start + length)
+                pieces.append(text[last_end:start])
+                pieces.append(replacement)
+                last_end = end
+            pieces.append(text[last_end:])
+            cursor.select(QtGui.QTextCursor.Document)
+            cursor.insertText("".join(pieces))
+        else:
+            for (start, length), replacement in zip(reversed(matches), reversed(replacements)):
+                cursor.setPosition(start)
+                cursor.setPosition(start + length,
+                                   QtGui.QTextCursor.KeepAnchor)
+                cursor.insertText(replacement)
+
+        cursor.endEditBlock()
+        self.count_label.setText(f"Replaced {total} results")
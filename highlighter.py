@@ -0,0 +1,358 @@
+import builtins
+import keyword
+import os
+import re
+import time
+from functools import lru_cache
+from PyQt5 import QtGui, QtCore
+from instrumentation import timed
+
+
+class BlockData(QtGui.QTextBlockUserData):
+    """
+    Per-block state kept alongside the text by the editor's helpers
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.dirty = False  # Skipped by the lazy highlighter, still to do
+
+
+class Language:
+    """
+    Base class of the language definitions.
+
+    `words` maps identifiers such as keywords to their style, they are
+    found with a single scan and a dictionary lookup. `rules` are
+    (pattern, style, group) tuples applied after them in order, later
+    rules painting over earlier ones. A rule with a style of None is an
+    alternation of groups named after styles, each match painted with the
+    style of its group, for constructs that can contain one another such
+    as strings and comments. `multiline` lists the delimiters of
+    constructs that can span blocks, such as triple-quoted strings. The
+    rules are compiled once per language, the first time it is used.
+    `line_comment` is the prefix added by Toggle line comment.
+    """
+
+    name = "Plain text"
+    extensions = ()
+    words = {}
+    word_pattern = re.compile(r"[A-Za-z_]\w*")
+    rules = ()
+    multiline = ()
+    multiline_style = "string"
+    line_comment = ""
+
+    compiled = None
+
+    @classmethod
+    def compiled_rules(cls) -> list:
+        if cls.compiled is None:
+            cls.compiled = [(re.compile(pattern), style, group)
+                            for pattern, style, group in cls.rules]
+        return cls.compiled
+
+
+class Python(Language):
+    name = "Python"
+    extensions = (".py", ".pyw", ".pyi")
+    words = {
+        **{name: "builtin" for name in dir(builtins) if not name.startswith("_")},
+        **{name: "keyword" for name in keyword.kwlist},
+        "self": "self",
+    }
+    rules = (
+        (r"\b(?:0[xob])?[0-9][0-9_a-fA-F]*(?:\.[0-9_]+)?(?:[eE][+-]?[0-9]+)?j?\b",
+         "number", 0),
+        (r"^\s*@[\w.]+", "decorator", 0),
+        (r"\b(?:def|class)\s+(\w+)", "definition", 1),
+        # One left to right scan, a # inside a string starts no comment and a
+        # quote inside a comment no string
+        (r"(?P<string>[rbfuRBFU]{0,2}(?:\"[^\"\\]*(?:\\.[^\"\\]*)*\""
+         r"|'[^'\\]*(?:\\.[^'\\]*)*'))|(?P<comment>#.*)", None, 0),
+    )
+    multiline = ('"""', "'''")
+    line_comment = "#"
+
+
+languages = [Python]
+
+styles = {
+    "keyword": ("#00007f", True, False),
+    "builtin": ("#7f007f", False, False),
+    "self": ("#7f0000", False, True),
+    "number": ("#007f7f", False, False),
+    "decorator": ("#805000", False, False),
+    "definition": ("#0000ff", True, False),
+    "string": ("#007f00", False, False),
+    "comment": ("#7f7f7f", False, True),
+}
+
+
+def language_for(filename):
+    """
+    Returns the language definition matching a file name, or None
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    for language in languages:
+        if extension in language.extensions:
+            return language
+    return None
+
+
+@lru_cache(maxsize=None)
+def shared_formats() -> dict:
+    """
+    Returns the text formats of the styles, shared by every highlighter
+    """
+    formats = {}
+    for name, (color, bold, italic) in styles.items():
+        text_format = QtGui.QTextCharFormat()
+        text_format.setForeground(QtGui.QColor(color))
+        if bold:
+            text_format.setFontWeight(QtGui.QFont.Bold)
+        text_format.setFontItalic(italic)
+        formats[name] = text_format
+    return formats
+
+
+class SyntaxHighlighter(QtGui.QSyntaxHighlighter):
+    """
+    Highlights a TextEditor's document with a pluggable language definition.
+
+    QSyntaxHighlighter already re-highlights only the edited block and the
+    blocks whose end state changed. In documents over `lazy_block_count`
+    blocks, blocks away from the viewport are skipped as well: they keep
+    their old state, which stops the cascade, and are marked dirty for an
+    idle pass that catches up `idle_batch` blocks at a time, viewport first.
+    Every view added with add_view keeps its own viewport highlighted.
+    """
+
+    lazy_block_count = 20000
+    lazy_file_size = 1 << 20  # Bytes, for documents highlighted while loading
+    viewport_margin = 50  # Blocks above and below the viewport
+    idle_batch = 100
+    idle_budget = 0.008  # Seconds of highlighting per idle tick
+
+    def __init__(self, text_editor):
+        super().__init__(text_editor)
+        self.text_editor = text_editor
+        self.language = None
+        self.formats = shared_formats()
+        self.lazy = False
+        self.views = []
+        self.windows = []
+        self.forced = (0, -1)
+        self.dirty_from = None
+        self.paused = False
+        self.bulk_edit = False
+
+        self.idle_timer = QtCore.QTimer(self)
+        self.idle_timer.setInterval(0)
+        self.idle_timer.timeout.connect(self.idle_pass)
+
+        self.add_view(text_editor)
+
+    def add_view(self, text_editor):
+        """
+        Keeps the viewport of another editor of the document highlighted
+        """
+        self.views.append(text_editor)
+        text_editor.verticalScrollBar().valueChanged.connect(
+            self.viewport_changed)
+        self.viewport_changed()
+
+    def remove_view(self, text_editor):
+        text_editor.verticalScrollBar().valueChanged.disconnect(
+            self.viewport_changed)
+        self.views.remove(text_editor)
+        self.update_window()
+
+    def set_language(self, language, lazy=None):
+        """
+        Starts highlighting with a language definition, or stops with None.
+
+        Attaching to a document highlights all of it at once, so callers
+        about to fill an empty document should attach first and say whether
+        it will be large through `lazy`.
+        """
+        if language is self.language:
+            return
+        self.language = language
+        self.idle_timer.stop()
+        self.dirty_from = None
+        if language is None:
+            self.setDocument(None)
+            return
+
+        document = self.text_editor.document()
+        if lazy is None:
+            lazy = document.blockCount() > self.lazy_block_count
+        self.lazy = lazy
+        self.update_window()
+        self.setDocument(document)
+
+    def update_window(self):
+        self.windows = []
+        for view in self.views:
+            first = view.firstVisibleBlock().blockNumber()
+            lines = view.viewport().height() // max(
+                1, view.fontMetrics().lineSpacing())
+            self.windows.append((first - self.viewport_margin,
+                                 first + lines + self.viewport_margin))
+
+    def in_window(self, block_number) -> bool:
+        # Called for every block of an edit, so kept free of generators
+        if self.forced[0] <= block_number <= self.forced[1]:
+            return True
+        for first, last in self.windows:
+            if first <= block_number <= last:
+                return True
+        return False
+
+    def viewport_changed(self):
+        if self.lazy and self.language is not None:
+            self.update_window()
+            for window in self.windows:
+                self.highlight_pending(*window)
+
+    def highlight_pending(self, first, last):
+        """
+        Highlights the skipped blocks between two block numbers, returns the
+        block after the last one
+        """
+        document = self.text_editor.document()
+        self.forced = (first, last)
+        block = document.findBlockByNumber(max(0, first))
+        number = block.blockNumber()
+        while block.isValid() and number <= last:
+            data = block.userData()
+            if block.userState() == -1 or (data is not None and data.dirty):
+                self.rehighlightBlock(block)
+            block = block.next()
+            number += 1
+        self.forced = (0, -1)
+        return block
+
+    def skip_block(self, block_number):
+        """
+        Leaves a block for the idle pass, blocks that were highlighted before
+        are marked dirty, the others still have a state of -1
+        """
+        if self.currentBlockState() != -1:
+            data = self.currentBlockUserData()
+            if data is None:
+                data = BlockData()
+                self.setCurrentBlockUserData(data)
+            data.dirty = True
+        if self.dirty_from is None or block_number < self.dirty_from:
+            self.dirty_from = block_number
+            if not self.paused and not self.idle_timer.isActive():
+                self.idle_timer.start()
+
+    def set_bulk_edit(self, bulk_edit):
+        """
+        Highlights only around the viewports while an edit spanning many
+        lines is made, as in a large document, the idle pass catching up
+        with the rest after
+        """
+        self.bulk_edit = bulk_edit
+        if bulk_edit and not self.lazy:
+            self.update_window()
+
+    def set_paused(self, paused):
+        """
+        Holds the idle pass back during bulk edits such as loading a file,
+        the blocks skipped meanwhile are caught up once it is resumed
+        """
+        self.paused = paused
+        if paused:
+            self.idle_timer.stop()
+        elif self.dirty_from is not None:
+            self.idle_timer.start()
+
+    @timed("Highlight idle pass")
+    def idle_pass(self):
+        start = time.perf_counter()
+        while self.dirty_from is not None and \
+                time.perf_counter() - start < self.idle_budget:
+            first = self.dirty_from
+            self.dirty_from = None
+            block = self.highlight_pending(first, first + self.idle_batch)
+            if block.isValid() and self.dirty_from is None:
+                self.dirty_from = block.blockNumber()
+        if self.dirty_from is None:
+            self.idle_timer.stop()
+
+    @timed("Highlight block")
+    def highlightBlock(self, text):
+        if self.language is None:
+            return
+
+        if not self.lazy and self.document().blockCount() > self.lazy_block_count:
+            # The document grew past the threshold, by a paste for instance
+            self.lazy = True
+            self.update_window()
+
+        if self.lazy or self.bulk_edit:
+            block_number = self.currentBlock().blockNumber()
+            if not self.in_window(block_number):
+                # Leaving the state as it was stops the re-highlight here
+                self.skip_block(block_number)
+                return
+            data = self.currentBlockUserData()
+            if data is not None:
+                data.dirty = False
+
+        formats = self.formats
+        words = self.language.words
+        if words:
+            for match in self.language.word_pattern.finditer(text):
+                style = words.get(match.group())
+                if style is not None:
+                    self.setFormat(match.start(), match.end() -
+                                   match.start(), formats[style])
+
+        for compiled, style, group in self.language.compiled_rules():
+            for match in compiled.finditer(text):
+                start = match.start(group)
+                self.setFormat(start, match.end(group) - start,
+                               formats[style or match.lastgroup])
+
+        self.highlight_multiline(text)
+
+    def highlight_multiline(self, text):
+        """
+        Highlights constructs spanning blocks, the block state being the
+        index of the open delimiter plus one, or 0 outside of them
+        """
+        text_format = self.formats[self.language.multiline_style]
+        state = max(0, self.previousBlockState())
+        position = 0
+        self.setCurrentBlockState(0)
+
+        while position <= len(text):
+            if state == 0:
+                starts = [(text.find(delimiter, position), index)
+                          for index, delimiter in enumerate(self.language.multiline)]
+                starts = [(start, index) for start, index in starts
+                          if start != -1 and self.format(start) != self.formats["comment"]]
+                if not starts:
+                    return
+                start, index = min(starts)
+                state = index + 1
+                search_from = start + len(self.language.multiline[index])
+            else:
+                start = 0
+                search_from = position
+
+            delimiter = self.language.multiline[state - 1]
+            end = text.find(delimiter, search_from)
+            if end == -1:
+                self.setFormat(start, len(text) - start, text_format)
+                self.setCurrentBlockState(state)
+                return
+            end += len(delimiter)
+            self.setFormat(start, end - start, text_format)
+            state = 0
+            position = end
@@ -0,0 +1,14 @@
+import os
+from functools import lru_cache
+from PyQt5 import QtGui
+
+SVG_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "svgs")
+
+
+@lru_cache(maxsize=None)
+def icon(name) -> QtGui.QIcon:
+    """
+    Returns the icon of an svg in ./svgs, loaded once and shared by every
+    window. The svg itself is only rendered when the icon is first painted.
+    """
+    return QtGui.QIcon(os.path.join(SVG_DIRECTORY, f"{name}.svg"))
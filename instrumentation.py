@@ -0,0 +1,231 @@
+import functools
+import os
+import time
+from collections import deque
+from PyQt5 import QtWidgets, QtCore
+
+
+enabled = False  # Hot paths are only timed while this is on
+session_profile = None  # cProfile.Profile of a session started with profile_session
+
+
+class Metric:
+    """
+    Timings of one hot path, the most recent ones kept for percentiles
+    """
+
+    recent_size = 1000
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.recent = deque(maxlen=self.recent_size)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.worst = max(self.worst, seconds)
+        self.recent.append(seconds)
+
+    def percentile(self, fraction) -> float:
+        recent = sorted(self.recent)
+        if not recent:
+            return 0.0
+        return recent[min(len(recent) - 1, int(fraction * len(recent)))]
+
+
+metrics = {}
+
+
+def format_size(size) -> str:
+    if size < 1 << 20:
+        return f"{size / 1024:.0f} KB"
+    return f"{size / (1 << 20):.1f} MB"
+
+
+def record(name, seconds):
+    """
+    Adds a timing, also called from worker threads
+    """
+    if not enabled:
+        return
+    metric = metrics.get(name)
+    if metric is None:
+        metric = metrics.setdefault(name, Metric())
+    metric.add(seconds)
+
+
+def timed(name):
+    """
+    Decorates a hot path so that its calls are timed while `enabled` is on,
+    off it costs one extra call
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def set_enabled(on):
+    global enabled
+    enabled = on or session_profile is not None
+
+
+def profile_session(path):
+    """
+    Profiles the GUI thread until the application quits and dumps the
+    profile to path, for KINGS_EDITOR_PROFILE
+    """
+    import cProfile
+    global session_profile
+
+    session_profile = cProfile.Profile()
+    set_enabled(True)
+
+    def dump():
+        session_profile.disable()
+        session_profile.dump_stats(path)
+        with open(path + ".txt", "w", encoding="utf-8") as file:
+            file.write(summary())
+
+    QtWidgets.QApplication.instance().aboutToQuit.connect(dump)
+    session_profile.enable()
+
+
+def summary() -> str:
+    lines = [f"{'':<24}{'calls':>10}{'mean ms':>10}{'95% ms':>10}{'max ms':>10}"]
+    for name, metric in sorted(metrics.items()):
+        lines.append(f"{name:<24}{metric.count:>10}"
+                     f"{metric.total / metric.count * 1000:>10.3f}"
+                     f"{metric.percentile(0.95) * 1000:>10.3f}"
+                     f"{metric.worst * 1000:>10.3f}")
+    return "\n".join(lines) + "\n"
+
+
+class PerformanceDock(QtWidgets.QDockWidget):
+    """
+    Shows the timings of the hot paths while it is open, along with how
+    late the event loop runs a timer and the memory taken by the helpers in
+    footprints, (name, function returning bytes) pairs, and records
+    cProfile profiles
+    """
+
+    refresh_interval = 500  # Milliseconds
+    probe_interval = 10  # Milliseconds between event loop latency probes
+
+    columns = ["", "Calls", "Mean ms", "95% ms", "Max ms"]
+
+    def __init__(self, parent=None, footprints=()):
+        super().__init__("Performance", parent)
+        self.footprints = footprints
+        self.profile = None
+        self.probe_time = 0.0
+        self.items = {}
+        self.setup_UI()
+
+        self.refresh_timer = QtCore.QTimer(self)
+        self.refresh_timer.setInterval(self.refresh_interval)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+        # A timer that should fire every probe_interval shows how long the
+        # event loop was kept from running it
+        self.probe_timer = QtCore.QTimer(self)
+        self.probe_timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self.probe_timer.setInterval(self.probe_interval)
+        self.probe_timer.timeout.connect(self.probe)
+
+        self.visibilityChanged.connect(self.set_running)
+
+    def setup_UI(self):
+        widget = QtWidgets.QWidget(self)
+
+        self.table = QtWidgets.QTreeWidget(widget)
+        self.table.setRootIsDecorated(False)
+        self.table.setUniformRowHeights(True)
+        self.table.setColumnCount(len(self.columns))
+        self.table.setHeaderLabels(self.columns)
+
+        self.memory_label = QtWidgets.QLabel(widget)
+
+        reset_button = QtWidgets.QPushButton("Reset", widget)
+        reset_button.clicked.connect(self.reset)
+        self.profile_button = QtWidgets.QPushButton("Record profile", widget)
+        self.profile_button.setCheckable(True)
+        self.profile_button.toggled.connect(self.toggle_profile)
+        # Python runs one profiler at a time
+        self.profile_button.setEnabled(session_profile is None)
+
+        layout = QtWidgets.QGridLayout()
+        layout.addWidget(self.table, 1, 1, 1, 3)
+        layout.addWidget(self.memory_label, 2, 1, 1, 3)
+        layout.addWidget(reset_button, 3, 2)
+        layout.addWidget(self.profile_button, 3, 3)
+        widget.setLayout(layout)
+        self.setWidget(widget)
+
+    def set_running(self, visible):
+        set_enabled(visible)
+        if visible:
+            self.probe_time = time.perf_counter()
+            self.probe_timer.start()
+            self.refresh_timer.start()
+        else:
+            self.probe_timer.stop()
+            self.refresh_timer.stop()
+
+    def probe(self):
+        now = time.perf_counter()
+        record("Event loop latency",
+               max(0.0, now - self.probe_time - self.probe_interval / 1000))
+        self.probe_time = now
+
+    def refresh(self):
+        self.table.setUpdatesEnabled(False)
+        for name, metric in sorted(metrics.items()):
+            item = self.items.get(name)
+            if item is None:
+                item = self.items[name] = QtWidgets.QTreeWidgetItem(self.table, [name])
+                for column in range(1, len(self.columns)):
+                    item.setTextAlignment(column, QtCore.Qt.AlignRight)
+            item.setText(1, str(metric.count))
+            item.setText(2, f"{metric.total / metric.count * 1000:.3f}")
+            item.setText(3, f"{metric.percentile(0.95) * 1000:.3f}")
+            item.setText(4, f"{metric.worst * 1000:.3f}")
+        self.table.setUpdatesEnabled(True)
+        self.memory_label.setText(", ".join(
+            f"{name} {format_size(footprint())}" for name, footprint in self.footprints))
+
+    def reset(self):
+        metrics.clear()
+        self.items = {}
+        self.table.clear()
+
+    def toggle_profile(self, checked):
+        """
+        Starts profiling the GUI thread, stopping asks where to save the
+        profile, which pstats, snakeviz and the like can read
+        """
+        if checked:
+            import cProfile
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            self.profile_button.setText("Stop and save profile...")
+            return
+
+        self.profile.disable()
+        self.profile_button.setText("Record profile")
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Save profile", os.path.join(os.getcwd(), "kings-editor.prof"),
+            "Profiles (*.prof)")
+        if path:
+            self.profile.dump_stats(path)
+        self.profile = None
@@ -0,0 +1,172 @@
+import json
+import os
+from itertools import count
+from PyQt5 import QtGui, QtCore
+from fileio import read_text
+
+
+class RecoveryJournal(QtCore.QObject):
+    """
+    Keeps an append-only record of the edits made to a document so that
+    unsaved work can be restored after a crash.
+
+    The journal starts with a header naming the file the edits apply to.
+    Every contentsChange becomes one edit record, and pending records are
+    appended to disk `flush_delay` milliseconds after typing stops. Once the
+    edits outgrow the document they are compacted into a single snapshot.
+    """
+
+    flush_delay = 2000
+    compaction_size = 1 << 20  # Bytes of edits before compacting at the least
+
+    session_ids = count()
+
+    def __init__(self, document, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.recording = False
+        self.pending = []
+        self.filename = ""
+        self.journal_size = 0
+        self.snapshot_size = 0
+
+        name = f"{os.getpid()}-{next(self.session_ids)}"
+        self.path = os.path.join(self.directory(), f"{name}.journal")
+        self.lock = QtCore.QLockFile(self.path + ".lock")
+        self.lock.tryLock(0)
+
+        self.flush_timer = QtCore.QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(self.flush_delay)
+        self.flush_timer.timeout.connect(self.flush)
+
+        self.document.contentsChange.connect(self.record)
+
+    @staticmethod
+    def directory() -> str:
+        path = os.path.join(QtCore.QStandardPaths.writableLocation(
+            QtCore.QStandardPaths.AppDataLocation), "recovery")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @classmethod
+    def orphaned_journals(cls) -> list:
+        """
+        Returns the journals left behind by sessions that did not shut down
+        """
+        orphans = []
+        directory = cls.directory()
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(".journal"):
+                continue
+            path = os.path.join(directory, name)
+            lock = QtCore.QLockFile(path + ".lock")
+            if lock.tryLock(0):
+                lock.unlock()
+                orphans.append(path)
+        return orphans
+
+    @staticmethod
+    def file_state(filename) -> list:
+        if filename == "" or not os.path.exists(filename):
+            return []
+        status = os.stat(filename)
+        return [status.st_size, status.st_mtime_ns]
+
+    @classmethod
+    def recover(cls, path):
+        """
+        Replays a journal, returns the file it belongs to and its text, or
+        None when the file has changed on disk since the journal started
+        """
+        with open(path, encoding="utf-8") as journal:
+            header = json.loads(journal.readline() or "{}")
+            filename = header.get("file", "")
+            text = ""
+            if not header.get("snapshot", False):
+                if cls.file_state(filename) != header.get("state", []):
+                    return None
+                if filename != "":
+                    text = read_text(filename)[0]
+
+            # Edits are recorded in document positions, which count UTF-16
+            # units, so they are replayed on the text encoded that way
+            units = bytearray(text.encode("utf-16-le", "surrogatepass"))
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # The session died while appending this record
+                if record[0] == "s":
+                    units = bytearray(record[1].encode("utf-16-le", "surrogatepass"))
+                else:
+                    _, position, removed, inserted = record
+                    units[2 * position:2 * (position + removed)] = \
+                        inserted.encode("utf-16-le", "surrogatepass")
+        return filename, units.decode("utf-16-le", "surrogatepass")
+
+    @staticmethod
+    def remove(path):
+        for name in (path, path + ".lock"):
+            if os.path.exists(name):
+                os.remove(name)
+
+    def record(self, position, chars_removed, chars_added):
+        if not self.recording:
+            return
+
+        cursor = QtGui.QTextCursor(self.document)
+        cursor.setPosition(position)
+        cursor.setPosition(min(position + chars_added,
+                               self.document.characterCount() - 1),
+                           QtGui.QTextCursor.KeepAnchor)
+        inserted = cursor.selectedText().replace("\u2029", "\n")
+        self.pending.append(["e", position, chars_removed, inserted])
+        self.flush_timer.start()
+
+    def flush(self):
+        if not self.pending:
+            return
+        lines = "".join(json.dumps(record) + "\n" for record in self.pending)
+        self.pending = []
+        with open(self.path, "a", encoding="utf-8") as journal:
+            journal.write(lines)
+        self.journal_size += len(lines)
+
+        if self.journal_size > max(self.compaction_size, self.snapshot_size):
+            self.compact()
+
+    def reset(self, filename):
+        """
+        Starts an empty journal on top of the file as it is on disk
+        """
+        if type(filename) == tuple or type(filename) == list:
+            filename = filename[0]
+        self.filename = filename
+        self.pending = []
+        self.flush_timer.stop()
+        self.write([{"file": filename, "state": self.file_state(filename)}])
+
+    def compact(self):
+        """
+        Replaces the recorded edits with a snapshot of the whole document
+        """
+        self.pending = []
+        self.flush_timer.stop()
+        text = self.document.toPlainText()
+        self.write([{"file": self.filename, "snapshot": True}, ["s", text]])
+        self.snapshot_size = len(text)
+
+    def write(self, records):
+        lines = "".join(json.dumps(record) + "\n" for record in records)
+        file = QtCore.QSaveFile(self.path)
+        if file.open(QtCore.QIODevice.WriteOnly):
+            file.write(lines.encode("utf-8"))
+            file.commit()
+        self.journal_size = 0
+
+    def discard(self):
+        self.recording = False
+        self.flush_timer.stop()
+        self.lock.unlock()
+        self.remove(self.path)
@@ -0,0 +1,371 @@
+import codecs
+import mmap
+from array import array
+from itertools import accumulate, islice, repeat
+from operator import add
+from PyQt5 import QtGui, QtWidgets, QtCore
+
+
+class LineIndexer(QtCore.QThread):
+    """
+    Builds the line-start offset index of a mapped file in the background
+    """
+
+    indexed = QtCore.pyqtSignal(int)
+
+    chunk_size = 16 << 20
+
+    def __init__(self, mapped_file, parent=None):
+        super().__init__(parent)
+        self.mapped_file = mapped_file
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        data = self.mapped_file.data
+        offsets = self.mapped_file.offsets
+        size = len(data)
+        position = 0
+        longest = 0
+        carried = 0  # Length of the line left unterminated by the last chunk
+
+        while position < size and not self.cancelled:
+            parts = data[position:position + self.chunk_size].split(b"\n")
+            first = carried + len(parts[0])
+            longest = max(longest, first, max(map(len, parts)))
+            carried = first if len(parts) == 1 else len(parts[-1])
+            self.mapped_file.longest_line = longest
+            # Every part but the last one is terminated by a newline, so the
+            # next line starts one byte after its end
+            starts = accumulate(
+                map(add, map(len, parts[:-1]), repeat(1)), initial=position)
+            offsets.extend(array("Q", islice(starts, 1, None)))
+            position = min(size, position + self.chunk_size)
+            self.indexed.emit(len(offsets))
+
+        self.mapped_file.complete = not self.cancelled
+        self.indexed.emit(len(offsets))
+
+
+class MappedFile:
+    """
+    A read-only, memory-mapped file addressed by line number and byte column
+    """
+
+    max_line_length = 10000  # Bytes decoded per line by default
+
+    def __init__(self, filename):
+        with open(filename, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = array("Q", [0])
+        self.longest_line = 0  # Bytes, of the lines indexed so far
+        self.complete = False
+
+    def line_count(self) -> int:
+        if self.complete:
+            return len(self.offsets)
+        # The last indexed line may still grow until its newline is found
+        return max(1, len(self.offsets) - 1)
+
+    def line_span(self, line_number) -> tuple:
+        """
+        Returns the offsets a line starts and ends at, without its newline
+        """
+        start = self.offsets[line_number]
+        if line_number + 1 < len(self.offsets):
+            end = self.offsets[line_number + 1] - 1
+        else:
+            end = len(self.data)
+        if end > start and self.data[end - 1] == 13:
+            end -= 1
+        return start, end
+
+    def line_length(self, line_number) -> int:
+        start, end = self.line_span(line_number)
+        return end - start
+
+    def line(self, line_number, column=0, width=max_line_length) -> str:
+        """
+        Decodes width bytes of a line from a byte column, dropping the
+        characters cut at either edge
+        """
+        line_start, line_end = self.line_span(line_number)
+        start = min(line_start + column, line_end)
+        end = min(start + width, line_end)
+        data = self.data[start:end]
+        if start > line_start:
+            # Continuation bytes belong to a character left of the column
+            skip = 0
+            while skip < min(3, len(data)) and 0x80 <= data[skip] < 0xc0:
+                skip += 1
+            data = data[skip:]
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        return decoder.decode(data, final=end == line_end)
+
+    def lines(self, first_line, count, column=0, width=max_line_length) -> str:
+        last_line = min(first_line + count, self.line_count())
+        return "\n".join(self.line(number, column, width)
+                         for number in range(first_line, last_line))
+
+    def close(self):
+        self.data.close()
+
+
+class LargeFileViewer(QtCore.QObject):
+    """
+    Shows a memory-mapped file in a read-only TextEditor.
+
+    Only the lines that fit in the viewport are ever put in the editor's
+    document, and of those only the columns around the visible ones, so
+    neither a huge line count nor a huge line is ever laid out. The editor's
+    own scroll bars are replaced by ones that span the whole line index and
+    the longest line; `line_offset` and `column_offset` tell the gutter and
+    the status bar where the document starts. Columns are byte offsets,
+    which are the character columns of ASCII text.
+    """
+
+    wheel_columns = 24  # Columns scrolled by a horizontal wheel step
+
+    def __init__(self, text_editor, filename):
+        super().__init__(text_editor)
+        self.text_editor = text_editor
+        self.mapped_file = MappedFile(filename)
+        self.cursor_line = 0
+        self.cursor_column = 0
+        self.column = 0
+        self.line_wrap_mode = text_editor.lineWrapMode()
+
+        self.scroll_bar = QtWidgets.QScrollBar(
+            QtCore.Qt.Vertical, self.text_editor)
+        self.scroll_bar.valueChanged.connect(self.render)
+        self.scroll_bar.show()
+        self.horizontal_scroll_bar = QtWidgets.QScrollBar(
+            QtCore.Qt.Horizontal, self.text_editor)
+        self.horizontal_scroll_bar.valueChanged.connect(self.set_column)
+        self.horizontal_scroll_bar.hide()
+
+        self.text_editor.large_file = self
+        self.text_editor.setReadOnly(True)
+        # Read-only editors otherwise scroll on arrow keys instead of moving
+        # a cursor, setReadOnly(False) gives back the editing flags
+        self.text_editor.setTextInteractionFlags(
+            QtCore.Qt.TextSelectableByMouse | QtCore.Qt.TextSelectableByKeyboard)
+        self.text_editor.setVerticalScrollBarPolicy(
+            QtCore.Qt.ScrollBarAlwaysOff)
+        self.text_editor.setHorizontalScrollBarPolicy(
+            QtCore.Qt.ScrollBarAlwaysOff)
+        self.text_editor.setLineWrapMode(self.text_editor.NoWrap)
+        self.text_editor.installEventFilter(self)
+        self.text_editor.viewport().installEventFilter(self)
+        self.text_editor.update_line_number_area_width(0)
+
+        self.indexer = LineIndexer(self.mapped_file, self)
+        self.indexer.indexed.connect(self.update_range)
+        self.indexer.start()
+
+        self.place_scroll_bar()
+        self.render()
+
+    def line_count(self) -> int:
+        return self.mapped_file.line_count()
+
+    def visible_lines(self) -> int:
+        line_height = self.text_editor.fontMetrics().lineSpacing()
+        return max(1, self.text_editor.viewport().height() // line_height)
+
+    def visible_columns(self) -> int:
+        char_width = max(1, self.text_editor.fontMetrics().averageCharWidth())
+        return max(1, self.text_editor.viewport().width() // char_width)
+
+    def scroll_bar_width(self) -> int:
+        return self.scroll_bar.sizeHint().width()
+
+    def scroll_bar_height(self) -> int:
+        if self.horizontal_scroll_bar.isHidden():
+            return 0
+        return self.horizontal_scroll_bar.sizeHint().height()
+
+    def place_scroll_bar(self):
+        cr = self.text_editor.contentsRect()
+        width = self.scroll_bar_width()
+        height = self.scroll_bar_height()
+        self.scroll_bar.setGeometry(QtCore.QRect(
+            cr.right() - width + 1, cr.top(), width, cr.height() - height))
+        left = cr.left() + self.text_editor.line_number_area_width()
+        self.horizontal_scroll_bar.setGeometry(QtCore.QRect(
+            left, cr.bottom() - height + 1, cr.right() - width + 1 - left, height))
+
+    def update_range(self, _):
+        visible_columns = self.visible_columns()
+        # With room for the cursor after the end of the longest line
+        self.horizontal_scroll_bar.setRange(
+            0, max(0, self.mapped_file.longest_line + 1 - visible_columns))
+        self.horizontal_scroll_bar.setPageStep(visible_columns)
+        shown = self.horizontal_scroll_bar.maximum() > 0
+        if shown == self.horizontal_scroll_bar.isHidden():
+            # Takes its height from the viewport
+            self.horizontal_scroll_bar.setVisible(shown)
+            self.text_editor.update_line_number_area_width(0)
+            self.place_scroll_bar()
+
+        self.scroll_bar.setRange(
+            0, max(0, self.line_count() - self.visible_lines()))
+        self.scroll_bar.setPageStep(self.visible_lines())
+        self.text_editor.update_line_number_area_width(0)
+        # Fill up the viewport while the first lines are being indexed
+        if self.text_editor.blockCount() < self.visible_lines():
+            self.render()
+
+    def render(self):
+        """
+        Replaces the editor's document with the lines and columns in the
+        current window
+        """
+        first_line = self.scroll_bar.value()
+        self.text_editor.line_offset = first_line
+        self.text_editor.column_offset = self.column
+        # Twice the visible columns, proportional fonts fit more than the
+        # average character width suggests
+        self.text_editor.setPlainText(self.mapped_file.lines(
+            first_line, self.visible_lines(), self.column,
+            2 * self.visible_columns()))
+        self.restore_cursor()
+        self.text_editor.line_number_area.update()
+
+    def set_column(self, column):
+        self.column = column
+        self.render()
+
+    def restore_cursor(self):
+        first_line = self.scroll_bar.value()
+        block = self.text_editor.document().findBlockByNumber(
+            min(max(0, self.cursor_line - first_line),
+                self.text_editor.blockCount() - 1))
+        column = self.cursor_column - self.column
+        if self.column > 0:
+            # Inside the visible columns, or the editor would scroll itself
+            column = min(column, self.visible_columns() - 1)
+        cursor = QtGui.QTextCursor(block)
+        cursor.movePosition(QtGui.QTextCursor.Right, n=min(
+            max(0, column), block.length() - 1))
+        self.text_editor.setTextCursor(cursor)
+
+    def goto_line(self, line_number, column=0):
+        """
+        Jumps to a zero-based line number using the offset index, scrolling
+        the column into view
+        """
+        line_number = max(0, min(line_number, self.line_count() - 1))
+        self.cursor_line, self.cursor_column = line_number, column
+        first_line = max(0, min(line_number - self.visible_lines() // 2,
+                                 self.scroll_bar.maximum()))
+        first_column = self.column
+        visible_columns = self.visible_columns()
+        if not self.column <= column < self.column + visible_columns:
+            first_column = max(0, min(column - visible_columns // 2,
+                                      self.horizontal_scroll_bar.maximum()))
+        # Both windows move before the one render
+        self.scroll_bar.blockSignals(True)
+        self.scroll_bar.setValue(first_line)
+        self.scroll_bar.blockSignals(False)
+        self.horizontal_scroll_bar.blockSignals(True)
+        self.horizontal_scroll_bar.setValue(first_column)
+        self.horizontal_scroll_bar.blockSignals(False)
+        self.column = self.horizontal_scroll_bar.value()
+        self.render()
+
+    def scroll_by(self, lines):
+        self.remember_cursor()
+        self.scroll_bar.setValue(self.scroll_bar.value() + lines)
+
+    def scroll_columns_by(self, columns):
+        self.remember_cursor()
+        self.horizontal_scroll_bar.setValue(
+            self.horizontal_scroll_bar.value() + columns)
+
+    def remember_cursor(self):
+        cursor = self.text_editor.textCursor()
+        self.cursor_line = self.text_editor.line_offset + cursor.blockNumber()
+        self.cursor_column = self.column + cursor.columnNumber()
+
+    def eventFilter(self, watched, event):
+        if event.type() == QtCore.QEvent.Resize and watched is self.text_editor:
+            self.place_scroll_bar()
+            self.update_range(0)
+            self.render()
+        elif event.type() == QtCore.QEvent.Wheel:
+            delta = event.angleDelta()
+            if delta.x() or event.modifiers() & QtCore.Qt.ShiftModifier:
+                self.scroll_columns_by(
+                    -self.wheel_columns * (delta.x() or delta.y()) // 120)
+            else:
+                self.scroll_by(-3 * delta.y() // 120)
+            return True
+        elif event.type() == QtCore.QEvent.KeyPress and watched is self.text_editor:
+            return self.handle_key(event)
+        return False
+
+    def handle_key(self, event) -> bool:
+        key = event.key()
+        cursor = self.text_editor.textCursor()
+        block_number = cursor.blockNumber()
+        last_block = self.text_editor.blockCount() - 1
+        line_number = self.text_editor.line_offset + block_number
+
+        if key == QtCore.Qt.Key_Up and block_number == 0:
+            self.scroll_by(-1)
+        elif key == QtCore.Qt.Key_Down and block_number == last_block:
+            self.scroll_by(1)
+        elif key == QtCore.Qt.Key_PageUp:
+            self.scroll_by(-self.visible_lines())
+        elif key == QtCore.Qt.Key_PageDown:
+            self.scroll_by(self.visible_lines())
+        elif key == QtCore.Qt.Key_Left and self.column > 0 and \
+                cursor.atBlockStart() and not event.modifiers():
+            self.goto_line(line_number, self.column - 1)
+        elif key == QtCore.Qt.Key_Right and not event.modifiers() and \
+                cursor.columnNumber() >= self.visible_columns() - 1 and \
+                self.mapped_file.line_length(line_number) > self.column + cursor.columnNumber():
+            # Moves the column window rather than the editor's own scrolling
+            self.goto_line(line_number, self.column + cursor.columnNumber() + 1)
+        elif event.matches(QtGui.QKeySequence.MoveToStartOfDocument):
+            self.goto_line(0)
+        elif event.matches(QtGui.QKeySequence.MoveToEndOfDocument):
+            self.goto_line(self.line_count() - 1)
+        elif event.matches(QtGui.QKeySequence.MoveToStartOfLine) and self.column > 0:
+            self.goto_line(line_number, 0)
+        elif event.matches(QtGui.QKeySequence.MoveToEndOfLine) and \
+                self.mapped_file.line_length(line_number) > self.column + self.visible_columns():
+            self.goto_line(line_number, self.mapped_file.line_length(line_number))
+        else:
+            return False
+        return True
+
+    def close(self):
+        """
+        Detaches the viewer and gives the editor back its own document
+        """
+        self.indexer.cancel()
+        self.indexer.wait()
+        self.text_editor.removeEventFilter(self)
+        self.text_editor.viewport().removeEventFilter(self)
+        self.scroll_bar.deleteLater()
+        self.horizontal_scroll_bar.deleteLater()
+        self.horizontal_scroll_bar.hide()
+
+        self.text_editor.large_file = None
+        self.text_editor.line_offset = 0
+        self.text_editor.column_offset = 0
+        self.text_editor.setVerticalScrollBarPolicy(
+            QtCore.Qt.ScrollBarAsNeeded)
+        self.text_editor.setHorizontalScrollBarPolicy(
+            QtCore.Qt.ScrollBarAsNeeded)
+        self.text_editor.clear()
+        self.text_editor.setLineWrapMode(self.line_wrap_mode)
+        self.text_editor.setReadOnly(False)
+        self.text_editor.update_line_number_area_width(0)
+
+        self.mapped_file.close()
+        self.deleteLater()
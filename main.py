@@ -1,22 +1,74 @@
-from time import sleep
+import os
+import time
+from collections import deque
 from PyQt5 import QtGui, QtWidgets, QtCore
-from typing import List, Callable
-from thread import MyThread
+from thread import AutosaveScheduler, FileLoader, FileSaver, write_text_file
+from fileio import FileFormat, TextDecoder, read_text, sniff_file
+from watcher import FileWatcher
 from texteditor import TextEditor
-from settings import Settings, Formatting
+from journal import RecoveryJournal
+from undo import UndoHistory
+from brackets import BracketIndex
+from completion import WordIndex
+from highlighter import SyntaxHighlighter, language_for
+from icons import icon
+from application import SingleInstance
+from settings import Settings, settings_model
+import instrumentation
+from instrumentation import format_size, timed
 
 
 class MainWindow(QtWidgets.QMainWindow):
 
     current_file = ""
+    loader = None
+    find_dialog = None
+    find_in_files_panel = None
+    performance_dock = None
+    file_format = FileFormat()
+    reload_position = None
+    pending_goto = None
+    load_done = None
+    # Loaded text is appended this many characters at a time, for at most
+    # load_budget seconds per turn of the event loop
+    load_slice = 1 << 16
+    load_budget = 0.004
 
     # A workaround for the encapsulated save function in create_menu_bar
-    save: List[Callable] = []
+    save: list
+
+    # Every open window, they all live in one process and share its icons,
+    # settings and highlighting rules
+    windows: list["MainWindow"] = []
+    # The settings window of the process, built when first opened
+    settings_dialog: "Settings | None" = None
 
     def __init__(self):
         super().__init__()
+        self.windows.append(self)
+        self.setAttribute(QtCore.Qt.WA_DeleteOnClose)
         self.init_UI()
 
+    @classmethod
+    def open_files(cls, paths):
+        """
+        Opens each file in a window of its own, reusing an untouched
+        untitled window if there is one
+        """
+        if not paths:
+            MainWindow()
+            return
+
+        for path in paths:
+            window = next((window for window in cls.windows
+                           if window.current_file == ""
+                           and not window.isWindowModified()), None)
+            if window is None:
+                window = MainWindow()
+            window.load_file((path, ""))
+            window.raise_()
+            window.activateWindow()
+
     def init_UI(self) -> None:
         """
         Sets up the UI and builds the window
@@ -26,14 +78,14 @@ class MainWindow(QtWidgets.QMainWindow):
         QtCore.QCoreApplication.setApplicationVersion("0.1.1")
 
         self.window_title = "untitled[*] - King's Editor"
-        icon = QtGui.QIcon("./svgs/dragon.svg")
         min_width, min_height = 800, 600
         self.setWindowTitle(self.window_title)
         self.setMinimumSize(min_width, min_height)
-        self.setWindowIcon(icon)
+        self.setWindowIcon(icon("dragon"))
         self.read_settings()
-        self.create_menu_bar()
+        self.create_file_saver()
         self.create_text_editor()
+        self.create_menu_bar()
         self.create_status_bar()
 
         QtGui.QGuiApplication.setFallbackSessionManagementEnabled(False)
@@ -42,6 +94,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.set_current_file("")
 
         self.show()
+        self.offer_recovery()
 
     def create_menu_bar(self) -> None:
         """
@@ -54,11 +107,12 @@ class MainWindow(QtWidgets.QMainWindow):
 
         def new_file():
             if (self.maybe_save()):
+                self.close_large_file()
                 self.text_editor.clear()
                 self.set_current_file("")
 
         new_file_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/file-alt.svg"), "New File", self)
+            icon("file-alt"), "New File", self)
         new_file_action.setShortcut("Ctrl+N")
         new_file_action.triggered.connect(new_file)
 
@@ -66,59 +120,69 @@ class MainWindow(QtWidgets.QMainWindow):
             MainWindow()
 
         new_window_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/window-restore.svg"), "New Window", self)
+            icon("window-restore"), "New Window", self)
         new_window_action.setShortcut("Ctrl+Shift+N")
         new_window_action.triggered.connect(new_window)
 
         def open_file():
             if (self.maybe_save()):
                 filename = QtWidgets.QFileDialog.getOpenFileName(self)
-                if not filename == "":
+                if not filename[0] == "":
                     self.load_file(filename)
 
         open_file_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/file-import.svg"), "Open File", self)
+            icon("file-import"), "Open File", self)
         open_file_action.setShortcut("Ctrl+O")
         open_file_action.triggered.connect(open_file)
 
-        def save() -> bool:
+        def save(wait=False) -> bool:
             """
             Saves a pre-exisiting file.
             """
             if self.current_file == "":
-                return save_as()
+                return save_as(wait)
             else:
-                return self.save_file(self.current_file)
+                return self.save_file(self.current_file, wait)
 
-        self.save.append(save)
+        self.save = [save]
 
         save_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/save.svg"), "Save", self)
+            icon("save"), "Save", self)
         save_action.setShortcut("Ctrl+S")
-        save_action.triggered.connect(save)
+        save_action.triggered.connect(lambda: save())
 
-        def save_as() -> bool:
+        def save_as(wait=False) -> bool:
             dialog = QtWidgets.QFileDialog(self)
             dialog.setWindowModality(QtCore.Qt.WindowModal)
             dialog.setAcceptMode(QtWidgets.QFileDialog.AcceptSave)
 
             if (dialog.exec_() != QtWidgets.QDialog.Accepted):
                 return False
-            return self.save_file(filename=dialog.selectedFiles())
+            return self.save_file(dialog.selectedFiles(), wait)
 
         save_as_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/file-export.svg"), "Save as", self)
+            icon("file-export"), "Save as", self)
         save_as_action.setShortcut("Ctrl+Shift+S")
-        save_as_action.triggered.connect(save_as)
+        save_as_action.triggered.connect(lambda: save_as())
 
         def autosave():
-            if autosave_action.isChecked():
-                self.thread = MyThread()
-                if not self.thread.isRunning():
-                    self.thread.start()
-                self.thread.value.connect(lambda num: save())
-            else:
-                self.thread.autosave_enabled = False
+            self.autosave.set_enabled(autosave_action.isChecked())
+
+        def autosave_timeout():
+            # Untitled documents would pop up the save as dialog on every tick,
+            # and a loading document is not the current file yet
+            if self.current_file == "" or self.loader is not None:
+                return
+            # Never overwrite changes made by another program unasked
+            if self.watcher.changed_on_disk():
+                self.status_bar.showMessage(
+                    "Autosave skipped, the file was changed on disk", 3000)
+                return
+            save()
+
+        self.autosave = AutosaveScheduler(
+            self.text_editor.document(), self.autosave_time, self)
+        self.autosave.timeout.connect(autosave_timeout)
 
         autosave_action = QtWidgets.QAction("Autosave", self)
         autosave_action.setShortcut("Ctrl+Alt+S")
@@ -127,12 +191,12 @@ class MainWindow(QtWidgets.QMainWindow):
         autosave_action.triggered.connect(lambda: autosave())
 
         settings_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/cogs.svg"), "Settings", self)
+            icon("cogs"), "Settings", self)
         settings_action.setShortcut("Ctrl+,")
         settings_action.triggered.connect(self.open_settings)
 
         exit_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/times.svg"), "Exit", self)
+            icon("times"), "Exit", self)
         exit_action.setShortcut("Alt+F4")
         exit_action.triggered.connect(self.close)
 
@@ -151,51 +215,70 @@ class MainWindow(QtWidgets.QMainWindow):
         edit_menu = self.menu_bar.addMenu("Edit")
 
         undo_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/undo-alt.svg"), "Undo", self)
+            icon("undo-alt"), "Undo", self)
         undo_action.setShortcut("Ctrl+Z")
         undo_action.triggered.connect(lambda: self.text_editor.undo())
 
         redo_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/redo-alt.svg"), "Redo", self)
+            icon("redo-alt"), "Redo", self)
         redo_action.setShortcut("Ctrl+Y")
         redo_action.triggered.connect(lambda: self.text_editor.redo())
 
         copy_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/copy.svg"), "Copy", self)
+            icon("copy"), "Copy", self)
         copy_action.setShortcut("Ctrl+C")
         copy_action.triggered.connect(lambda: self.text_editor.copy())
 
         cut_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/cut.svg"), "Cut", self)
+            icon("cut"), "Cut", self)
         cut_action.setShortcut("Ctrl+X")
         cut_action.triggered.connect(lambda: self.text_editor.cut())
 
         paste_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/paste.svg"), "Paste", self)
+            icon("paste"), "Paste", self)
         paste_action.setShortcut("Ctrl+V")
         paste_action.triggered.connect(lambda: self.text_editor.paste())
 
         delete_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/trash-alt.svg"), "Delete", self)
+            icon("trash-alt"), "Delete", self)
         delete_action.setShortcut("Del")
 
         search_with_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/question.svg"), "Search with DDG", self)
+            icon("question"), "Search with DDG", self)
         search_with_action.setShortcut("Ctrl+?")
 
         find_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/search.svg"), "Find", self)
+            icon("search"), "Find", self)
         find_action.setShortcut("Ctrl+F")
+        find_action.triggered.connect(lambda: self.open_find())
 
         replace_action = QtWidgets.QAction("Replace", self)
         replace_action.setShortcut("Ctrl+H")
+        replace_action.triggered.connect(lambda: self.open_find(replace=True))
+
+        find_in_files_action = QtWidgets.QAction("Find in files", self)
+        find_in_files_action.setShortcut("Ctrl+Shift+F")
+        find_in_files_action.triggered.connect(self.open_find_in_files)
 
         goto_action = QtWidgets.QAction("Go to...", self)
         goto_action.setShortcut("Ctrl+G")
+        goto_action.triggered.connect(self.open_goto)
+
+        matching_bracket_action = QtWidgets.QAction("Go to matching bracket", self)
+        matching_bracket_action.setShortcut("Ctrl+Shift+\\")
+        matching_bracket_action.triggered.connect(
+            lambda: self.text_editor.goto_matching_bracket())
+
+        complete_word_action = QtWidgets.QAction("Complete word", self)
+        complete_word_action.setShortcut("Ctrl+Space")
+        complete_word_action.triggered.connect(
+            lambda: self.text_editor.update_completion(explicit=True))
 
         toggle_line_comment = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/hashtag.svg"), "Toggle line comment", self)
+            icon("hashtag"), "Toggle line comment", self)
         toggle_line_comment.setShortcut("Ctrl+/")
+        toggle_line_comment.triggered.connect(lambda: self.edit_lines(
+            self.text_editor.toggle_line_comment, self.line_comment()))
 
         toggle_block_comment = QtWidgets.QAction("Toggle block comment", self)
         toggle_block_comment.setShortcut("Ctrl+Shift+A")
@@ -203,7 +286,8 @@ class MainWindow(QtWidgets.QMainWindow):
         edit_actions = [undo_action, redo_action, "sep",
                         copy_action, cut_action, paste_action, delete_action, "sep",
                         search_with_action, "sep",
-                        find_action, replace_action, goto_action]
+                        find_action, replace_action, find_in_files_action, goto_action,
+                        matching_bracket_action, complete_word_action]
 
         for action in edit_actions:
             if action == "sep":
@@ -215,15 +299,31 @@ class MainWindow(QtWidgets.QMainWindow):
 
         select_all_action = QtWidgets.QAction("Select all", self)
         select_all_action.setShortcut("Ctrl+A")
+        select_all_action.triggered.connect(
+            lambda: self.text_editor.selectAll())
 
         duplicate_selection = QtWidgets.QAction("Duplicate selection", self)
         duplicate_selection.setShortcut("Ctrl+Alt+D")
+        duplicate_selection.triggered.connect(
+            lambda: self.edit_lines(self.text_editor.duplicate_selection))
 
         copy_line_up = QtWidgets.QAction("Copy line up", self)
+        copy_line_up.setShortcut("Shift+Alt+Up")
+        copy_line_up.triggered.connect(
+            lambda: self.edit_lines(self.text_editor.copy_lines, down=False))
         copy_line_down = QtWidgets.QAction("Copy line down", self)
+        copy_line_down.setShortcut("Shift+Alt+Down")
+        copy_line_down.triggered.connect(
+            lambda: self.edit_lines(self.text_editor.copy_lines, down=True))
 
         move_line_up = QtWidgets.QAction("Move line up", self)
+        move_line_up.setShortcut("Alt+Up")
+        move_line_up.triggered.connect(
+            lambda: self.edit_lines(self.text_editor.move_lines, up=True))
         move_line_down = QtWidgets.QAction("Move line down", self)
+        move_line_down.setShortcut("Alt+Down")
+        move_line_down.triggered.connect(
+            lambda: self.edit_lines(self.text_editor.move_lines, up=False))
 
         selection_actions = [select_all_action, "sep",
                              duplicate_selection, "sep",
@@ -238,17 +338,14 @@ class MainWindow(QtWidgets.QMainWindow):
 
         view_menu = self.menu_bar.addMenu("View")
 
-        def word_wrap():
-            if word_wrap_action.isChecked():
-                self.text_editor.setWordWrapMode(
-                    QtGui.QTextOption.WrapAtWordBoundaryOrAnywhere)
-                return
-            self.text_editor.setWordWrapMode(QtGui.QTextOption.NoWrap)
-
         word_wrap_action = QtWidgets.QAction("Word wrap", self)
         word_wrap_action.setShortcut("Alt+Z")
         word_wrap_action.setCheckable(True)
-        word_wrap_action.triggered.connect(word_wrap)
+        word_wrap_action.setChecked(self.word_wrap)
+        # Every window follows the setting, applied by apply_setting
+        word_wrap_action.toggled.connect(
+            lambda checked: self.settings.set_value("word-wrap", checked))
+        self.word_wrap_action = word_wrap_action
 
         def fullscreen_handler():
             availableGeometry = self.screen().availableGeometry()
@@ -268,7 +365,11 @@ class MainWindow(QtWidgets.QMainWindow):
 
         page_layout_action = QtWidgets.QAction("Page layout", self)
 
-        split_editor_action = QtWidgets.QAction("Split editor", self)
+        self.split_editor_action = QtWidgets.QAction("Split editor", self)
+        self.split_editor_action.setShortcut("Ctrl+\\")
+        self.split_editor_action.setCheckable(True)
+        self.split_editor_action.triggered.connect(
+            lambda checked: self.split_editor() if checked else self.unsplit_editor())
 
         status_bar_action = QtWidgets.QAction("Status bar", self)
         status_bar_action.setCheckable(True)
@@ -276,8 +377,30 @@ class MainWindow(QtWidgets.QMainWindow):
         status_bar_action.triggered.connect(lambda: self.status_bar.setVisible(
             True) if status_bar_action.isChecked() else self.status_bar.setVisible(False))
 
+        # Like tail -f, appends to the file are added to the end of the document
+        self.follow_file_action = QtWidgets.QAction("Follow file", self)
+        self.follow_file_action.setCheckable(True)
+        self.follow_file_action.triggered.connect(
+            lambda checked: self.text_editor.moveCursor(QtGui.QTextCursor.End) if checked else None)
+
+        fold_action = QtWidgets.QAction("Fold", self)
+        fold_action.setShortcut("Ctrl+Shift+[")
+        fold_action.triggered.connect(lambda: self.text_editor.fold())
+        unfold_action = QtWidgets.QAction("Unfold", self)
+        unfold_action.setShortcut("Ctrl+Shift+]")
+        unfold_action.triggered.connect(lambda: self.text_editor.unfold())
+        unfold_all_action = QtWidgets.QAction("Unfold all", self)
+        unfold_all_action.triggered.connect(lambda: self.text_editor.unfold_all())
+
+        performance_action = QtWidgets.QAction("Performance monitor", self)
+        performance_action.setShortcut("Ctrl+Shift+M")
+        performance_action.triggered.connect(self.open_performance_dock)
+
         view_actions = [word_wrap_action, fullscreen_action, "sep",
-                        page_layout_action, split_editor_action, status_bar_action]
+                        page_layout_action, self.split_editor_action, status_bar_action,
+                        self.follow_file_action, "sep",
+                        fold_action, unfold_action, unfold_all_action, "sep",
+                        performance_action]
 
         for action in view_actions:
             if action == "sep":
@@ -287,37 +410,56 @@ class MainWindow(QtWidgets.QMainWindow):
 
         help_menu = self.menu_bar.addMenu("Help")
 
+        # Most sessions never open the Help menu, so it is filled on first use
+        help_menu.aboutToShow.connect(
+            lambda: self.populate_help_menu(help_menu))
+
+        toolbar = self.addToolBar("Toolbar")
+        toolbar.addAction(new_file_action)
+        toolbar.addAction(save_action)
+        toolbar.addAction(copy_action)
+        toolbar.addAction(cut_action)
+        toolbar.addAction(paste_action)
+        toolbar.addAction(undo_action)
+        toolbar.addAction(redo_action)
+
+        self.setMenuBar(self.menu_bar)
+
+    def populate_help_menu(self, help_menu):
+        if not help_menu.isEmpty():
+            return
+
         view_help_action = QtWidgets.QAction("View help", self)
         view_help_action.setShortcut("F1")
 
         documentation_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/table.svg"), "Documentation", self)
+            icon("table"), "Documentation", self)
 
         release_notes_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/list.svg"), "Release notes", self)
+            icon("list"), "Release notes", self)
 
-        keybd_shortcut = QtWidgets.QAction(QtGui.QIcon(
-            "./svgs/toolbox.svg"), "Keyboard shortcut reference", self)
+        keybd_shortcut = QtWidgets.QAction(
+            icon("toolbox"), "Keyboard shortcut reference", self)
 
         tips_and_tricks_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/info.svg"), "Tips and tricks", self)
+            icon("info"), "Tips and tricks", self)
 
-        join_us_action = QtWidgets.QAction(QtGui.QIcon(
-            "./svgs/twitter.svg"), "Join us on twitter", self)
+        join_us_action = QtWidgets.QAction(
+            icon("twitter"), "Join us on twitter", self)
 
         feature_request_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/inbox.svg"), "Feature request", self)
+            icon("inbox"), "Feature request", self)
 
         report_issue_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/sad-tear.svg"), "Report issue", self)
+            icon("sad-tear"), "Report issue", self)
 
         view_license_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/thumbs-up.svg"), "View license", self)
+            icon("thumbs-up"), "View license", self)
 
         check_for_updates_action = QtWidgets.QAction("Check for updates", self)
 
         send_feeback_action = QtWidgets.QAction(
-            QtGui.QIcon("./svgs/medal.svg"), "Send feedback", self)
+            icon("medal"), "Send feedback", self)
 
         def about_handler():
             about = self.read_file("about.txt")
@@ -325,8 +467,8 @@ class MainWindow(QtWidgets.QMainWindow):
             message = QtWidgets.QMessageBox()
             message.about(self, "About King's Editor", about)
 
-        about_action = QtWidgets.QAction(QtGui.QIcon(
-            "./svgs/info-circle.svg"), "About King's Editor", self)
+        about_action = QtWidgets.QAction(
+            icon("info-circle"), "About King's Editor", self)
         about_action.triggered.connect(about_handler)
 
         help_actions = [view_help_action, documentation_action, release_notes_action, keybd_shortcut, tips_and_tricks_action, join_us_action,
@@ -335,47 +477,303 @@ class MainWindow(QtWidgets.QMainWindow):
         for action in help_actions:
             help_menu.addAction(action)
 
-        toolbar = self.addToolBar("Toolbar")
-        toolbar.addAction(new_file_action)
-        toolbar.addAction(save_action)
-        toolbar.addAction(copy_action)
-        toolbar.addAction(cut_action)
-        toolbar.addAction(paste_action)
-        toolbar.addAction(undo_action)
-        toolbar.addAction(redo_action)
-
-        self.setMenuBar(self.menu_bar)
-
     def create_text_editor(self):
-        self.text_editor = TextEditor()
-        self.setCentralWidget(self.text_editor)
-        self.text_editor.setTabStopDistance(QtGui.QFontMetricsF.horizontalAdvance(
-            QtGui.QFontMetricsF(QtGui.QFont("Arial")), " ") * self.tab_size)
-        self.text_editor.cursorPositionChanged.connect(
-            self.update_cursor_position)
+        # Stacked vertically so that split views are as wide as each other
+        # and wrap their shared document layout at the same width
+        self.editor_splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical, self)
+        self.setCentralWidget(self.editor_splitter)
+
+        # Cursor moves are coalesced into at most one status bar update per frame
+        self.cursor_timer = QtCore.QTimer(self)
+        self.cursor_timer.setSingleShot(True)
+        self.cursor_timer.setInterval(16)
+        self.cursor_timer.timeout.connect(self.show_cursor_position)
+
+        self.text_editors = []
+        self.text_editor = self.add_text_editor()
         self.text_editor.textChanged.connect(self.document_was_modified)
-        self.text_editor.setLineWrapMode(self.text_editor.NoWrap)
-        self.text_editor.setLineWrapMode(self.text_editor.WidgetWidth)
-        self.text_editor.blockCountChanged.connect(
-            self.text_editor.update_line_number_area_width)
-        self.text_editor.updateRequest.connect(
-            self.text_editor.update_line_number_area)
-        self.text_editor.update_line_number_area_width(0)
+        # QTextDocument.revision() also counts highlighting, which goes on
+        # in the background, so saves compare the edits they have seen
+        self.edit_count = 0
+        self.text_editor.document().contentsChange.connect(self.count_edit)
+        self.text_editor.setLineWrapMode(self.line_wrap_mode())
+
+        self.journal = RecoveryJournal(self.text_editor.document(), self)
+        self.undo_history = UndoHistory(
+            self.text_editor.document(), self.undo_budget << 20, self.text_editors, self)
+        self.undo_history.compacted.connect(self.document_was_modified)
+        self.bracket_index = BracketIndex(self.text_editor.document(), self)
+        self.text_editor.bracket_index = self.bracket_index
+        self.word_index = WordIndex(self.text_editor.document(), self)
+        self.text_editor.word_index = self.word_index
+        self.highlighter = SyntaxHighlighter(self.text_editor)
+        self.text_editor.highlighter = self.highlighter
+
+        self.watcher = FileWatcher(self)
+        self.watcher.changed.connect(self.file_changed_on_disk)
+        self.watcher.appended.connect(self.file_appended)
+        self.watcher.removed.connect(self.file_removed)
+        self.asking_reload = False
+
+        self.text_editor.setFocus()
+
+    def add_text_editor(self, document=None) -> TextEditor:
+        """
+        Adds a view to the editor splitter, showing document if given
+        """
+        text_editor = TextEditor()
+        if document is not None:
+            # Views share the document and its layout, never a copy of the
+            # text. The layout is redone whenever a view changes its width,
+            # so the view is sized like the current one before it is shown.
+            text_editor.resize(self.text_editor.size())
+            text_editor.setLineWrapMode(self.text_editor.lineWrapMode())
+            text_editor.setReadOnly(self.text_editor.isReadOnly())
+            text_editor.setDocument(document)
+            text_editor.bracket_index = self.bracket_index
+            text_editor.word_index = self.word_index
+            text_editor.highlighter = self.highlighter
+
+        self.apply_format(text_editor)
+        text_editor.cursorPositionChanged.connect(self.update_cursor_position)
+        text_editor.selectionChanged.connect(self.update_cursor_position)
+        text_editor.textChanged.connect(self.update_cursor_position)
+        text_editor.cursorPositionChanged.connect(text_editor.reveal_cursor)
+        text_editor.cursorPositionChanged.connect(
+            text_editor.highlight_current_line)
+        text_editor.cursorPositionChanged.connect(text_editor.highlight_brackets)
+        text_editor.focused.connect(
+            lambda: self.set_active_text_editor(text_editor))
+        text_editor.blockCountChanged.connect(
+            text_editor.update_line_number_area_width)
+        text_editor.updateRequest.connect(text_editor.update_line_number_area)
+        text_editor.update_line_number_area_width(0)
+        text_editor.highlight_current_line()
+
+        self.editor_splitter.addWidget(text_editor)
+        self.text_editors.append(text_editor)
+        return text_editor
+
+    def split_editor(self):
+        """
+        Opens a second view of the document below the current one
+        """
+        if len(self.text_editors) > 1:
+            return
+        if self.text_editor.large_file is not None:
+            # The viewer swaps the document's text as it scrolls
+            self.split_editor_action.setChecked(False)
+            self.status_bar.showMessage(
+                "Split editor is not available for large files", 3000)
+            return
+
+        text_editor = self.add_text_editor(self.text_editor.document())
+        text_editor.setTextCursor(self.text_editor.textCursor())
+        self.highlighter.add_view(text_editor)
+        self.split_editor_action.setChecked(True)
+        text_editor.setFocus()
+        text_editor.centerCursor()
+
+    def unsplit_editor(self):
+        """
+        Closes the second view, the first one owns the document
+        """
+        self.split_editor_action.setChecked(False)
+        if len(self.text_editors) < 2:
+            return
+
+        text_editor = self.text_editors.pop()
+        self.highlighter.remove_view(text_editor)
+        self.set_active_text_editor(self.text_editors[0])
+        text_editor.hide()
+        text_editor.deleteLater()
+        self.text_editor.setFocus()
+
+    def set_active_text_editor(self, text_editor):
+        """
+        Points the menus and the status bar at the focused view
+        """
+        if text_editor is self.text_editor:
+            return
+        self.text_editor = text_editor
+        if self.find_dialog is not None:
+            self.find_dialog.set_text_editor(text_editor)
+        self.update_cursor_position()
+
+    def edit_lines(self, operation, *args, **kwargs):
+        # The large file viewer and a loading document are read-only
+        if not self.text_editor.isReadOnly():
+            operation(*args, **kwargs)
+
+    def line_comment(self) -> str:
+        language = self.highlighter.language
+        if language is not None and language.line_comment:
+            return language.line_comment
+        return "#"
+
+    def open_find(self, replace=False):
+        if self.text_editor.large_file is not None:
+            self.status_bar.showMessage(
+                "Find is not available for large files", 3000)
+            return
+        if self.find_dialog is None:
+            # Imported on first use to keep it out of the startup path
+            from find_replace import FindReplaceDialog
+            self.find_dialog = FindReplaceDialog(self.text_editor, self)
+        self.find_dialog.open_find(replace)
+
+    def open_find_in_files(self):
+        if self.find_in_files_panel is None:
+            # Imported on first use to keep it out of the startup path
+            from find_in_files import FindInFilesPanel
+            self.find_in_files_panel = FindInFilesPanel(self)
+            self.find_in_files_panel.open_location.connect(self.open_location)
+            self.addDockWidget(QtCore.Qt.BottomDockWidgetArea,
+                               self.find_in_files_panel)
+
+        directory = None
+        if self.current_file != "":
+            directory = os.path.dirname(self.current_file[0])
+        self.find_in_files_panel.open_panel(directory)
+
+    def open_performance_dock(self):
+        if self.performance_dock is None:
+            self.performance_dock = instrumentation.PerformanceDock(self, [
+                ("Undo history", lambda: self.undo_history.footprint),
+                ("Word index", self.word_index.footprint)])
+            self.addDockWidget(QtCore.Qt.RightDockWidgetArea,
+                               self.performance_dock)
+        self.performance_dock.show()
+        self.performance_dock.raise_()
+
+    def open_location(self, filename, line_number, column):
+        """
+        Shows a line of a file, loading the file first if it is not open
+        """
+        if self.current_file != "" and self.loader is None and \
+                os.path.abspath(self.current_file[0]) == os.path.abspath(filename):
+            self.goto_line(line_number, column)
+            return
+        if not self.maybe_save():
+            return
+
+        self.pending_goto = (line_number, column)
+        self.load_file((filename, ""))
+        # Large files open without a loader, failures leave no file
+        if self.loader is None:
+            if self.current_file != "" and self.current_file[0] == filename:
+                self.goto_line(line_number, column)
+            self.pending_goto = None
+
+    def open_goto(self):
+        cursor = self.text_editor.textCursor()
+        current = f"{cursor.blockNumber() + self.text_editor.line_offset + 1}:{cursor.columnNumber() + self.text_editor.column_offset}"
+        text, accepted = QtWidgets.QInputDialog.getText(
+            self, "Go to", f"Line[:Column] (1 - {self.text_editor.line_count()}):", text=current)
+        if not accepted:
+            return
+
+        try:
+            numbers = [int(number) for number in text.split(":")]
+        except ValueError:
+            numbers = []
+        if not 1 <= len(numbers) <= 2:
+            self.status_bar.showMessage(f"Invalid position: {text}", 3000)
+            return
+        self.goto_line(*numbers)
+
+    def goto_line(self, line_number, column_number=0):
+        """
+        Moves the cursor to a one-based line and a column, as shown in the
+        status bar, without walking the document
+        """
+        line_number = max(1, min(line_number, self.text_editor.line_count()))
+        column_number = max(0, column_number)
+
+        if self.text_editor.large_file is not None:
+            self.text_editor.large_file.goto_line(
+                line_number - 1, column_number)
+            return
 
+        block = self.text_editor.document().findBlockByNumber(line_number - 1)
+        cursor = QtGui.QTextCursor(block)
+        cursor.setPosition(block.position() +
+                           min(column_number, block.length() - 1))
+        self.text_editor.setTextCursor(cursor)
+        self.text_editor.centerCursor()
         self.text_editor.setFocus()
 
+    def line_wrap_mode(self) -> QtWidgets.QPlainTextEdit.LineWrapMode:
+        if self.word_wrap:
+            return QtWidgets.QPlainTextEdit.WidgetWidth
+        return QtWidgets.QPlainTextEdit.NoWrap
+
+    def set_word_wrap(self, word_wrap):
+        """
+        Switches every view between wrapping lines at the window width and
+        scrolling them sideways, with a single relayout each
+        """
+        self.word_wrap = word_wrap
+        if self.text_editor.large_file is not None:
+            # The viewer never wraps, its editor gets the mode back on close
+            self.text_editor.large_file.line_wrap_mode = self.line_wrap_mode()
+            return
+        for text_editor in self.text_editors:
+            text_editor.setLineWrapMode(self.line_wrap_mode())
+
+    def count_edit(self, position, removed, added):
+        self.edit_count += 1
+
     def document_was_modified(self):
         self.setWindowModified(self.text_editor.document().isModified())
 
+    @timed("Cursor update")
     def update_cursor_position(self):
+        if not self.cursor_timer.isActive():
+            self.cursor_timer.start()
+
+    @timed("Status bar update")
+    def show_cursor_position(self):
+        """
+        Updates the cursor tracker and the document metrics in the status bar.
+
+        Everything shown here is kept up to date by QTextDocument itself, so
+        no update ever has to scan the text.
+        """
         cursor = self.text_editor.textCursor()
 
-        line_number = cursor.blockNumber() + 1
+        line_number = cursor.blockNumber() + self.text_editor.line_offset + 1
 
-        column_number = cursor.columnNumber()
+        column_number = cursor.columnNumber() + self.text_editor.column_offset
 
-        self.status_bar.showMessage(
-            f"Line {line_number} | Col {column_number}")
+        message = f"Line {line_number} | Col {column_number}"
+        if not self.status_bar.currentMessage() == message:
+            self.status_bar.showMessage(message)
+
+        selected = cursor.selectionEnd() - cursor.selectionStart()
+        self.set_status_label(self.selection_label,
+                              f"{selected} selected" if selected else "")
+
+        if self.text_editor.large_file is not None:
+            size = len(self.text_editor.large_file.mapped_file.data)
+            self.set_status_label(
+                self.document_label, f"{self.text_editor.line_count()} lines, {size} bytes")
+        else:
+            characters = self.text_editor.document().characterCount() - 1
+            self.set_status_label(
+                self.document_label, f"{self.text_editor.line_count()} lines, {characters} characters")
+
+        self.set_status_label(
+            self.encoding_label, f"{self.file_format.label()}  {self.file_format.newline_label()}")
+
+        footprint = self.undo_history.footprint
+        self.set_status_label(
+            self.undo_label, f"Undo {format_size(footprint)}" if footprint else "")
+
+    def set_status_label(self, label, text):
+        if not label.text() == text:
+            label.setText(text)
+            label.setVisible(not text == "")
 
     def create_status_bar(self):
         cursor = self.text_editor.textCursor()
@@ -384,56 +782,226 @@ class MainWindow(QtWidgets.QMainWindow):
 
         column_number = cursor.columnNumber()
 
-        self.tab_size = self.updated_tab_size()
-
         self.status_bar = self.statusBar()
 
-        def space_handler():
-            self.open_settings()
-            self.text_editor.setTabStopDistance(QtGui.QFontMetricsF.horizontalAdvance(
-                QtGui.QFontMetricsF(QtGui.QFont("Arial")), " ") * self.tab_size)
-            spaces.setText(f"Spaces: {self.tab_size}")
-            self.text_editor.setFocus()
-
-        spaces = QtWidgets.QPushButton(f"Spaces: {self.tab_size}")
-        spaces.setStyleSheet("border: none")
-        spaces.clicked.connect(space_handler)
-        self.status_bar.addPermanentWidget(spaces)
+        self.spaces_button = QtWidgets.QPushButton(f"Spaces: {self.tab_size}")
+        self.spaces_button.setStyleSheet("border: none")
+        self.spaces_button.clicked.connect(self.open_settings)
+
+        self.load_progress = QtWidgets.QProgressBar()
+        self.load_progress.setRange(0, 100)
+        self.load_progress.setMaximumWidth(150)
+        self.load_progress.setVisible(False)
+        self.cancel_load_button = QtWidgets.QPushButton("Cancel")
+        self.cancel_load_button.setStyleSheet("border: none")
+        self.cancel_load_button.setVisible(False)
+        self.cancel_load_button.clicked.connect(self.cancel_loading)
+        self.loaded_chunks = deque()
+        self.loaded_offset = 0  # Of the first loaded chunk not yet appended
+        self.append_timer = QtCore.QTimer(self)
+        self.append_timer.setInterval(0)
+        self.append_timer.timeout.connect(self.append_loaded_slices)
+
+        self.selection_label = QtWidgets.QLabel()
+        self.document_label = QtWidgets.QLabel()
+        self.encoding_label = QtWidgets.QLabel()
+        self.undo_label = QtWidgets.QLabel()
+        self.undo_label.setToolTip("Memory held by the undo history")
+
+        self.status_bar.addPermanentWidget(self.load_progress)
+        self.status_bar.addPermanentWidget(self.cancel_load_button)
+        self.status_bar.addPermanentWidget(self.selection_label)
+        self.status_bar.addPermanentWidget(self.document_label)
+        self.status_bar.addPermanentWidget(self.undo_label)
+        self.status_bar.addPermanentWidget(self.spaces_button)
+        self.status_bar.addPermanentWidget(self.encoding_label)
         self.status_bar.showMessage("Ready")
         self.status_bar.showMessage(
             f"Line {line_number} | Col {column_number}")
+        self.show_cursor_position()
 
     def read_file(self, filename) -> str:
-        text_in_file = ""
-
-        with open(filename) as file:
-            for line in file:
-                text_in_file += line
-        return text_in_file
+        return read_text(os.path.join(os.path.dirname(os.path.abspath(__file__)), filename))[0]
 
     def load_file(self, filename):
+        """
+        Streams the file into the editor in chunks read by a worker thread
+        """
         file = QtCore.QFile(filename[0])
 
         if not (file.open(QtCore.QFile.ReadOnly | QtCore.QFile.Text)):
             QtWidgets.QMessageBox.warning(
                 self, "Application", f"Cannot read file {QtCore.QDir.toNativeSeparators(filename[0])}:\n{file.errorString()}.")
             return
+        file.close()
 
-        input_stream = QtCore.QTextStream(file)
+        self.journal.recording = False
+        self.highlighter.set_language(None)
+        self.stop_loader()
+        self.close_large_file()
 
-        QtGui.QGuiApplication.restoreOverrideCursor()
-
-        self.text_editor.setPlainText(input_stream.readAll())
+        if file.size() > self.large_file_threshold * 1024 * 1024:
+            self.open_large_file(filename)
+            return
 
-        QtGui.QGuiApplication.restoreOverrideCursor()
+        self.text_editor.clear()
+        self.text_editor.document().setUndoRedoEnabled(False)
+        for text_editor in self.text_editors:
+            text_editor.setReadOnly(True)
+        # Highlight the chunks as they arrive instead of all at once at the end
+        self.highlighter.set_language(language_for(
+            filename[0]), lazy=file.size() > self.highlighter.lazy_file_size)
+        # What is out of sight is highlighted and indexed once loaded, the
+        # idle passes would otherwise take turns with appending the text
+        self.highlighter.set_paused(True)
+        self.word_index.set_paused(True)
+
+        self.loader = FileLoader(filename[0], self.long_line_length, self)
+        self.loader.chunk_read.connect(self.append_loaded_chunk)
+        self.loader.long_line.connect(lambda: self.open_long_lines(filename))
+        self.loader.progress.connect(self.load_progress.setValue)
+        self.loader.loaded.connect(lambda: self.loader_finished(filename))
+        self.loader.failed.connect(
+            lambda error: self.loading_failed(filename, error))
+
+        self.load_progress.setValue(0)
+        self.load_progress.setVisible(True)
+        self.cancel_load_button.setVisible(True)
+        self.status_bar.showMessage("Loading file...")
+        self.load_started = time.perf_counter()
+        self.loader.start()
+
+    def append_loaded_chunk(self, chunk):
+        self.loaded_chunks.append(chunk)
+        self.append_timer.start()
+
+    def append_loaded_slices(self):
+        """
+        Appends the loaded text a slice at a time until the turn's budget is
+        spent, a whole chunk in one insertText would freeze the window
+        """
+        document = self.text_editor.document()
+        cursor = QtGui.QTextCursor(document)
+        cursor.movePosition(QtGui.QTextCursor.End)
+        deadline = time.perf_counter() + self.load_budget
+        while self.loaded_chunks and time.perf_counter() < deadline:
+            chunk = self.loaded_chunks[0]
+            end = self.loaded_offset + self.load_slice
+            cursor.insertText(chunk[self.loaded_offset:end])
+            self.loaded_offset = end
+            if end >= len(chunk):
+                self.loaded_chunks.popleft()
+                self.loaded_offset = 0
+                self.loader.chunk_consumed()
+        # The text of the file is no edit, and the document is still unnamed
+        # until the load finishes, so there is nothing to save yet
+        document.setModified(False)
+        self.setWindowModified(False)
 
+        if not self.loaded_chunks:
+            self.append_timer.stop()
+            if self.load_done is not None:
+                self.finish_loading(self.load_done)
+
+    def loader_finished(self, filename):
+        # The last chunks may still be waiting to be appended
+        self.load_done = filename
+        if not self.loaded_chunks:
+            self.finish_loading(filename)
+
+    def finish_loading(self, filename):
+        instrumentation.record("Load file", time.perf_counter() - self.load_started)
+        self.file_format = self.loader.file_format
+        self.stop_loader()
         self.set_current_file(filename)
+        self.restore_position()
         self.status_bar.showMessage("File loaded", 3000)
 
+    def loading_failed(self, filename, error):
+        self.stop_loader()
+        self.text_editor.clear()
+        self.set_current_file("")
+        QtWidgets.QMessageBox.warning(
+            self, "Application", f"Cannot read file {QtCore.QDir.toNativeSeparators(filename[0])}:\n{error}.")
+
+    def cancel_loading(self):
+        if self.loader is None:
+            return
+        self.stop_loader()
+        self.text_editor.clear()
+        self.set_current_file("")
+        self.status_bar.showMessage("Loading cancelled", 3000)
+
+    def open_long_lines(self, filename):
+        """
+        Drops what was loaded of a file with a line too long to lay out and
+        opens it in the viewer instead
+        """
+        self.stop_loader()
+        self.highlighter.set_language(None)
+        self.text_editor.clear()
+        self.open_large_file(filename, "Long lines, file opened read-only")
+        # A reload position is one in the loaded document
+        self.reload_position = None
+        if self.pending_goto is not None:
+            self.restore_position()
+
+    def stop_loader(self):
+        """
+        Stops a running loader and puts the editor back in its editable state
+        """
+        if self.loader is not None:
+            self.loader.disconnect()
+            self.loader.cancel()
+            self.loader.wait()
+            self.loader = None
+        self.append_timer.stop()
+        self.loaded_chunks.clear()
+        self.loaded_offset = 0
+        self.load_done = None
+        self.highlighter.set_paused(False)
+        self.word_index.set_paused(False)
+
+        self.load_progress.setVisible(False)
+        self.cancel_load_button.setVisible(False)
+        for text_editor in self.text_editors:
+            text_editor.setReadOnly(False)
+        self.text_editor.document().setUndoRedoEnabled(True)
+
+    @timed("Open large file")
+    def open_large_file(self, filename, message="Large file opened read-only"):
+        """
+        Opens the file in the read-only, memory-mapped viewer
+        """
+        from largefile import LargeFileViewer
+
+        self.unsplit_editor()
+        try:
+            LargeFileViewer(self.text_editor, filename[0])
+        except (OSError, ValueError) as error:
+            QtWidgets.QMessageBox.warning(
+                self, "Application", f"Cannot read file {QtCore.QDir.toNativeSeparators(filename[0])}:\n{error}.")
+            return
+
+        self.file_format = sniff_file(filename[0])
+        self.set_current_file(filename)
+        self.status_bar.showMessage(message, 3000)
+
+    def close_large_file(self):
+        if self.text_editor.large_file is not None:
+            self.text_editor.large_file.close()
+
     def set_current_file(self, filename):
         self.current_file = filename
+        if filename == "":
+            self.file_format = FileFormat()
         self.text_editor.document().setModified(False)
         self.setWindowModified(False)
+        self.journal.reset(filename)
+        self.journal.recording = self.text_editor.large_file is None
+        self.watcher.watch(filename)
+        self.tail_decoder = TextDecoder(self.file_format)
+        self.update_language()
 
         shown_name = self.current_file
 
@@ -446,32 +1014,199 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setWindowFilePath(shown_name)
         self.setWindowTitle(shown_name)
 
-    def save_file(self, filename) -> bool:
-        error_message = ""
-        QtGui.QGuiApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
-        file = QtCore.QSaveFile(filename[0])
-        if (file.open(QtCore.QIODevice.WriteOnly | QtCore.QIODevice.Text)):
-            out = QtCore.QTextStream(file)
-            out << self.text_editor.toPlainText()
-            self.setWindowTitle(f"{filename[0]}[*] - King's Editor")
-
-            if not (file.commit()):
-                error_message = f"Cannot write file {QtCore.QDir.toNativeSeparators(filename[0])}:\n{file.errorString()}"
-        else:
-            error_message = f"Cannot open file {QtCore.QDir.toNativeSeparators(filename[0])} for writing:\n{file.errorString()}"
+    def create_file_saver(self):
+        self.saver = FileSaver(self)
+        self.saver.saved.connect(self.file_saved)
+        self.saver.start()
+
+    def update_language(self):
+        filename = self.current_file
+        if type(filename) == tuple or type(filename) == list:
+            filename = filename[0]
+
+        language = None
+        if self.text_editor.large_file is None:
+            language = language_for(filename)
+        self.highlighter.set_language(language)
+
+    @timed("Save file")
+    def save_file(self, filename, wait=False) -> bool:
+        """
+        Hands a snapshot of the document to the saver thread.
+
+        With wait set, the snapshot is written before returning, which is
+        what callers that are about to discard the document need.
+        """
+        if self.text_editor.large_file is not None:
+            self.status_bar.showMessage(
+                "Large files are opened read-only", 3000)
+            return False
+
+        if self.loader is not None:
+            # A half loaded file must never be written over any file
+            self.status_bar.showMessage(
+                "The file is still loading", 3000)
+            return False
+
+        if self.current_file != "" and filename[0] == self.current_file[0] and \
+                self.watcher.changed_on_disk():
+            ret = QtWidgets.QMessageBox.question(
+                self, "Application", "The file has been changed by another program.\nDo you want to overwrite it?")
+            if ret != QtWidgets.QMessageBox.Yes:
+                return False
+
+        text = self.text_editor.toPlainText()
+        # Our own write is not a change made by another program
+        self.watcher.watch("")
 
+        if not wait:
+            self.saver.submit(filename[0], text,
+                              self.edit_count, self.file_format)
+            return True
+
+        QtGui.QGuiApplication.setOverrideCursor(QtCore.Qt.WaitCursor)
+        self.saver.discard_pending()
+        error_message = write_text_file(filename[0], text, self.file_format)
         QtGui.QGuiApplication.restoreOverrideCursor()
+        return self.file_saved(filename[0], self.edit_count, error_message)
 
+    def file_saved(self, filename, revision, error_message) -> bool:
         if not error_message == "":
+            self.watcher.watch(self.current_file)
             message_box = QtWidgets.QMessageBox()
             message_box.warning(self, "Application", error_message)
 
             return False
 
-        self.set_current_file(filename)
+        if self.loader is not None:
+            # Another file was opened meanwhile, it becomes the current file
+            # and its journal starts when it is loaded
+            self.status_bar.showMessage("File Saved", 2000)
+            return True
+
+        # Edits made while the snapshot was being written keep it modified
+        modified = self.edit_count != revision
+        self.set_current_file([filename])
+        self.text_editor.document().setModified(modified)
+        self.setWindowModified(modified)
+        if modified:
+            self.journal.compact()
         self.status_bar.showMessage("File Saved", 2000)
         return True
 
+    def offer_recovery(self):
+        """
+        Offers to restore the unsaved changes of a session that crashed
+        """
+        for path in RecoveryJournal.orphaned_journals():
+            try:
+                recovered = RecoveryJournal.recover(path)
+            except (OSError, ValueError):
+                recovered = None
+
+            if recovered is None:
+                RecoveryJournal.remove(path)
+                continue
+
+            filename, text = recovered
+            shown_name = filename.split("/")[-1] if filename else "untitled.txt"
+            ret = QtWidgets.QMessageBox.question(
+                self, "Application", f"King's Editor was not closed properly.\nDo you want to restore your unsaved changes to {shown_name}?")
+            RecoveryJournal.remove(path)
+
+            if ret == QtWidgets.QMessageBox.Yes:
+                if os.path.exists(filename):
+                    self.file_format = sniff_file(filename)
+                self.text_editor.setPlainText(text)
+                self.set_current_file([filename] if filename else "")
+                self.text_editor.document().setModified(True)
+                self.setWindowModified(True)
+                self.journal.compact()
+            return
+
+    def reload_file(self):
+        """
+        Loads the current file again, keeping the cursor and scroll position
+        """
+        self.reload_position = (self.text_editor.textCursor().position(),
+                                self.text_editor.verticalScrollBar().value())
+        self.load_file(self.current_file)
+
+    def restore_position(self):
+        if self.pending_goto is not None:
+            line_number, column = self.pending_goto
+            self.pending_goto = None
+            self.goto_line(line_number, column)
+            return
+        if self.reload_position is None:
+            self.text_editor.moveCursor(QtGui.QTextCursor.Start)
+            return
+        position, scroll = self.reload_position
+        self.reload_position = None
+        cursor = self.text_editor.textCursor()
+        cursor.setPosition(
+            min(position, self.text_editor.document().characterCount() - 1))
+        self.text_editor.setTextCursor(cursor)
+        self.text_editor.verticalScrollBar().setValue(scroll)
+
+    def file_changed_on_disk(self):
+        """
+        Reloads a clean document, asks before throwing away unsaved changes
+        """
+        if self.loader is not None or self.asking_reload:
+            return
+        if not self.text_editor.document().isModified():
+            self.reload_file()
+            self.status_bar.showMessage(
+                "File reloaded, it was changed on disk", 3000)
+            return
+
+        self.asking_reload = True
+        ret = QtWidgets.QMessageBox.question(
+            self, "Application", "The file has been changed by another program.\nDo you want to reload it and lose your changes?")
+        self.asking_reload = False
+        if ret == QtWidgets.QMessageBox.Yes:
+            self.reload_file()
+
+    def file_appended(self, old_size, new_size):
+        """
+        Reads only the new bytes into the document when following the file
+        """
+        document = self.text_editor.document()
+        if not self.follow_file_action.isChecked() or document.isModified() or \
+                self.text_editor.large_file is not None or old_size == 0:
+            self.file_changed_on_disk()
+            return
+        if self.loader is not None:
+            return
+
+        try:
+            with open(self.current_file[0], "rb") as file:
+                file.seek(old_size)
+                text = self.tail_decoder.decode(file.read(new_size - old_size))
+        except OSError:
+            self.file_changed_on_disk()
+            return
+
+        at_end = self.text_editor.textCursor().atEnd()
+        cursor = QtGui.QTextCursor(document)
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(text)
+        if at_end:
+            self.text_editor.moveCursor(QtGui.QTextCursor.End)
+
+        # The document matches the file again, start the journal over on it
+        document.setModified(False)
+        self.setWindowModified(False)
+        self.journal.reset(self.current_file)
+
+    def file_removed(self):
+        # Saving will write it back, so closing has to offer it
+        self.text_editor.document().setModified(True)
+        self.setWindowModified(True)
+        self.status_bar.showMessage(
+            "The file was deleted or moved by another program", 5000)
+
     def maybe_save(self) -> bool:
         if not self.text_editor.document().isModified():
             return True
@@ -480,47 +1215,106 @@ class MainWindow(QtWidgets.QMainWindow):
                                             QtWidgets.QMessageBox.Save | QtWidgets.QMessageBox.Discard | QtWidgets.QMessageBox.Cancel)
         if ret == QtWidgets.QMessageBox.Save:
 
-            return self.save[0]()
+            return self.save[0](wait=True)
 
         elif ret == QtWidgets.QMessageBox.Cancel:
             return False
         return True
 
     def open_settings(self):
-        Settings()
-        self.tab_size = self.updated_tab_size()
+        if MainWindow.settings_dialog is None:
+            MainWindow.settings_dialog = Settings(self.settings)
+        MainWindow.settings_dialog.show()
+        MainWindow.settings_dialog.raise_()
+        MainWindow.settings_dialog.activateWindow()
+
+    def apply_setting(self, key, value):
+        """
+        Applies a setting changed in any window to this one
+        """
+        if key in ("font-family", "font-size", "text-color", "tab-size"):
+            self.tab_size = self.settings.value("tab-size")
+            for text_editor in self.text_editors:
+                self.apply_format(text_editor)
+            self.spaces_button.setText(f"Spaces: {self.tab_size}")
+        elif key == "autosave-time":
+            self.autosave_time = value
+            self.autosave.set_interval(value)
+        elif key == "undo-budget":
+            self.undo_budget = value
+            self.undo_history.set_budget(value << 20)
+        elif key == "large-file-threshold":
+            self.large_file_threshold = value
+        elif key == "long-line-length":
+            self.long_line_length = value
+        elif key == "word-wrap":
+            self.word_wrap_action.setChecked(value)
+            self.set_word_wrap(value)
+
+    def apply_format(self, text_editor):
+        """
+        Gives a view the font, text color and tab size of the settings,
+        setting only what differs since each change lays out the document
+        again
+        """
+        settings = self.settings
+        font = QtWidgets.QApplication.font(text_editor)
+        if settings.value("font-family"):
+            font.setFamily(settings.value("font-family"))
+        if settings.value("font-size"):
+            font.setPointSize(settings.value("font-size"))
+        if text_editor.font() != font:
+            text_editor.setFont(font)
+
+        palette = text_editor.palette()
+        color = QtGui.QColor(settings.value("text-color")) if settings.value("text-color") \
+            else QtWidgets.QApplication.palette(text_editor).color(QtGui.QPalette.Text)
+        if palette.color(QtGui.QPalette.Text) != color:
+            palette.setColor(QtGui.QPalette.Text, color)
+            text_editor.setPalette(palette)
+
+        distance = QtGui.QFontMetricsF(font).horizontalAdvance(" ") * self.tab_size
+        if text_editor.tabStopDistance() != distance:
+            text_editor.setTabStopDistance(distance)
 
     def read_settings(self):
-        settings = QtCore.QSettings(QtCore.QCoreApplication.organizationName(
-        ), QtCore.QCoreApplication.applicationName())
-        geometry = settings.value("geometry", QtCore.QByteArray())
+        # Read once per process, every window applies the changes
+        self.settings = settings_model()
+        settings = self.settings
+        geometry = settings.value("geometry")
 
-        if geometry is None:
+        if geometry.isEmpty():
             availableGeometry = self.screen().availableGeometry()
-            self.resize(availableGeometry.width()/3,
-                        availableGeometry.height()/2)
-            self.move((availableGeometry.width() - self.width()) / 2,
-                      (availableGeometry.height() - self.height())/2)
+            self.resize(availableGeometry.width() // 3,
+                        availableGeometry.height() // 2)
+            self.move((availableGeometry.width() - self.width()) // 2,
+                      (availableGeometry.height() - self.height()) // 2)
 
         else:
             self.restoreGeometry(geometry)
 
-        self.tab_size = self.updated_tab_size()
+        self.tab_size = settings.value("tab-size")
+        self.autosave_time = settings.value("autosave-time")
+        self.undo_budget = settings.value("undo-budget")
+        self.large_file_threshold = settings.value("large-file-threshold")
+        self.long_line_length = settings.value("long-line-length")
+        self.word_wrap = settings.value("word-wrap")
+        settings.changed.connect(self.apply_setting)
 
     def write_settings(self):
-        settings = QtCore.QSettings(QtCore.QCoreApplication.organizationName(
-        ), QtCore.QCoreApplication.applicationName())
-        settings.setValue("geometry", self.saveGeometry())
-
-    def updated_tab_size(self) -> int:
-        self.settings = QtCore.QSettings(QtCore.QCoreApplication.organizationName(
-        ), QtCore.QCoreApplication.applicationName())
-        tab_size = int(self.settings.value("tab-size", 4))
-        return tab_size
+        self.settings.set_value("geometry", self.saveGeometry())
 
     def closeEvent(self, event):
         if self.maybe_save():
+            self.stop_loader()
+            self.close_large_file()
+            self.saver.stop()
+            self.journal.discard()
+            if self.find_in_files_panel is not None:
+                self.find_in_files_panel.shutdown()
             self.write_settings()
+            self.settings.changed.disconnect(self.apply_setting)
+            self.windows.remove(self)
             event.accept()
         else:
             event.ignore()
@@ -530,7 +1324,17 @@ def main():
     import sys
 
     app = QtWidgets.QApplication(sys.argv)
-    MainWindow()
+    paths = [os.path.abspath(path) for path in sys.argv[1:]]
+    if os.environ.get("KINGS_EDITOR_PROFILE"):
+        instrumentation.profile_session(os.environ["KINGS_EDITOR_PROFILE"])
+
+    instance = SingleInstance(app)
+    if instance.send(paths):
+        sys.exit(0)
+    instance.listen()
+    instance.files_received.connect(MainWindow.open_files)
+
+    MainWindow.open_files(paths)
     sys.exit(app.exec_())
 
 
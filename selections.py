@@ -0,0 +1,142 @@
+import bisect
+from collections import deque
+from itertools import islice
+from PyQt5 import QtGui, QtWidgets, QtCore
+
+
+def ranges_between(ranges, start, end):
+    """
+    Yields the (start, length) tuples of a sorted list that start in
+    [start, end)
+    """
+    for index in range(bisect.bisect_left(ranges, (start,)), len(ranges)):
+        if ranges[index][0] >= end:
+            return
+        yield ranges[index]
+
+
+class SelectionLayers(QtCore.QObject):
+    """
+    The extra selections of a TextEditor, kept in named layers that are
+    painted in `order`, each a text format and its (start, length) ranges.
+
+    Qt compares the list given to setExtraSelections with the previous one
+    and repaints the selections whose cursor or format changed, but every
+    paint walks the whole list for each visible line. So a layer keeps the
+    ExtraSelection objects of ranges that did not move, the list is only
+    set when a layer actually changed, and a layer given as a function of
+    two positions, like the matches of a search, only has the ranges on
+    screen materialized, with at most `max_markers` off screen on either
+    side, again when scrolling leaves that window.
+    """
+
+    order = ("current_line", "search", "brackets")
+    max_markers = 1000  # Ranges of a windowed layer kept off screen
+
+    def __init__(self, text_editor):
+        super().__init__(text_editor)
+        self.text_editor = text_editor
+        self.layers = {}  # name -> (format, ranges)
+        self.selections = {}  # name -> ExtraSelections in the list last set
+        self.windows = {}  # name -> positions materialized of a windowed layer
+
+        # Scrolling with the keyboard moves the scroll bar with its signals
+        # blocked, updateRequest tells every scroll
+        text_editor.updateRequest.connect(self.update_request)
+
+    def set_layer(self, name, text_format, ranges):
+        """
+        Shows ranges in a layer, either a short sorted list of (start,
+        length) tuples or a function yielding those that start between two
+        positions in order
+        """
+        old = self.layers.get(name)
+        if old is not None and old[0] is not text_format:
+            # Selections with the old format cannot be reused
+            self.selections.pop(name, None)
+        self.layers[name] = (text_format, ranges)
+        self.apply([name])
+
+    def clear_layer(self, name):
+        if self.layers.pop(name, None) is not None:
+            self.windows.pop(name, None)
+            self.apply([name])
+
+    def visible_range(self) -> tuple:
+        rect = self.text_editor.viewport().rect()
+        return (self.text_editor.cursorForPosition(rect.topLeft()).position(),
+                self.text_editor.cursorForPosition(rect.bottomRight()).position())
+
+    def update_request(self, rect, dy):
+        if dy:
+            self.viewport_changed()
+
+    def viewport_changed(self):
+        if not self.windows:
+            return
+        start, end = self.visible_range()
+        self.apply([name for name, (window_start, window_end) in self.windows.items()
+                    if not window_start <= start <= end <= window_end])
+
+    def materialize(self, name, ranges, visible) -> list:
+        """
+        Returns the ranges of a windowed layer on screen and around it
+        """
+        start, end = visible
+        page = max(1, end - start)
+        before = deque(ranges(start - page, start), maxlen=self.max_markers)
+        shown = list(ranges(start, end + 1))
+        after = list(islice(ranges(end + 1, end + page), self.max_markers))
+
+        # Capped margins cover fewer positions than a page
+        self.windows[name] = (
+            before[0][0] if len(before) == self.max_markers else start - page,
+            after[-1][0] if len(after) == self.max_markers else end + page)
+        return [*before, *shown, *after]
+
+    def apply(self, names):
+        """
+        Rebuilds the selections of the named layers and sets the list if
+        any of them changed
+        """
+        changed = False
+        visible = None
+        for name in names:
+            layer = self.layers.get(name)
+            old = self.selections.get(name, [])
+            if layer is None:
+                changed = changed or bool(old)
+                self.selections.pop(name, None)
+                continue
+
+            text_format, ranges = layer
+            if callable(ranges):
+                if visible is None:
+                    visible = self.visible_range()
+                ranges = self.materialize(name, ranges, visible)
+            # Selections follow edits, so ranges that did not move are found
+            # where their cursor is now
+            reusable = {(selection.cursor.selectionStart(),
+                         selection.cursor.selectionEnd()): selection
+                        for selection in old}
+            selections = []
+            for start, length in ranges:
+                selection = reusable.get((start, start + length))
+                if selection is None:
+                    selection = QtWidgets.QTextEdit.ExtraSelection()
+                    selection.format = text_format
+                    cursor = QtGui.QTextCursor(self.text_editor.document())
+                    cursor.setPosition(start)
+                    cursor.setPosition(start + length, QtGui.QTextCursor.KeepAnchor)
+                    selection.cursor = cursor
+                selections.append(selection)
+
+            if len(selections) != len(old) or \
+                    any(new is not previous for new, previous in zip(selections, old)):
+                changed = True
+            self.selections[name] = selections
+
+        if changed:
+            self.text_editor.setExtraSelections(
+                [selection for name in self.order
+                 for selection in self.selections.get(name, [])])
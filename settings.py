@@ -1,71 +1,192 @@
-from PyQt5 import QtCore, QtWidgets
+from functools import lru_cache
+from PyQt5 import QtCore, QtGui, QtWidgets
+from application import shared_settings
+
+
+class SettingsWriter(QtCore.QThread):
+    """
+    Writes a batch of values to the settings file off the GUI thread,
+    through a QSettings of its own, which Qt allows for the same file
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.values = {}
+
+    def run(self):
+        settings = QtCore.QSettings(QtCore.QCoreApplication.organizationName(
+        ), QtCore.QCoreApplication.applicationName())
+        for key, value in self.values.items():
+            settings.setValue(key, value)
+        settings.sync()
+
+
+class SettingsModel(QtCore.QObject):
+    """
+    The settings of the editor, read once into a cache of typed values.
+
+    Every key has a default in `defaults`, whose type is the type of the
+    value. Reading a value never touches the settings file, setting one
+    emits `changed` at once for the open windows to apply, and the values
+    set within `write_delay` milliseconds are written together on a
+    thread. Whatever is still pending is written before the application
+    quits.
+    """
+
+    changed = QtCore.pyqtSignal(str, object)
+
+    defaults = {
+        "geometry": QtCore.QByteArray(),
+        "autosave-time": 8,  # Seconds
+        # MB the undo history may hold before its oldest steps are dropped
+        "undo-budget": 64,
+        # Files larger than this many MB are opened in the large file viewer
+        "large-file-threshold": 256,
+        # Files with a line this many characters long are opened in it too
+        "long-line-length": 20000,
+        "word-wrap": True,
+        "tab-size": 4,
+        "font-family": "",  # Empty for the default font
+        "font-size": 0,  # Points, 0 for the size of the default font
+        "text-color": "",  # Color name, empty for the palette's
+    }
+
+    write_delay = 500
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.values = {key: store.value(key, default, type=type(default))
+                       for key, default in self.defaults.items()}
+        self.pending = {}
+
+        self.writer = SettingsWriter(self)
+        self.write_timer = QtCore.QTimer(self)
+        self.write_timer.setSingleShot(True)
+        self.write_timer.setInterval(self.write_delay)
+        self.write_timer.timeout.connect(self.write_pending)
+        QtCore.QCoreApplication.instance().aboutToQuit.connect(self.flush)
+
+    def value(self, key):
+        return self.values[key]
+
+    def set_value(self, key, value):
+        value = type(self.defaults[key])(value)
+        if value == self.values[key]:
+            return
+        self.values[key] = value
+        self.pending[key] = value
+        self.write_timer.start()
+        self.changed.emit(key, value)
+
+    def write_pending(self):
+        if self.writer.isRunning():
+            # The next batch waits for this one
+            self.write_timer.start()
+            return
+        self.writer.values = self.pending
+        self.pending = {}
+        self.writer.start()
+
+    def flush(self):
+        """
+        Writes the pending values at once and waits for the writer
+        """
+        self.write_timer.stop()
+        self.writer.wait()
+        for key, value in self.pending.items():
+            self.store.setValue(key, value)
+        self.pending = {}
+        self.store.sync()
+
+
+@lru_cache(maxsize=None)
+def settings_model() -> SettingsModel:
+    """
+    Returns the settings model shared by every window of the process
+    """
+    return SettingsModel(shared_settings())
 
 
 class Settings(QtWidgets.QDialog):
-
-    def __init__(self):
-        super().__init__()
+    """
+    The settings window, built once for a model and shown again whenever
+    it is opened. Its controls change the model as they are edited and
+    follow it when the settings change elsewhere.
+    """
+
+    def __init__(self, model, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self.controls = {}  # key -> function showing the key's value
         self.setup_UI()
+        model.changed.connect(self.show_value)
 
     def setup_UI(self):
         self.setWindowTitle("Settings - King's Editor")
+        model = self.model
 
         list_widget = QtWidgets.QListWidget(self)
-
-        def mapper(item):
-            if item == "Saving":
-                saving_setting()
-            elif item == "Formatting":
-                formatting_settings()
-
-        def saving_setting():
-            stacked_widget.setCurrentWidget(saving_frame)
-
-        def formatting_settings():
-            stacked_widget.setCurrentWidget(formatting_frame)
-
         QtWidgets.QListWidgetItem("Saving", list_widget)
         QtWidgets.QListWidgetItem("Formatting", list_widget)
         QtWidgets.QListWidgetItem("Status bar", list_widget)
 
-        list_widget.currentItemChanged.connect(
-            lambda: mapper(list_widget.currentItem().text()))
-
         saving_frame = QtWidgets.QFrame(self)
         saving_layout = QtWidgets.QGridLayout()
         autosave_label = QtWidgets.QLabel(
             "Autosave time interval (s): ", parent=saving_frame)
         autosave_time = QtWidgets.QSpinBox(parent=saving_frame)
         autosave_time.setMinimum(5)
+        self.bind_spin_box(autosave_time, "autosave-time")
+        undo_budget_label = QtWidgets.QLabel(
+            "Undo history memory (MB): ", parent=saving_frame)
+        undo_budget = QtWidgets.QSpinBox(parent=saving_frame)
+        undo_budget.setRange(1, 4096)
+        self.bind_spin_box(undo_budget, "undo-budget")
         saving_layout.addWidget(autosave_label, 1, 1)
         saving_layout.addWidget(autosave_time, 1, 2)
+        saving_layout.addWidget(undo_budget_label, 2, 1)
+        saving_layout.addWidget(undo_budget, 2, 2)
         saving_frame.setLayout(saving_layout)
 
         formatting_frame = QtWidgets.QFrame(self)
         formatting_layout = QtWidgets.QGridLayout()
         font_label = QtWidgets.QLabel("Font: ", parent=formatting_frame)
         font = QtWidgets.QFontComboBox(parent=formatting_frame)
+
+        def show_font(family):
+            font.setCurrentFont(QtGui.QFont(family) if family else self.font())
+
+        self.controls["font-family"] = show_font
+        show_font(model.value("font-family"))
+        font.currentFontChanged.connect(
+            lambda value: model.set_value("font-family", value.family()))
         font_size_label = QtWidgets.QLabel(
             "Font Size: ", parent=formatting_frame)
         font_size = QtWidgets.QSpinBox(parent=formatting_frame)
         font_size.setMinimum(8)
         font_size.setMaximum(150)
+        if not model.value("font-size"):
+            font_size.setValue(self.font().pointSize())
+        self.bind_spin_box(font_size, "font-size")
         text_color_label = QtWidgets.QLabel(
             "Text Color: ", parent=formatting_frame)
-        text_color = QtWidgets.QPushButton(
-            "Pick a color", parent=formatting_frame)
-        text_color.clicked.connect(self.change_color)
+        self.text_color = QtWidgets.QPushButton(parent=formatting_frame)
+        self.controls["text-color"] = self.show_color
+        self.show_color(model.value("text-color"))
+        self.text_color.clicked.connect(self.change_color)
         tab_size_label = QtWidgets.QLabel(
             "Tab Size: ", parent=formatting_frame)
         tab_size = QtWidgets.QSpinBox(parent=formatting_frame)
         tab_size.setRange(2, 8)
+        self.bind_spin_box(tab_size, "tab-size")
 
         formatting_layout.addWidget(font_label, 1, 1)
         formatting_layout.addWidget(font, 1, 2)
         formatting_layout.addWidget(font_size_label, 2, 1)
         formatting_layout.addWidget(font_size, 2, 2)
         formatting_layout.addWidget(text_color_label, 3, 1)
-        formatting_layout.addWidget(text_color, 3, 2)
+        formatting_layout.addWidget(self.text_color, 3, 2)
         formatting_layout.addWidget(tab_size_label, 4, 1)
         formatting_layout.addWidget(tab_size, 4, 2)
         formatting_frame.setLayout(formatting_layout)
@@ -80,14 +201,42 @@ class Settings(QtWidgets.QDialog):
         stacked_widget.addWidget(saving_frame)
         stacked_widget.addWidget(formatting_frame)
         stacked_widget.addWidget(status_bar_frame)
+        list_widget.currentRowChanged.connect(stacked_widget.setCurrentIndex)
 
         self.settings_layout = QtWidgets.QHBoxLayout()
         self.settings_layout.addWidget(list_widget)
         self.settings_layout.addWidget(stacked_widget)
 
         self.setLayout(self.settings_layout)
-        self.exec_()
+
+    def bind_spin_box(self, spin_box, key):
+        """
+        Shows the value of key in spin_box, which sets it when edited
+        """
+        def show(value):
+            if value:
+                spin_box.setValue(value)
+
+        self.controls[key] = show
+        show(self.model.value(key))
+        spin_box.valueChanged.connect(lambda value: self.model.set_value(key, value))
+
+    def show_value(self, key, value):
+        show = self.controls.get(key)
+        if show is not None:
+            # Setting the value back from the control changes nothing
+            show(value)
+
+    def show_color(self, name):
+        self.text_color.setText(name or "Pick a color")
+        self.text_color.setStyleSheet(f"color: {name}" if name else "")
 
     def change_color(self):
-        color_dialog = QtWidgets.QColorDialog()
-        self.settings_layout.addWidget(color_dialog)
+        initial = self.model.value("text-color")
+        color = QtWidgets.QColorDialog.getColor(
+            QtGui.QColor(initial) if initial else self.palette().color(QtGui.QPalette.Text),
+            self, "Text Color")
+        if color.isValid():
+            self.model.set_value("text-color", color.name())
+            self.show_color(color.name())
+
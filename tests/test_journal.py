@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5 import QtCore, QtGui, QtWidgets  # noqa: E402
+from journal import RecoveryJournal  # noqa: E402
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv[:1])
+# Journals go to a test directory, never next to the user's
+QtCore.QStandardPaths.setTestModeEnabled(True)
+
+
+class RecoveryJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.document = QtGui.QTextDocument()
+        # Without a layout the document does not report every change
+        self.document.setDocumentLayout(QtWidgets.QPlainTextDocumentLayout(self.document))
+        self.journal = RecoveryJournal(self.document)
+        self.journal.reset("")
+        self.journal.recording = True
+        self.addCleanup(self.journal.discard)
+
+    def recovered(self) -> str:
+        self.journal.flush()
+        filename, text = RecoveryJournal.recover(self.journal.path)
+        self.assertEqual(filename, "")
+        return text
+
+    def test_replays_edits(self):
+        cursor = QtGui.QTextCursor(self.document)
+        cursor.insertText("hello\nworld")
+        cursor.setPosition(2)
+        cursor.setPosition(8, QtGui.QTextCursor.KeepAnchor)
+        cursor.insertText("y ")
+        self.assertEqual(self.recovered(), self.document.toPlainText())
+
+    def test_replays_edits_after_astral_characters(self):
+        cursor = QtGui.QTextCursor(self.document)
+        cursor.insertText("\U0001F600\U0001F600 hello\n\U0001F4A9 world")
+        # Positions count the emoji as two units each
+        cursor.setPosition(7)
+        cursor.insertText("ZZ")
+        cursor.setPosition(self.document.characterCount() - 6)
+        cursor.setPosition(self.document.characterCount() - 1, QtGui.QTextCursor.KeepAnchor)
+        cursor.insertText("\U0001F30D")
+        self.assertEqual(self.document.toPlainText(),
+                         "\U0001F600\U0001F600 heZZllo\n\U0001F4A9 \U0001F30D")
+        self.assertEqual(self.recovered(), self.document.toPlainText())
+
+    def test_replays_edits_after_a_snapshot(self):
+        cursor = QtGui.QTextCursor(self.document)
+        cursor.insertText("\U0001F600 one")
+        self.journal.flush()
+        self.journal.compact()
+        cursor.setPosition(3)
+        cursor.insertText("two ")
+        self.assertEqual(self.recovered(), "\U0001F600 two one")
+
+
+if __name__ == "__main__":
+    unittest.main()
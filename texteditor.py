@@ -1,6 +1,37 @@
+import re
+from itertools import accumulate
 from time import sleep
 from PyQt5 import QtGui, QtWidgets, QtCore
 from typing import List, Callable
+from instrumentation import timed
+from selections import SelectionLayers
+from brackets import bracket_pattern, closings, pairs
+
+prefix_pattern = re.compile(r"[^\W\d]\w*$")
+
+
+def line_comment_edits(lines, prefix) -> list:
+    """
+    Returns the (line, column, characters removed, text inserted) edits
+    commenting out the non-blank lines at their smallest indentation, or
+    removing the comment prefix when every one of them has it
+    """
+    indents = [len(line) - len(line.lstrip()) for line in lines]
+    filled = [number for number, line in enumerate(lines) if line.strip()]
+    if not filled:
+        return []
+
+    if all(lines[number].startswith(prefix, indents[number]) for number in filled):
+        edits = []
+        for number in filled:
+            end = indents[number] + len(prefix)
+            if lines[number].startswith(" ", end):
+                end += 1
+            edits.append((number, indents[number], end - indents[number], ""))
+        return edits
+
+    indent = min(indents[number] for number in filled)
+    return [(number, indent, 0, prefix + " ") for number in filled]
 
 
 class LineNumberArea(QtWidgets.QWidget):
@@ -20,6 +51,12 @@ class LineNumberArea(QtWidgets.QWidget):
 
 
 class TextEditor(QtWidgets.QPlainTextEdit):
+    """
+    A view of a document, several of them can share the same QTextDocument
+    while keeping their own scroll position, gutter and current line
+    """
+
+    focused = QtCore.pyqtSignal()
 
     character_list = {
         "(": ")",
@@ -28,46 +65,350 @@ class TextEditor(QtWidgets.QPlainTextEdit):
         "\"": "\"",
         "'": "'"
     }  # For auto-completion implementation
+    closing_chars = set(character_list.values())
+
+    line_offset = 0  # Line number of the first block, set by LargeFileViewer
+    column_offset = 0  # Column the blocks start at, set by LargeFileViewer
+    large_file = None
+    bracket_index = None  # BracketIndex of the document, set by MainWindow
+    word_index = None  # WordIndex of the document, set by MainWindow
+    highlighter = None  # SyntaxHighlighter of the document, set by MainWindow
+    completer = None  # Created the first time words are offered
+
+    gutter_cache_size = 4096  # Rendered line numbers kept for repaints
+    bracket_read_limit = 5000  # Blocks read to highlight a match on moving
+    completion_length = 3  # Characters typed before words are offered
+    completer_keys = {QtCore.Qt.Key_Enter, QtCore.Qt.Key_Return, QtCore.Qt.Key_Escape,
+                      QtCore.Qt.Key_Tab, QtCore.Qt.Key_Backtab}
 
     def __init__(self):
         super().__init__()
         self.line_number_area = LineNumberArea(self)
+        self.gutter_digits = 0
+        self.gutter_width = 0
+        self.gutter_numbers = {}
+        self.viewport_margins = None
+        self.selection_layers = SelectionLayers(self)
+        self.current_line_format = None
+        self.bracket_format = QtGui.QTextCharFormat()
+        self.bracket_format.setBackground(QtGui.QColor(0, 200, 0, 90))
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QtCore.QEvent.FontChange:
+            self.gutter_digits = 0
+            self.gutter_numbers = {}
+            self.update_line_number_area_width(0)
+        elif event.type() == QtCore.QEvent.PaletteChange:
+            self.current_line_format = None
+            self.highlight_current_line()
+
+    def focusInEvent(self, event):
+        super().focusInEvent(event)
+        self.focused.emit()
+
+    @timed("Editor paint")
+    def paintEvent(self, event):
+        super().paintEvent(event)
 
     def resizeEvent(self, event):
+        super().resizeEvent(event)
         cr = self.contentsRect()
         self.line_number_area .setGeometry(QtCore.QRect(
             cr.left(), cr.top(), self.line_number_area_width(), cr.height()))
+        self.selection_layers.viewport_changed()
 
+    @timed("Key press")
     def keyPressEvent(self, event):
-        closing_char = self.character_list.get(event.text())
+        popup_visible = self.completer is not None and self.completer.popup().isVisible()
+        if popup_visible and event.key() in self.completer_keys:
+            # The completer's popup takes these
+            event.ignore()
+            return
+        self.type_key(event)
 
-        if closing_char:
-            char_cursor = self.textCursor()
-            initial_char_position = char_cursor.position()
+        text = event.text()
+        if text and (text.isalnum() or text == "_" or popup_visible):
+            self.update_completion()
 
-            self.insertPlainText(closing_char)
-            char_cursor.setPosition(initial_char_position)
-            self.setTextCursor(char_cursor)
+    def type_key(self, event):
+        text = event.text()
+        if self.isReadOnly() or not text:
+            super().keyPressEvent(event)
+            return
+
+        cursor = self.textCursor()
+        next_char = self.document().characterAt(cursor.position())
+        if not cursor.hasSelection() and text in self.closing_chars and next_char == text:
+            # Type over the closing character that was inserted with its pair
+            cursor.movePosition(QtGui.QTextCursor.Right)
+            self.setTextCursor(cursor)
+            return
+
+        closing_char = self.character_list.get(text)
+        if closing_char and self.should_pair(cursor, text):
+            self.insert_pair(cursor, text, closing_char)
+            return
         super().keyPressEvent(event)
 
+    def should_pair(self, cursor, char) -> bool:
+        if cursor.hasSelection() or char not in ("'", "\""):
+            return True
+        # Leave apostrophes in words alone
+        previous_char = self.document().characterAt(cursor.position() - 1)
+        return not previous_char.isalnum()
+
+    def insert_pair(self, cursor, opening_char, closing_char):
+        """
+        Inserts a pair of characters around the selection, as one undo step
+        """
+        start, end = cursor.selectionStart(), cursor.selectionEnd()
+        cursor.beginEditBlock()
+        cursor.setPosition(end)
+        cursor.insertText(closing_char)
+        cursor.setPosition(start)
+        cursor.insertText(opening_char)
+        cursor.endEditBlock()
+
+        if end > start:
+            cursor.setPosition(start + 1)
+            cursor.setPosition(end + 1, QtGui.QTextCursor.KeepAnchor)
+        self.setTextCursor(cursor)
+
+    def selected_blocks(self) -> tuple:
+        """
+        Returns the first and last block of the lines the selection touches
+        """
+        cursor = self.textCursor()
+        start, end = cursor.selectionStart(), cursor.selectionEnd()
+        document = self.document()
+        first = document.findBlock(start)
+        last = document.findBlock(end)
+        # A selection ending at the start of a line does not include it
+        if end > start and last.position() == end and last != first:
+            last = last.previous()
+        return first, last
+
+    def line_range_cursor(self) -> QtGui.QTextCursor:
+        """
+        Returns a cursor selecting the whole lines the selection touches,
+        without the newline after the last one
+        """
+        first, last = self.selected_blocks()
+        line_cursor = QtGui.QTextCursor(self.document())
+        line_cursor.setPosition(first.position())
+        line_cursor.setPosition(last.position() + last.length() - 1,
+                                QtGui.QTextCursor.KeepAnchor)
+        return line_cursor
+
+    def selection_offsets(self, start) -> tuple:
+        cursor = self.textCursor()
+        return cursor.anchor() - start, cursor.position() - start
+
+    def restore_selection(self, new_start, offsets):
+        """
+        Puts the cursor and its selection back on lines that moved to
+        new_start, at the offsets they had from the old start
+        """
+        cursor = self.textCursor()
+        # A selection ending on the next line may end past the document
+        last_position = self.document().characterCount() - 1
+        cursor.setPosition(min(new_start + offsets[0], last_position))
+        cursor.setPosition(min(new_start + offsets[1], last_position),
+                           QtGui.QTextCursor.KeepAnchor)
+        self.setTextCursor(cursor)
+
+    def begin_bulk_edit(self, cursor):
+        """
+        Starts an edit block for an edit spanning many lines, highlighted
+        around the viewports only until end_bulk_edit
+        """
+        if self.highlighter is not None:
+            self.highlighter.set_bulk_edit(True)
+        cursor.beginEditBlock()
+
+    def end_bulk_edit(self, cursor):
+        # The document reports the whole edit block's change here
+        cursor.endEditBlock()
+        if self.highlighter is not None:
+            self.highlighter.set_bulk_edit(False)
+
+    def duplicate_selection(self):
+        cursor = self.textCursor()
+        if not cursor.hasSelection():
+            self.copy_lines(down=True)
+            return
+
+        text = cursor.selectedText()
+        end = cursor.selectionEnd()
+        self.begin_bulk_edit(cursor)
+        cursor.setPosition(end)
+        cursor.insertText(text)
+        self.end_bulk_edit(cursor)
+        # Positions count UTF-16 code units, so they are taken from Qt
+        copy_end = cursor.position()
+        cursor.setPosition(end)
+        cursor.setPosition(copy_end, QtGui.QTextCursor.KeepAnchor)
+        self.setTextCursor(cursor)
+
+    def insert_line(self, cursor, block, text):
+        """
+        Inserts a line with text before block, after the line before it
+        when there is one, since the block a new line splits off keeps the
+        user data and fold state
+        """
+        if block.previous().isValid():
+            cursor.setPosition(block.position() - 1)
+            cursor.insertText("\n" + text)
+        else:
+            cursor.setPosition(block.position())
+            cursor.insertText(text + "\n")
+
+    def remove_line(self, cursor, block):
+        """
+        Removes the line of block along with the newline after it, or
+        before it for the last line
+        """
+        if block.next().isValid():
+            cursor.setPosition(block.position())
+            cursor.setPosition(block.position() + block.length(),
+                               QtGui.QTextCursor.KeepAnchor)
+        else:
+            cursor.setPosition(block.position() - 1)
+            cursor.setPosition(block.position() + block.length() - 1,
+                               QtGui.QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+
+    def copy_lines(self, down=True):
+        """
+        Copies the selected lines below or above themselves in one edit,
+        inserting only the copy so the lines themselves are left alone
+        """
+        lines = self.line_range_cursor()
+        text = lines.selectedText()
+        start, end = lines.selectionStart(), lines.selectionEnd()
+        offsets = self.selection_offsets(start)
+
+        self.begin_bulk_edit(lines)
+        if down:
+            lines.setPosition(end)
+            lines.insertText("\n" + text)
+        else:
+            self.insert_line(lines, self.document().findBlock(start), text)
+        self.end_bulk_edit(lines)
+        self.restore_selection(end + 1 if down else start, offsets)
+
+    def move_lines(self, up=True):
+        """
+        Swaps the selected lines with the line above or below them, by
+        moving that one line to the other side
+        """
+        lines = self.line_range_cursor()
+        start, end = lines.selectionStart(), lines.selectionEnd()
+        first, last = self.selected_blocks()
+        neighbour = first.previous() if up else last.next()
+        if not neighbour.isValid():
+            return
+
+        offsets = self.selection_offsets(start)
+        text = neighbour.text()
+        lines.beginEditBlock()
+        # The later edit first, so the earlier position still holds
+        if up:
+            new_start = neighbour.position()
+            lines.setPosition(end)
+            lines.insertText("\n" + text)
+            self.remove_line(lines, neighbour)
+        else:
+            new_start = start + neighbour.length()
+            self.remove_line(lines, neighbour)
+            self.insert_line(lines, first, text)
+        lines.endEditBlock()
+        self.restore_selection(new_start, offsets)
+
+    def toggle_line_comment(self, prefix="#"):
+        """
+        Comments the selected lines out, or back in if they all are, adding
+        or removing the prefix line by line as a single undo step
+        """
+        had_selection = self.textCursor().hasSelection()
+        first, last = self.selected_blocks()
+        lines = self.line_range_cursor().selectedText().split("\u2029")
+        edits = line_comment_edits(lines, prefix)
+        if not edits:
+            return
+
+        # Where each line starts, in UTF-16 units like document positions
+        starts = list(accumulate(
+            (len(line) + 1 if line.isascii() else len(line.encode("utf-16-le")) // 2 + 1
+             for line in lines[:-1]), initial=first.position()))
+        cursor = QtGui.QTextCursor(self.document())
+        self.begin_bulk_edit(cursor)
+        for number, column, removed, inserted in reversed(edits):
+            cursor.setPosition(starts[number] + column)
+            if removed:
+                cursor.setPosition(starts[number] + column + removed,
+                                   QtGui.QTextCursor.KeepAnchor)
+            cursor.insertText(inserted)
+        self.end_bulk_edit(cursor)
+
+        # Without a selection the cursor moved along with its line
+        if had_selection:
+            cursor.setPosition(last.position() + last.length() - 1)
+            cursor.setPosition(first.position(), QtGui.QTextCursor.KeepAnchor)
+            self.setTextCursor(cursor)
+
+    def gutter_number(self, number):
+        """
+        Returns the prepared static text of a line number and its width
+        """
+        cached = self.gutter_numbers.get(number)
+        if cached is None:
+            if len(self.gutter_numbers) >= self.gutter_cache_size:
+                self.gutter_numbers = {}
+            static_text = QtGui.QStaticText(str(number))
+            static_text.setTextFormat(QtCore.Qt.PlainText)
+            static_text.prepare(QtGui.QTransform(), self.font())
+            cached = (static_text, QtCore.qRound(static_text.size().width()))
+            self.gutter_numbers[number] = cached
+        return cached
+
+    @timed("Gutter paint")
     def line_number_area_paint_event(self, event):
         painter = QtGui.QPainter(self.line_number_area)
         painter.fillRect(event.rect(), QtCore.Qt.black)
+        painter.setPen(QtCore.Qt.lightGray)
+        painter.setFont(self.font())
+
+        right = self.line_number_area.width()
+        paint_top = event.rect().top()
+        paint_bottom = event.rect().bottom()
 
         block = self.firstVisibleBlock()
-        block_number = block.blockNumber()
+        block_number = block.blockNumber() + self.line_offset
         top = QtCore.qRound(self.blockBoundingGeometry(
             block).translated(self.contentOffset()).top())
         bottom = top + QtCore.qRound(self.blockBoundingRect(block).height())
 
-        while block.isValid() and (top <= event.rect().bottom()):
-            if (block.isVisible() and bottom >= event.rect().top()):
-                number = str(block_number + 1)
-                painter.setPen(QtCore.Qt.lightGray)
-                painter.drawText(0, top, self.line_number_area.width(
-                ), self.fontMetrics().height(), QtCore.Qt.AlignRight, number)
+        while block.isValid() and (top <= paint_bottom):
+            next_block = block.next()
+            folded = next_block.isValid() and not next_block.isVisible()
+            if (block.isVisible() and bottom >= paint_top):
+                static_text, width = self.gutter_number(block_number + 1)
+                if folded:
+                    painter.setPen(QtCore.Qt.yellow)
+                    painter.drawStaticText(right - width, top, static_text)
+                    painter.setPen(QtCore.Qt.lightGray)
+                else:
+                    painter.drawStaticText(right - width, top, static_text)
 
-            block = block.next()
+            if folded:
+                # Folded blocks have no lines in the layout, so the next
+                # line is in the first block shown after them
+                next_block = self.document().findBlockByLineNumber(
+                    block.firstLineNumber() + block.lineCount())
+                block_number = next_block.blockNumber() + self.line_offset - 1
+            block = next_block
             top = bottom
             bottom = top + \
                 QtCore.qRound(self.blockBoundingRect(block).height())
@@ -82,31 +423,260 @@ class TextEditor(QtWidgets.QPlainTextEdit):
         if rect.contains(self.viewport().rect()):
             self.update_line_number_area_width(0)
 
-    def line_number_area_width(self) -> int:
-        digits = 1
-        max_ = max(1, self.blockCount())
+    def line_count(self) -> int:
+        if self.large_file is not None:
+            return self.large_file.line_count()
+        return self.blockCount()
 
-        while max_ >= 10:
-            max_ /= 10
-            digits += 1
+    def line_number_area_width(self) -> int:
+        digits = len(str(max(1, self.line_count())))
 
-        space = 3 + self.fontMetrics().horizontalAdvance("9" * digits)
-        return space
+        if digits != self.gutter_digits:
+            self.gutter_digits = digits
+            self.gutter_width = 3 + \
+                self.fontMetrics().horizontalAdvance("9" * digits)
+        return self.gutter_width
 
     def update_line_number_area_width(self, new_block_count):
-        self.setViewportMargins(self.line_number_area_width(), 0, 0, 0)
+        right_margin = bottom_margin = 0
+        if self.large_file is not None:
+            right_margin = self.large_file.scroll_bar_width()
+            bottom_margin = self.large_file.scroll_bar_height()
 
-    def highlight_current_line(self):
-        extra_selections = []
+        # Changing the margins relayouts the viewport, so only do it when the
+        # digit count or the scroll bars actually changed
+        margins = (self.line_number_area_width(), right_margin, bottom_margin)
+        if margins != self.viewport_margins:
+            self.viewport_margins = margins
+            self.setViewportMargins(margins[0], 0, right_margin, bottom_margin)
+            cr = self.contentsRect()
+            self.line_number_area.setGeometry(QtCore.QRect(
+                cr.left(), cr.top(), margins[0], cr.height()))
 
-        if not self.isReadOnly():
-            selection = QtWidgets.QTextEdit.ExtraSelection()
+    def highlight_current_line(self):
+        """
+        Highlights the screen line of the cursor, or the whole width of the
+        selected lines
+        """
+        if self.isReadOnly():
+            self.selection_layers.clear_layer("current_line")
+            return
 
-            line_color = QtGui.QColor(QtCore.Qt.black).lighter(130)
-            selection.format.setBackground(line_color)
-            selection.format.setProperty(
+        if self.current_line_format is None:
+            line_color = self.palette().color(QtGui.QPalette.Highlight)
+            line_color.setAlpha(40)
+            self.current_line_format = QtGui.QTextCharFormat()
+            self.current_line_format.setBackground(line_color)
+            self.current_line_format.setProperty(
                 QtGui.QTextFormat.FullWidthSelection, True)
-            selection.cursor = self.textCursor()
-            extra_selections.append(selection)
 
-        self.setExtraSelections(extra_selections)
+        cursor = self.textCursor()
+        if cursor.hasSelection():
+            start, length = cursor.selectionStart(), cursor.selectionEnd() - cursor.selectionStart()
+        else:
+            # Anchored at the start of the screen line, the highlight stays
+            # the same while the cursor moves along it
+            block = cursor.block()
+            line = block.layout().lineForTextPosition(cursor.positionInBlock())
+            start = block.position() + (line.textStart() if line.isValid() else 0)
+            length = 0
+        self.selection_layers.set_layer(
+            "current_line", self.current_line_format, [(start, length)])
+
+    def bracket_at_cursor(self):
+        """
+        Returns the position of the bracket next to the cursor, an opening
+        one after it or a closing one before it first, or None
+        """
+        document = self.document()
+        position = self.textCursor().position()
+        before = document.characterAt(position - 1) if position else ""
+        after = document.characterAt(position)
+        for candidate, char, kinds in ((position, after, pairs), (position - 1, before, closings),
+                                       (position, after, closings), (position - 1, before, pairs)):
+            if char in kinds:
+                return candidate
+        return None
+
+    def highlight_brackets(self):
+        """
+        Highlights the bracket next to the cursor and its match, unless the
+        match is too far to find without reading many lines
+        """
+        match = None
+        position = self.bracket_at_cursor() if self.bracket_index is not None else None
+        if position is not None:
+            match = self.bracket_index.match(position, self.bracket_read_limit)
+        if match is None:
+            self.selection_layers.clear_layer("brackets")
+            return
+        self.selection_layers.set_layer(
+            "brackets", self.bracket_format, sorted([(position, 1), (match, 1)]))
+
+    def goto_matching_bracket(self):
+        """
+        Moves the cursor to the other side of the matching bracket, so that
+        going again comes back
+        """
+        position = self.bracket_at_cursor() if self.bracket_index is not None else None
+        if position is None:
+            return
+        match = self.bracket_index.match(position)
+        if match is None:
+            return
+        cursor = self.textCursor()
+        cursor.setPosition(match if match < position else match + 1)
+        self.setTextCursor(cursor)
+
+    def fold_region(self):
+        """
+        Returns the positions of the brackets to fold at the cursor: the
+        last opening bracket of its line that closes on a later line, or
+        else the innermost brackets around the cursor on different lines
+        """
+        document = self.document()
+        index = self.bracket_index
+        cursor = self.textCursor()
+        block = cursor.block()
+        line_end = block.position() + block.length()
+        for match in reversed(list(bracket_pattern.finditer(block.text()))):
+            if match.group() in pairs:
+                opening = block.position() + match.start()
+                closing = index.match(opening)
+                if closing is not None and closing >= line_end:
+                    return opening, closing
+
+        position = cursor.position()
+        while True:
+            found = index.enclosing(position)
+            if found is None:
+                return None
+            opening = found[0]
+            closing = index.match(opening)
+            if closing is not None and \
+                    document.findBlock(closing).blockNumber() > document.findBlock(opening).blockNumber():
+                return opening, closing
+            position = opening
+
+    def set_blocks_visible(self, first, end, visible):
+        """
+        Shows or hides the blocks from first up to end, excluded
+        """
+        block = first
+        while block.isValid() and block != end:
+            block.setVisible(visible)
+            block = block.next()
+        document = self.document()
+        start = first.position()
+        stop = end.position() if end.isValid() else document.characterCount()
+        # Relayouts the blocks without changing the text, so undo and the
+        # document's contentsChange listeners are not involved
+        document.markContentsDirty(start, stop - start)
+        self.viewport().update()
+        self.line_number_area.update()
+
+    def fold(self):
+        """
+        Hides the lines between the brackets of the fold region, the line of
+        the closing bracket stays visible
+        """
+        if self.bracket_index is None or self.large_file is not None:
+            return
+        region = self.fold_region()
+        if region is None:
+            return
+        document = self.document()
+        first = document.findBlock(region[0]).next()
+        end = document.findBlock(region[1])
+        if first.blockNumber() >= end.blockNumber():
+            return
+        self.set_blocks_visible(first, end, False)
+        if not self.textCursor().block().isVisible():
+            cursor = self.textCursor()
+            cursor.setPosition(region[0])
+            self.setTextCursor(cursor)
+
+    def unfold(self):
+        """
+        Shows the folded lines after the line of the cursor, or before it
+        when it is the line of the closing bracket
+        """
+        block = self.textCursor().block()
+        if block.isVisible() and block.next().isVisible() and block.previous().isValid():
+            block = block.previous()
+        while not block.isVisible() and block.previous().isValid():
+            block = block.previous()
+        first = block.next()
+        if not first.isValid() or first.isVisible():
+            return
+        end = first
+        while end.isValid() and not end.isVisible():
+            end = end.next()
+        self.set_blocks_visible(first, end, True)
+
+    def unfold_all(self):
+        document = self.document()
+        block = document.begin()
+        folded = False
+        while block.isValid():
+            if not block.isVisible():
+                block.setVisible(True)
+                folded = True
+            block = block.next()
+        if folded:
+            document.markContentsDirty(0, document.characterCount())
+            self.viewport().update()
+            self.line_number_area.update()
+
+    def reveal_cursor(self):
+        """
+        Unfolds the lines around the cursor when it moved into a fold, as
+        going to a line or a search match does
+        """
+        if not self.textCursor().block().isVisible():
+            self.unfold()
+            self.ensureCursorVisible()
+
+    def word_before_cursor(self) -> str:
+        cursor = self.textCursor()
+        if cursor.hasSelection():
+            return ""
+        match = prefix_pattern.search(cursor.block().text(), 0, cursor.positionInBlock())
+        return match.group() if match else ""
+
+    def update_completion(self, explicit=False):
+        """
+        Offers the words of the document that start like the one before the
+        cursor, once it is `completion_length` long unless explicit
+        """
+        prefix = self.word_before_cursor()
+        words = []
+        if self.word_index is not None and not self.isReadOnly() and prefix and \
+                (explicit or len(prefix) >= self.completion_length):
+            words = self.word_index.completions(prefix)
+        if not words:
+            if self.completer is not None:
+                self.completer.popup().hide()
+            return
+
+        if self.completer is None:
+            self.completer = QtWidgets.QCompleter(self)
+            self.completer.setWidget(self)
+            # The index already picked the words
+            self.completer.setCompletionMode(QtWidgets.QCompleter.UnfilteredPopupCompletion)
+            self.completer.setModel(QtCore.QStringListModel(self.completer))
+            self.completer.activated[str].connect(self.insert_completion)
+        model = self.completer.model()
+        model.setStringList(words)
+        popup = self.completer.popup()
+        popup.setCurrentIndex(model.index(0, 0))
+        rect = self.cursorRect()
+        rect.setWidth(popup.sizeHintForColumn(0) + popup.verticalScrollBar().sizeHint().width())
+        self.completer.complete(rect)
+
+    def insert_completion(self, word):
+        cursor = self.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.Left, QtGui.QTextCursor.KeepAnchor,
+                            len(self.word_before_cursor()))
+        cursor.insertText(word)
+        self.setTextCursor(cursor)
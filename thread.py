@@ -1,16 +1,228 @@
+import os
+import re
 from PyQt5 import QtCore
-from time import sleep
+import fileio
+from instrumentation import timed
 
 
-class MyThread(QtCore.QThread):
+class AutosaveScheduler(QtCore.QObject):
+    """
+    Asks for an autosave once the document has been modified for `interval`
+    seconds and the user has stopped typing for `idle_time` milliseconds.
 
-    value = QtCore.pyqtSignal(int)
-    autosave_time = 8
-    autosave_enabled = True
+    Nothing runs while the document is unchanged, and since both waits are
+    timers on the owner's thread, there is no thread to stop.
+    """
+
+    timeout = QtCore.pyqtSignal()
+
+    idle_time = 1000
+
+    def __init__(self, document, interval, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.enabled = False
+        self.due = False
+
+        self.interval_timer = QtCore.QTimer(self)
+        self.interval_timer.setSingleShot(True)
+        self.interval_timer.timeout.connect(self.interval_elapsed)
+        self.set_interval(interval)
+
+        self.idle_timer = QtCore.QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(self.idle_time)
+        self.idle_timer.timeout.connect(self.maybe_fire)
+
+        # Not contentsChanged, which highlighting emits as well
+        self.document.contentsChange.connect(self.document_changed)
+
+    def set_interval(self, interval):
+        self.interval_timer.setInterval(int(interval) * 1000)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.due = False
+        self.interval_timer.stop()
+        self.idle_timer.stop()
+        if enabled and self.document.isModified():
+            self.document_changed()
+
+    def document_changed(self):
+        if not self.enabled:
+            return
+        self.idle_timer.start()
+        if not (self.interval_timer.isActive() or self.due):
+            self.interval_timer.start()
+
+    def interval_elapsed(self):
+        self.due = True
+        self.maybe_fire()
+
+    def maybe_fire(self):
+        if self.due and not self.idle_timer.isActive():
+            self.due = False
+            if self.document.isModified():
+                self.timeout.emit()
+
+
+class FileLoader(QtCore.QThread):
+    """
+    Reads a file in bounded chunks off the GUI thread.
+
+    Every chunk is handed over through `chunk_read`; the loader then waits
+    until the receiver calls `chunk_consumed` before it reads too far ahead,
+    so at most `max_pending` chunks are ever held in memory besides the
+    document itself.
+
+    A UTF-8 file with a line of `long_line_length` characters or more is
+    not read any further, `long_line` asks for it to be opened in the large
+    file viewer, since laying out such a line takes longer the longer it is.
+    """
+
+    chunk_read = QtCore.pyqtSignal(str)
+    progress = QtCore.pyqtSignal(int)
+    loaded = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)
+    long_line = QtCore.pyqtSignal()
+
+    max_pending = 4
+
+    def __init__(self, filename, long_line_length=0, parent=None):
+        super().__init__(parent)
+        self.filename = filename
+        self.long_line_length = long_line_length  # 0 never stops reading
+        self.file_format = fileio.FileFormat()
+        self.cancelled = False
+        self.pending = QtCore.QSemaphore(self.max_pending)
+
+    def cancel(self):
+        self.cancelled = True
+        self.pending.release(self.max_pending)
+
+    def chunk_consumed(self):
+        self.pending.release()
+
+    def run(self):
+        try:
+            size = max(1, os.path.getsize(self.filename))
+            with open(self.filename, "rb") as file:
+                self.file_format = fileio.sniff(file.read(fileio.sniff_size))
+                file.seek(0)
+                long_line = None
+                # The viewer only decodes UTF-8
+                if self.long_line_length and self.file_format.encoding == "utf-8":
+                    long_line = re.compile("\n[^\n]{%d}" % self.long_line_length)
+                carried = 0  # Length of the line the last chunk left unterminated
+                for chunk in fileio.read_chunks(file, self.file_format):
+                    if long_line is not None:
+                        first = chunk.find("\n")
+                        if carried + (len(chunk) if first == -1 else first) >= \
+                                self.long_line_length or long_line.search(chunk):
+                            self.long_line.emit()
+                            return
+                        last = chunk.rfind("\n")
+                        carried = carried + len(chunk) if last == -1 else len(chunk) - last - 1
+                    self.pending.acquire()
+                    if self.cancelled:
+                        break
+                    self.chunk_read.emit(chunk)
+                    self.progress.emit(int(file.tell() * 100 / size))
+        except OSError as error:
+            self.failed.emit(error.strerror or str(error))
+            return
+
+        if not self.cancelled:
+            self.loaded.emit()
+
+
+@timed("Write file")
+def write_text_file(filename, text, file_format=fileio.FileFormat()) -> str:
+    """
+    Atomically writes text to filename in the given format, returns an error
+    message on failure
+    """
+    try:
+        data = fileio.encode(text, file_format)
+    except UnicodeEncodeError:
+        return f"Cannot write file {QtCore.QDir.toNativeSeparators(filename)}:\nThe text cannot be encoded as {file_format.label()}"
+
+    # Not opened in text mode, the line endings are those of file_format
+    file = QtCore.QSaveFile(filename)
+    if not (file.open(QtCore.QIODevice.WriteOnly)):
+        return f"Cannot open file {QtCore.QDir.toNativeSeparators(filename)} for writing:\n{file.errorString()}"
+
+    file.write(data)
+    del data
+    if not (file.commit()):
+        return f"Cannot write file {QtCore.QDir.toNativeSeparators(filename)}:\n{file.errorString()}"
+    return ""
+
+
+class FileSaver(QtCore.QThread):
+    """
+    Writes document snapshots to disk on a dedicated thread.
+
+    Only the newest snapshot is kept: submitting while a write is queued
+    replaces the queued one, so bursts of saves collapse into one write.
+    `saved` reports the file name, the document revision of the snapshot
+    and an error message that is empty on success.
+    """
+
+    saved = QtCore.pyqtSignal(str, int, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.mutex = QtCore.QMutex()
+        self.condition = QtCore.QWaitCondition()
+        self.pending = None
+        self.busy = False
+        self.stopped = False
+
+    def submit(self, filename, text, revision, file_format=fileio.FileFormat()):
+        self.mutex.lock()
+        self.pending = (filename, text, revision, file_format)
+        self.condition.wakeAll()
+        self.mutex.unlock()
+
+    def discard_pending(self):
+        """
+        Drops the queued snapshot and waits for the current write to finish
+        """
+        self.mutex.lock()
+        self.pending = None
+        while self.busy:
+            self.condition.wait(self.mutex)
+        self.mutex.unlock()
+
+    def stop(self):
+        """
+        Writes out the queued snapshot, if any, and ends the thread
+        """
+        self.mutex.lock()
+        self.stopped = True
+        self.condition.wakeAll()
+        self.mutex.unlock()
+        self.wait()
 
     def run(self):
-        while self.autosave_enabled:
-            sleep(self.autosave_time)
-            self.value.emit(1)
-        else:
-            self.quit()
+        while True:
+            self.mutex.lock()
+            while self.pending is None and not self.stopped:
+                self.condition.wait(self.mutex)
+            if self.pending is None:
+                self.mutex.unlock()
+                return
+            filename, text, revision, file_format = self.pending
+            self.pending = None
+            self.busy = True
+            self.mutex.unlock()
+
+            error_message = write_text_file(filename, text, file_format)
+            del text
+
+            self.mutex.lock()
+            self.busy = False
+            self.condition.wakeAll()
+            self.mutex.unlock()
+            self.saved.emit(filename, revision, error_message)
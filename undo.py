@@ -0,0 +1,177 @@
+from PyQt5 import QtGui, QtCore
+
+
+class UndoHistory(QtCore.QObject):
+    """
+    Keeps the undo history of a document within a memory budget.
+
+    QTextDocument keeps every undo step for as long as the document lives,
+    and already merges consecutive typing and deleting into one step, but
+    its stack cannot be inspected. The history mirrors it from
+    undoCommandAdded and contentsChange: each step is the span of text it
+    replaced and an estimate of the memory Qt holds to undo it.
+
+    While undo is enabled Qt never frees text, everything ever inserted
+    stays in the document's buffer, and every line added or removed keeps
+    an undo command. Turning undo off and on frees the commands and lets
+    Qt reuse the room they took, leaving the blocks as they are, but the
+    text stays in the buffer. So once the estimate is over `budget` and
+    the user has stopped editing for `idle_time` milliseconds, the oldest
+    steps are dropped by undoing the newest steps that fit in half the
+    budget, turning undo off and on and replaying those steps as new ones.
+    Only the text of the kept steps is edited, the rest of the document is
+    not highlighted or indexed again. This runs on the GUI thread and
+    costs as much as the text it replays, so no more than `replay_limit`
+    characters of steps are kept, the last step always is.
+    """
+
+    compacted = QtCore.pyqtSignal()
+
+    step_overhead = 200  # Bytes per step besides its text and lines
+    line_cost = 56  # Bytes per line added or removed, measured with Qt 5.15
+    idle_time = 2000
+    replay_limit = 1 << 18  # Characters
+
+    def __init__(self, document, budget, text_editors, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.budget = budget
+        # The views whose cursors are put back after compacting
+        self.text_editors = text_editors
+        # [start, end, delta, size] of each step, end being where the text
+        # it inserted ends and delta how much longer it made the document
+        self.steps = []
+        self.redo_steps = []
+        self.footprint = 0
+        self.undo_count = 0
+        self.block_count = document.blockCount()
+        self.adding = False
+        self.compacting = False
+
+        self.compact_timer = QtCore.QTimer(self)
+        self.compact_timer.setSingleShot(True)
+        self.compact_timer.timeout.connect(self.compact)
+
+        document.undoCommandAdded.connect(self.command_added)
+        document.contentsChange.connect(self.record)
+
+    def clear(self):
+        self.steps = []
+        self.redo_steps = []
+        self.footprint = 0
+        self.adding = False
+
+    def command_added(self):
+        # Emitted just before the contentsChange of the edit that starts a
+        # new step, edits merged into the last step only have the latter
+        self.adding = True
+
+    def record(self, position, removed, added):
+        if self.compacting:
+            return
+        document = self.document
+        count = document.availableUndoSteps()
+        first_block = document.findBlock(position).blockNumber()
+        added_lines = document.findBlock(position + added).blockNumber() - first_block
+        block_count = document.blockCount()
+        removed_lines = added_lines - (block_count - self.block_count)
+        self.block_count = block_count
+        if not document.isUndoRedoEnabled() or \
+                count == 0 and document.availableRedoSteps() == 0:
+            self.clear()
+            # A new text, or edits Qt keeps no undo for
+            self.undo_count = count
+            return
+
+        size = 2 * added + self.line_cost * (added_lines + removed_lines)
+        if self.adding:
+            self.adding = False
+            self.footprint -= sum(step[3] for step in self.redo_steps)
+            self.redo_steps = []
+            self.steps.append([position, position + added, added - removed,
+                               size + self.step_overhead])
+            self.footprint += size + self.step_overhead
+        elif count < self.undo_count and self.steps:
+            self.redo_steps.append(self.steps.pop())
+        elif count > self.undo_count and self.redo_steps:
+            self.steps.append(self.redo_steps.pop())
+        elif self.steps:
+            step = self.steps[-1]
+            if step[1] <= position:
+                step[1] = position + added
+            else:
+                step[1] = max(step[1] - removed + added, position + added)
+            step[0] = min(step[0], position)
+            step[2] += added - removed
+            step[3] += size
+            self.footprint += size
+        self.undo_count = count
+
+        if self.footprint > self.budget and len(self.steps) > 1:
+            # Once editing pauses, every edit puts it off again
+            self.compact_timer.start(self.idle_time)
+
+    def compact(self):
+        """
+        Drops the oldest steps, keeping the newest that fit in half the
+        budget and in replay_limit, and always the last one
+        """
+        document = self.document
+        if not document.isUndoRedoEnabled() or len(self.steps) < 2:
+            return
+
+        kept = 0
+        size = 0
+        replayed_length = 0
+        for start, end, _, step_size in reversed(self.steps):
+            if kept and (size + step_size > self.budget // 2 or
+                         replayed_length + end - start > self.replay_limit):
+                break
+            size += step_size
+            replayed_length += end - start
+            kept += 1
+
+        selections = [(text_editor, text_editor.textCursor().anchor(),
+                       text_editor.textCursor().position(),
+                       text_editor.verticalScrollBar().value())
+                      for text_editor in self.text_editors]
+        modified = document.isModified()
+        self.compacting = True
+
+        # Each step's text is read while the document is as that step left it
+        cursor = QtGui.QTextCursor(document)
+        replayed = []
+        for start, end, delta, _ in reversed(self.steps[-kept:]):
+            cursor.setPosition(start)
+            cursor.setPosition(end, QtGui.QTextCursor.KeepAnchor)
+            replayed.append((start, end - start - delta,
+                             cursor.selectedText().replace("\u2029", "\n")))
+            document.undo()
+        document.setUndoRedoEnabled(False)
+        document.setUndoRedoEnabled(True)
+
+        self.clear()
+        self.block_count = document.blockCount()
+        self.undo_count = 0
+        self.compacting = False
+        for start, length, text in reversed(replayed):
+            cursor.beginEditBlock()
+            cursor.setPosition(start)
+            cursor.setPosition(start + length, QtGui.QTextCursor.KeepAnchor)
+            cursor.insertText(text)
+            cursor.endEditBlock()
+
+        document.setModified(modified)
+        end = document.characterCount() - 1
+        for text_editor, anchor, position, scroll in selections:
+            cursor = text_editor.textCursor()
+            cursor.setPosition(min(anchor, end))
+            cursor.setPosition(min(position, end), QtGui.QTextCursor.KeepAnchor)
+            text_editor.setTextCursor(cursor)
+            text_editor.verticalScrollBar().setValue(scroll)
+        self.compacted.emit()
+
+    def set_budget(self, budget):
+        self.budget = budget
+        if self.footprint > self.budget and len(self.steps) > 1:
+            self.compact_timer.start(self.idle_time)
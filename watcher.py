@@ -0,0 +1,137 @@
+import os
+import zlib
+from PyQt5 import QtCore
+
+
+sample_size = 4096  # Bytes hashed per sample
+sample_count = 6  # Samples spread over the file, the first and last included
+
+
+def sample_ranges(size) -> list:
+    """
+    Returns the (start, end) byte ranges sampled from a file of a given size
+    """
+    if size <= sample_size * sample_count:
+        return [(0, size)]
+    step = (size - sample_size) // (sample_count - 1)
+    return [(step * index, step * index + sample_size)
+            for index in range(sample_count - 1)] + [(size - sample_size, size)]
+
+
+def sample_hashes(file, ranges) -> tuple:
+    hashes = []
+    for start, end in ranges:
+        file.seek(start)
+        hashes.append(zlib.crc32(file.read(end - start)))
+    return tuple(hashes)
+
+
+def file_signature(filename):
+    """
+    Returns (size, mtime, hashes of samples) of a file, or None if it is
+    gone. The hashes catch rewrites that keep the size within the mtime
+    resolution, at the cost of reading a few kilobytes.
+    """
+    try:
+        with open(filename, "rb") as file:
+            status = os.fstat(file.fileno())
+            return (status.st_size, status.st_mtime_ns,
+                    sample_hashes(file, sample_ranges(status.st_size)))
+    except OSError:
+        return None
+
+
+def is_append(filename, old_signature, new_signature) -> bool:
+    """
+    Tells whether a file only grew, by sampling the new file where the old
+    signature was sampled
+    """
+    old_size, _, old_hashes = old_signature
+    if new_signature[0] <= old_size:
+        return False
+    try:
+        with open(filename, "rb") as file:
+            return sample_hashes(file, sample_ranges(old_size)) == old_hashes
+    except OSError:
+        return False
+
+
+class FileWatcher(QtCore.QObject):
+    """
+    Watches the file of a document for changes made by other programs.
+
+    QFileSystemWatcher says when to look, and the file is then compared
+    with its signature from when it was last loaded or saved, without
+    rereading it. A file that was only appended to is reported through
+    `appended` with its old and new sizes, other changes through `changed`.
+    """
+
+    changed = QtCore.pyqtSignal()
+    appended = QtCore.pyqtSignal(int, int)
+    removed = QtCore.pyqtSignal()
+
+    check_delay = 200  # Milliseconds, writes often come in bursts
+    poll_interval = 1000  # Milliseconds between checks for a removed file
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.filename = ""
+        self.signature = None
+
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.schedule_check)
+
+        self.check_timer = QtCore.QTimer(self)
+        self.check_timer.setSingleShot(True)
+        self.check_timer.timeout.connect(self.check)
+
+    def watch(self, filename):
+        """
+        Takes the file as it is on disk as the new reference, "" stops
+        watching
+        """
+        if type(filename) == tuple or type(filename) == list:
+            filename = filename[0]
+        if self.watcher.files():
+            self.watcher.removePaths(self.watcher.files())
+        self.check_timer.stop()
+
+        self.filename = filename
+        self.signature = None
+        if filename != "":
+            self.signature = file_signature(filename)
+            self.add_path()
+
+    def add_path(self):
+        # Saving by renaming a new file over the old one, as git and many
+        # editors do, drops the path from QFileSystemWatcher
+        if self.filename not in self.watcher.files() and \
+                os.path.exists(self.filename):
+            self.watcher.addPath(self.filename)
+
+    def changed_on_disk(self) -> bool:
+        return self.filename != "" and \
+            file_signature(self.filename) != self.signature
+
+    def schedule_check(self):
+        self.check_timer.start(self.check_delay)
+
+    def check(self):
+        if self.filename == "":
+            return
+        self.add_path()
+        signature = file_signature(self.filename)
+        if signature is None:
+            # Keep looking in case the file is put back
+            self.check_timer.start(self.poll_interval)
+        if signature == self.signature:
+            return
+
+        old_signature, self.signature = self.signature, signature
+        if signature is None:
+            self.removed.emit()
+        elif old_signature is not None and \
+                is_append(self.filename, old_signature, signature):
+            self.appended.emit(old_signature[0], signature[0])
+        else:
+            self.changed.emit()